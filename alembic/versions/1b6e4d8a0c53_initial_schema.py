@@ -0,0 +1,158 @@
+"""initial schema
+
+Revision ID: 1b6e4d8a0c53
+Revises:
+Create Date: 2026-10-17 10:05:12.384120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "1b6e4d8a0c53"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# The schema the api created on startup before the migrations were added.
+# Databases created that way already have it and are stamped with this
+# revision instead, see the README
+def upgrade():
+    op.create_table(
+        "committee",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("role", sa.String(50), nullable=False),
+        sa.Column("designation", sa.String(50), nullable=False),
+        sa.Column("image_url", sa.String(500), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_committee_id"), "committee", ["id"])
+
+    op.create_table(
+        "testimonials",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("batch", sa.String(10), nullable=False),
+        sa.Column("message", sa.String(1000), nullable=False),
+        sa.Column("approved", sa.Boolean()),
+        sa.Column("verification_hash", sa.String(100)),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_testimonials_id"), "testimonials", ["id"])
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("prefix", sa.String(10), nullable=False),
+        sa.Column("first_name", sa.String(50), nullable=False),
+        sa.Column("last_name", sa.String(50), nullable=False),
+        sa.Column("email", sa.String(50), nullable=False),
+        sa.Column("mobile", sa.String(15), nullable=False),
+        sa.Column("birthday", sa.Date(), nullable=False),
+        sa.Column("address1", sa.String(100), nullable=False),
+        sa.Column("address2", sa.String(100)),
+        sa.Column("city", sa.String(50), nullable=False),
+        sa.Column("state", sa.String(50), nullable=False),
+        sa.Column("pincode", sa.String(15), nullable=False),
+        sa.Column("country", sa.String(50), nullable=False),
+        sa.Column("duration_start", sa.Integer()),
+        sa.Column("duration_end", sa.Integer()),
+        sa.Column("course_puc", sa.String(50)),
+        sa.Column("course_degree", sa.String(50)),
+        sa.Column("course_pg", sa.String(50)),
+        sa.Column("course_others", sa.String(50)),
+        sa.Column("vision", sa.String(1000)),
+        sa.Column("profession", sa.String(100)),
+        sa.Column("other_interests", sa.String(1000)),
+        sa.Column("membership_type", sa.String(10)),
+        sa.Column("payment_status", sa.Boolean()),
+        sa.Column("payment_amount", sa.Float()),
+        sa.Column("date_created", sa.Date()),
+        sa.Column("membership_valid_upto", sa.Date()),
+        sa.Column("membership_expired", sa.Boolean()),
+        sa.Column("date_renewed", sa.Date()),
+        sa.Column("renewal_hash", sa.String(200)),
+        sa.Column("alt_user_id", sa.String(50)),
+        sa.Column("profile_url", sa.String(500)),
+        sa.Column("id_card_url", sa.String(500)),
+        sa.Column("membership_certificate_url", sa.String(500)),
+        sa.Column("payment_mode", sa.String(1)),
+        sa.Column("razorpay_order_id", sa.String(100)),
+        sa.Column("razorpay_payment_id", sa.String(100)),
+        sa.Column("manual_payment_notification", sa.Boolean()),
+        sa.Column("email_subscription_status", sa.Boolean()),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_users_id"), "users", ["id"])
+    op.create_index(op.f("ix_users_email"), "users", ["email"])
+    op.create_index(op.f("ix_users_duration_end"), "users", ["duration_end"])
+    op.create_index(op.f("ix_users_membership_type"), "users", ["membership_type"])
+    op.create_index(op.f("ix_users_payment_amount"), "users", ["payment_amount"])
+
+    op.create_table(
+        "famous_alumni",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("name", sa.String(100)),
+        sa.Column("award", sa.String(100)),
+        sa.Column("year", sa.String(4)),
+        sa.Column("category", sa.String(100)),
+        sa.Column("description", sa.String(200)),
+        sa.Column("batch", sa.String(4)),
+        sa.Column("image", sa.String(500)),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_famous_alumni_id"), "famous_alumni", ["id"])
+    op.create_index(op.f("ix_famous_alumni_category"), "famous_alumni", ["category"])
+
+    op.create_table(
+        "admin",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("email", sa.String(50)),
+        sa.Column("password", sa.String(500)),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("email"),
+    )
+
+    op.create_table(
+        "jobs",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("job_name", sa.String(50), nullable=False),
+        sa.Column("job_id", sa.Integer(), nullable=False),
+        sa.Column("job_last_runtime", sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+    op.create_table(
+        "events",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("name", sa.String(500), nullable=False),
+        sa.Column("description", sa.String(2000), nullable=False),
+        sa.Column("venue", sa.String(100), nullable=False),
+        sa.Column("event_date", sa.Date(), nullable=False),
+        sa.Column("event_time", sa.String(10), nullable=False),
+        sa.Column("chief_guest", sa.String(500)),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade():
+    op.drop_table("events")
+    op.drop_table("jobs")
+    op.drop_table("admin")
+    op.drop_index(op.f("ix_famous_alumni_category"), table_name="famous_alumni")
+    op.drop_index(op.f("ix_famous_alumni_id"), table_name="famous_alumni")
+    op.drop_table("famous_alumni")
+    op.drop_index(op.f("ix_users_payment_amount"), table_name="users")
+    op.drop_index(op.f("ix_users_membership_type"), table_name="users")
+    op.drop_index(op.f("ix_users_duration_end"), table_name="users")
+    op.drop_index(op.f("ix_users_email"), table_name="users")
+    op.drop_index(op.f("ix_users_id"), table_name="users")
+    op.drop_table("users")
+    op.drop_index(op.f("ix_testimonials_id"), table_name="testimonials")
+    op.drop_table("testimonials")
+    op.drop_index(op.f("ix_committee_id"), table_name="committee")
+    op.drop_table("committee")
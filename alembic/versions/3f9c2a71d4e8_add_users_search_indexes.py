@@ -0,0 +1,35 @@
+"""add users search indexes
+
+Revision ID: 3f9c2a71d4e8
+Revises: 1b6e4d8a0c53
+Create Date: 2026-10-17 10:12:44.518209
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "3f9c2a71d4e8"
+down_revision = "1b6e4d8a0c53"
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = ("first_name", "last_name", "profession")
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    for column in SEARCH_COLUMNS:
+        op.create_index(
+            f"ix_users_{column}_trgm",
+            "users",
+            [column],
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"},
+        )
+
+
+def downgrade():
+    for column in SEARCH_COLUMNS:
+        op.drop_index(f"ix_users_{column}_trgm", table_name="users")
@@ -0,0 +1,29 @@
+"""add payment events retries
+
+Revision ID: 4d8e2b6f0a17
+Revises: a1c4e7b2d905
+Create Date: 2026-10-18 17:03:29.816402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "4d8e2b6f0a17"
+down_revision = "a1c4e7b2d905"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "payment_events",
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column("payment_events", sa.Column("next_attempt_at", sa.DateTime()))
+
+
+def downgrade():
+    op.drop_column("payment_events", "next_attempt_at")
+    op.drop_column("payment_events", "attempts")
@@ -0,0 +1,24 @@
+"""add events cover photo url
+
+Revision ID: 5d7a3e90f2c1
+Revises: c27e9f4a1b36
+Create Date: 2026-10-17 12:26:51.140387
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5d7a3e90f2c1"
+down_revision = "c27e9f4a1b36"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("events", sa.Column("cover_photo_url", sa.String(500)))
+
+
+def downgrade():
+    op.drop_column("events", "cover_photo_url")
@@ -0,0 +1,33 @@
+"""add email outbox campaign
+
+Revision ID: 6e0b4f2a9d73
+Revises: 2f7d9b3c8e51
+Create Date: 2026-10-18 10:41:09.573120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "6e0b4f2a9d73"
+down_revision = "2f7d9b3c8e51"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("email_outbox", sa.Column("campaign", sa.String(50)))
+    op.add_column(
+        "email_outbox",
+        sa.Column("recipient_count", sa.Integer(), nullable=False, server_default="1"),
+    )
+    op.create_index(
+        "ix_email_outbox_campaign", "email_outbox", ["campaign"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index("ix_email_outbox_campaign", table_name="email_outbox")
+    op.drop_column("email_outbox", "recipient_count")
+    op.drop_column("email_outbox", "campaign")
@@ -0,0 +1,55 @@
+"""add payment reconciliation
+
+Revision ID: 7c2e8a5f1d94
+Revises: d3a6f1c9e842
+Create Date: 2026-10-18 16:02:11.378245
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "7c2e8a5f1d94"
+down_revision = "d3a6f1c9e842"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "reconciliation_runs",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("run_at", sa.DateTime(), nullable=False),
+        sa.Column("source", sa.String(20), nullable=False),
+        sa.Column("window_start", sa.Date(), nullable=False),
+        sa.Column("window_end", sa.Date(), nullable=False),
+        sa.Column("settlement_rows", sa.Integer(), nullable=False),
+        sa.Column("mismatch_count", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "reconciliation_mismatches",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("run_id", sa.BigInteger(), nullable=False),
+        sa.Column("kind", sa.String(20), nullable=False),
+        sa.Column("order_id", sa.String(100)),
+        sa.Column("payment_id", sa.String(100)),
+        sa.Column("user_id", sa.BigInteger()),
+        sa.Column("email", sa.String(50)),
+        sa.Column("settled_amount", sa.BigInteger()),
+        sa.Column("payment_amount", sa.Float()),
+    )
+    op.create_index(
+        "ix_reconciliation_mismatches_run_id",
+        "reconciliation_mismatches",
+        ["run_id"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_reconciliation_mismatches_run_id", table_name="reconciliation_mismatches"
+    )
+    op.drop_table("reconciliation_mismatches")
+    op.drop_table("reconciliation_runs")
@@ -0,0 +1,31 @@
+"""add users birthday index
+
+Revision ID: 8b41d0e6c5a2
+Revises: 3f9c2a71d4e8
+Create Date: 2026-10-17 11:03:27.904615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "8b41d0e6c5a2"
+down_revision = "3f9c2a71d4e8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_users_birthday_month_day",
+        "users",
+        [
+            sa.text("EXTRACT(month FROM birthday)"),
+            sa.text("EXTRACT(day FROM birthday)"),
+        ],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_users_birthday_month_day", table_name="users")
@@ -0,0 +1,24 @@
+"""add users profile image status
+
+Revision ID: 9a6c2e5d4b17
+Revises: e4b8c61f7a09
+Create Date: 2026-10-17 15:02:37.418226
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9a6c2e5d4b17"
+down_revision = "e4b8c61f7a09"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("users", sa.Column("profile_image_status", sa.String(10)))
+
+
+def downgrade():
+    op.drop_column("users", "profile_image_status")
@@ -0,0 +1,37 @@
+"""add renewal payments
+
+Revision ID: a1c4e7b2d905
+Revises: f5a9c3d7e1b8
+Create Date: 2026-10-18 16:41:53.204716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a1c4e7b2d905"
+down_revision = "f5a9c3d7e1b8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "renewal_payments",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("order_id", sa.String(100), nullable=False),
+        sa.Column("payment_id", sa.String(100)),
+        sa.Column("payment_amount", sa.Float(), nullable=False),
+        sa.Column("date_renewed", sa.Date(), nullable=False),
+        sa.UniqueConstraint("order_id"),
+    )
+    op.create_index(
+        "ix_renewal_payments_user_id", "renewal_payments", ["user_id"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index("ix_renewal_payments_user_id", table_name="renewal_payments")
+    op.drop_table("renewal_payments")
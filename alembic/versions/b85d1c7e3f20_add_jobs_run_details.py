@@ -0,0 +1,32 @@
+"""add jobs run details
+
+Revision ID: b85d1c7e3f20
+Revises: 6e0b4f2a9d73
+Create Date: 2026-10-18 12:08:55.931447
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b85d1c7e3f20"
+down_revision = "6e0b4f2a9d73"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("jobs", sa.Column("last_run_started_at", sa.DateTime()))
+    op.add_column("jobs", sa.Column("last_run_duration_ms", sa.Integer()))
+    op.add_column("jobs", sa.Column("last_run_rows", sa.Integer()))
+    op.add_column("jobs", sa.Column("last_run_status", sa.String(10)))
+    op.add_column("jobs", sa.Column("last_run_error", sa.String(1000)))
+
+
+def downgrade():
+    op.drop_column("jobs", "last_run_error")
+    op.drop_column("jobs", "last_run_status")
+    op.drop_column("jobs", "last_run_rows")
+    op.drop_column("jobs", "last_run_duration_ms")
+    op.drop_column("jobs", "last_run_started_at")
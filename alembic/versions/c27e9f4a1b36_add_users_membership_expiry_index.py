@@ -0,0 +1,27 @@
+"""add users membership expiry index
+
+Revision ID: c27e9f4a1b36
+Revises: 8b41d0e6c5a2
+Create Date: 2026-10-17 11:41:09.331072
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "c27e9f4a1b36"
+down_revision = "8b41d0e6c5a2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_users_membership_type_valid_upto",
+        "users",
+        ["membership_type", "membership_valid_upto"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_users_membership_type_valid_upto", table_name="users")
@@ -0,0 +1,42 @@
+"""add payment events
+
+Revision ID: d3a6f1c9e842
+Revises: b85d1c7e3f20
+Create Date: 2026-10-18 14:21:37.604129
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d3a6f1c9e842"
+down_revision = "b85d1c7e3f20"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "payment_events",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("event_id", sa.String(100), nullable=False, unique=True),
+        sa.Column("event", sa.String(50), nullable=False),
+        sa.Column("order_id", sa.String(100)),
+        sa.Column("payment_id", sa.String(100)),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("status", sa.String(10), nullable=False),
+        sa.Column("received_at", sa.DateTime(), nullable=False),
+        sa.Column("applied_at", sa.DateTime()),
+    )
+    op.create_index(
+        "ix_payment_events_status_id",
+        "payment_events",
+        ["status", "id"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_payment_events_status_id", table_name="payment_events")
+    op.drop_table("payment_events")
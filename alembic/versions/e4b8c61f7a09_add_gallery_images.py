@@ -0,0 +1,36 @@
+"""add gallery images
+
+Revision ID: e4b8c61f7a09
+Revises: 5d7a3e90f2c1
+Create Date: 2026-10-17 13:02:18.662903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e4b8c61f7a09"
+down_revision = "5d7a3e90f2c1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "gallery_images",
+        sa.Column("file_id", sa.String(50), primary_key=True),
+        sa.Column("url", sa.String(500), nullable=False),
+        sa.Column("width", sa.Integer()),
+        sa.Column("height", sa.Integer()),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("refreshed_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "ix_gallery_images_position", "gallery_images", ["position"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index("ix_gallery_images_position", table_name="gallery_images")
+    op.drop_table("gallery_images")
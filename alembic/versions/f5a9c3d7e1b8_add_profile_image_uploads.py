@@ -0,0 +1,50 @@
+"""add profile image uploads
+
+Revision ID: f5a9c3d7e1b8
+Revises: 7c2e8a5f1d94
+Create Date: 2026-10-18 16:22:07.518342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "f5a9c3d7e1b8"
+down_revision = "7c2e8a5f1d94"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "profile_image_uploads",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("alt_user_id", sa.String(50), nullable=False),
+        sa.Column("image", sa.LargeBinary(), nullable=False),
+        sa.Column("extension", sa.String(10), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+        sa.Column("last_error", sa.String(1000)),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "ix_profile_image_uploads_alt_user_id",
+        "profile_image_uploads",
+        ["alt_user_id"],
+        unique=False,
+    )
+
+    # The images of uploads left pending by the in-memory background tasks
+    # are gone, so those uploads can only be given up
+    op.execute(
+        "UPDATE users SET profile_image_status = 'failed' "
+        "WHERE profile_image_status = 'pending'"
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_profile_image_uploads_alt_user_id", table_name="profile_image_uploads"
+    )
+    op.drop_table("profile_image_uploads")
@@ -6,6 +6,19 @@ import os
 import sentry_sdk
 from fastapi import FastAPI
 from database.db import engine, Base
+from helpers.email_outbox import start_outbox_worker, stop_outbox_worker
+from helpers.mail_transport import close_mail_transport
+from helpers.metrics import MetricsMiddleware
+from helpers.payment_events import (
+    start_payment_events_worker,
+    stop_payment_events_worker,
+)
+from helpers.payment_gateway import close_payment_gateway
+from helpers.profile_images import (
+    start_profile_image_worker,
+    stop_profile_image_worker,
+)
+from helpers.scheduler import start_scheduler, stop_scheduler
 from routers import (
     index,
     committee,
@@ -19,6 +32,8 @@ from routers import (
     email_messages,
     renewal,
     events,
+    jobs,
+    metrics,
 )
 from starlette.middleware.cors import CORSMiddleware
 from sentry_sdk.integrations.asgi import SentryAsgiMiddleware
@@ -40,12 +55,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 app.add_middleware(SentryAsgiMiddleware)
+# Added last so that it also times the other middlewares
+app.add_middleware(MetricsMiddleware)
 
 
 @app.on_event("startup")
 async def startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # The Postgres schema is owned by the alembic migrations. SQLite, used for
+    # local testing, is not migrated and gets the tables created instead
+    if engine.dialect.name == "sqlite":
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    start_outbox_worker()
+    start_payment_events_worker()
+    start_profile_image_worker()
+    start_scheduler()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await stop_scheduler()
+    await stop_outbox_worker()
+    await stop_payment_events_worker()
+    await stop_profile_image_worker()
+    close_mail_transport()
+    close_payment_gateway()
 
 
 app.include_router(committee.router)
@@ -60,3 +95,5 @@ app.include_router(email_messages.router)
 app.include_router(index.router)
 app.include_router(renewal.router)
 app.include_router(events.router)
+app.include_router(jobs.router)
+app.include_router(metrics.router)
@@ -0,0 +1,79 @@
+# Measures how long the event loop stalls while a burst of admin logins is
+# verified, once with the password checked inline on the loop and once on the
+# password hashing thread pool.
+#
+# Run from the repository root - python -m benchmarks.login_event_loop_stall
+import argparse
+import asyncio
+import statistics
+import time
+
+from passlib.hash import pbkdf2_sha256
+
+from helpers.password_hasher import verify_password
+
+# How often the probe task expects to be scheduled
+PROBE_INTERVAL = 0.001
+
+
+async def probe_event_loop(lags: list, done: asyncio.Event):
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+async def inline_login(password: str, password_hash: str):
+    return pbkdf2_sha256.verify(password, password_hash)
+
+
+async def offloaded_login(password: str, password_hash: str):
+    return await verify_password(password, password_hash)
+
+
+async def run_burst(login, logins: int, password_hash: str):
+    lags = []
+    done = asyncio.Event()
+    probe = asyncio.ensure_future(probe_event_loop(lags, done))
+
+    # Let the probe settle before the burst starts
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *[login("wrong password", password_hash) for _ in range(logins)]
+    )
+    elapsed = time.perf_counter() - start
+
+    done.set()
+    await probe
+
+    return elapsed, [lag * 1000 for lag in lags]
+
+
+def report(name: str, logins: int, elapsed: float, lags: list):
+    lags = sorted(lags)
+
+    print(
+        f"{name:<10} {logins} logins in {elapsed * 1000:.0f} ms - "
+        f"loop lag p50 {statistics.median(lags):.2f} ms, "
+        f"p99 {lags[int(len(lags) * 0.99) - 1]:.2f} ms, "
+        f"max {lags[-1]:.2f} ms"
+    )
+
+
+async def main(logins: int):
+    password_hash = pbkdf2_sha256.hash("correct password")
+
+    for name, login in (("inline", inline_login), ("offloaded", offloaded_login)):
+        elapsed, lags = await run_burst(login, logins, password_hash)
+        report(name, logins, elapsed, lags)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=50)
+
+    args = parser.parse_args()
+
+    asyncio.run(main(args.logins))
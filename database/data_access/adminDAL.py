@@ -2,18 +2,20 @@ import os
 from datetime import date
 from datetime import datetime
 from datetime import timedelta
+from typing import List
 from typing import Optional
 
 from fastapi import HTTPException
 from fastapi import status
 from jose import jwt
-from passlib.hash import pbkdf2_sha256
+from sqlalchemy import func
 from sqlalchemy import update
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
 
 from database.models import Admin
 from database.models import Job
+from helpers.password_hasher import verify_password
 
 
 class AdminDAL:
@@ -24,8 +26,8 @@ class AdminDAL:
         q = await self.session.execute(select(Admin).where(Admin.email == email))
         return q.scalars().first()
 
-    def verify_password(self, plain_text_password: str, password_hash: str):
-        return pbkdf2_sha256.verify(plain_text_password, password_hash)
+    async def verify_password(self, plain_text_password: str, password_hash: str):
+        return await verify_password(plain_text_password, password_hash)
 
     def create_access_token(
         self, data: dict, expires_delta: Optional[timedelta] = None
@@ -56,7 +58,7 @@ class AdminDAL:
                 status_code=status.HTTP_404_NOT_FOUND, detail=f"{email} is not valid"
             )
 
-        if not self.verify_password(password, user.password):
+        if not await self.verify_password(password, user.password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="That password is incorrect",
@@ -64,10 +66,52 @@ class AdminDAL:
 
         return user
 
-    async def fetch_status_of_all_jobs(self):
-        q = await self.session.execute(select(Job).order_by(Job.job_id))
+    async def fetch_status_of_all_jobs(self, job_names: Optional[List[str]] = None):
+        q = select(Job).order_by(Job.job_id)
+
+        if job_names is not None:
+            q = q.where(Job.job_name.in_(job_names))
+
+        q = await self.session.execute(q)
         return q.scalars().all()
 
+    async def find_job_by_name(self, job_name: str):
+        q = await self.session.execute(select(Job).where(Job.job_name == job_name))
+        return q.scalars().first()
+
+    async def record_job_run(
+        self,
+        job_name: str,
+        started_at: datetime,
+        duration_ms: int,
+        rows: Optional[int],
+        run_status: str,
+        error: Optional[str] = None,
+    ) -> None:
+        run = {
+            "job_last_runtime": started_at.date(),
+            "last_run_started_at": started_at,
+            "last_run_duration_ms": duration_ms,
+            "last_run_rows": rows,
+            "last_run_status": run_status,
+            "last_run_error": error[:1000] if error else None,
+        }
+
+        job = await self.find_job_by_name(job_name)
+
+        if job:
+            q = update(Job).where(Job.id == job.id)
+            q = q.values(**run)
+
+            await self.session.execute(q)
+            return
+
+        # Jobs that were never run before are added after the existing ones
+        q = await self.session.execute(select(func.max(Job.job_id)))
+        job_id = (q.scalar() or 0) + 1
+
+        self.session.add(Job(job_name=job_name, job_id=job_id, **run))
+
     async def update_job_last_runtime_date(self, job_id: int):
         q = update(Job).where(Job.job_id == job_id)
         q = q.values(job_last_runtime=date.today())
@@ -3,13 +3,18 @@ from typing import List
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
 
+from database.db import read_from_replica
 from database.models import Committee
+from helpers.cache import CONTENT_CACHE_TTL
+from helpers.cache import ttl_cache
 
 
 class CommitteeDAL:
     def __init__(self, session: Session):
         self.session = session
 
+    @ttl_cache(ttl=CONTENT_CACHE_TTL, method=True)
+    @read_from_replica()
     async def fetch_all_committe_members(self) -> List[Committee]:
         q = await self.session.execute(select(Committee).order_by(Committee.id))
         return q.scalars().all()
@@ -1,9 +1,11 @@
 import datetime
 
 from sqlalchemy import or_
+from sqlalchemy import update
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
 
+from database.db import read_from_replica
 from database.models import Event
 
 
@@ -34,6 +36,13 @@ class EventDAL:
 
         return str(new_event.id)
 
+    async def update_cover_photo_url(self, id, cover_photo_url: str):
+        q = update(Event).where(Event.id == id)
+        q = q.values(cover_photo_url=cover_photo_url)
+
+        await self.session.execute(q)
+
+    @read_from_replica()
     async def fetch_all_upcoming_events(self):
         q = await self.session.execute(
             select(Event)
@@ -43,6 +52,7 @@ class EventDAL:
 
         return q.scalars().all()
 
+    @read_from_replica()
     async def fetch_all_completed_events(self):
         q = await self.session.execute(
             select(Event)
@@ -52,11 +62,13 @@ class EventDAL:
 
         return q.scalars().all()
 
+    @read_from_replica()
     async def fetch_specific_event(self, id):
         q = await self.session.execute(select(Event).where(Event.id == id))
 
         return q.scalars().first()
 
+    @read_from_replica()
     async def fetch_completed_events(self, text):
         q = await self.session.execute(
             select(Event).where(
@@ -71,6 +83,7 @@ class EventDAL:
 
         return q.scalars().all()
 
+    @read_from_replica()
     async def fetch_upcoming_events(self):
         q = await self.session.execute(
             select(Event).where(
@@ -3,13 +3,18 @@ from typing import List
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
 
+from database.db import read_from_replica
 from database.models import FamousAlumni
+from helpers.cache import CONTENT_CACHE_TTL
+from helpers.cache import ttl_cache
 
 
 class FamousAlumniDAL:
     def __init__(self, session: Session):
         self.session = session
 
+    @ttl_cache(ttl=CONTENT_CACHE_TTL, method=True)
+    @read_from_replica()
     async def fetch_all_famous_alumni(self) -> List[FamousAlumni]:
         q = await self.session.execute(select(FamousAlumni).order_by(FamousAlumni.name))
         return q.scalars().all()
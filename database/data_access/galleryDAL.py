@@ -0,0 +1,61 @@
+import datetime
+from typing import List
+
+from sqlalchemy import delete
+from sqlalchemy import func
+from sqlalchemy import insert
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from database.db import read_from_replica
+from database.models import GalleryImage
+
+
+class GalleryDAL:
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def replace_manifest(self, files: List[dict]) -> int:
+        refreshed_at = datetime.datetime.utcnow()
+
+        await self.session.execute(delete(GalleryImage))
+
+        if files:
+            await self.session.execute(
+                insert(GalleryImage),
+                [
+                    {
+                        "file_id": file["fileId"],
+                        "url": file["url"],
+                        "width": file["width"],
+                        "height": file["height"],
+                        "position": position,
+                        "refreshed_at": refreshed_at,
+                    }
+                    for position, file in enumerate(files)
+                ],
+            )
+
+        return len(files)
+
+    @read_from_replica()
+    async def fetch_manifest_version(self):
+        q = await self.session.execute(
+            select(func.count(), func.max(GalleryImage.refreshed_at))
+        )
+        return q.one()
+
+    @read_from_replica()
+    async def fetch_manifest_page(self, limit: int, offset: int):
+        q = await self.session.execute(
+            select(
+                GalleryImage.file_id,
+                GalleryImage.url,
+                GalleryImage.width,
+                GalleryImage.height,
+            )
+            .order_by(GalleryImage.position.desc())
+            .limit(limit)
+            .offset(offset)
+        )
+        return q.all()
@@ -0,0 +1,170 @@
+import datetime
+from typing import List
+from typing import Optional
+
+from sqlalchemy import and_
+from sqlalchemy import func
+from sqlalchemy import insert
+from sqlalchemy import or_
+from sqlalchemy import update
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from database.models import EmailOutbox
+
+
+def count_recipients(message: dict) -> int:
+    return sum(
+        len(personalization.get(field, []))
+        for personalization in message.get("personalizations", [])
+        for field in ("to", "cc", "bcc")
+    )
+
+
+class OutboxDAL:
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def enqueue(
+        self, messages: List[dict], category: str, campaign: Optional[str] = None
+    ) -> int:
+        now = datetime.datetime.utcnow()
+
+        await self.session.execute(
+            insert(EmailOutbox),
+            [
+                {
+                    "message": message,
+                    "category": category,
+                    "campaign": campaign,
+                    "recipient_count": count_recipients(message),
+                    "status": "pending",
+                    "attempts": 0,
+                    "next_attempt_at": now,
+                    "created_at": now,
+                }
+                for message in messages
+            ],
+        )
+
+        # Committed straight away so that the worker can pick the emails up
+        await self.session.commit()
+        return len(messages)
+
+    # Locks the due emails, skipping the ones claimed by other workers, and
+    # pushes their next attempt back so that they are not claimed again while
+    # they are being sent
+    async def claim_due(self, limit: int, lease_until: datetime.datetime):
+        q = await self.session.execute(
+            select(EmailOutbox.id, EmailOutbox.message, EmailOutbox.attempts)
+            .where(
+                EmailOutbox.status == "pending",
+                EmailOutbox.next_attempt_at <= datetime.datetime.utcnow(),
+            )
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        records = q.all()
+
+        if records:
+            q = update(EmailOutbox).where(
+                EmailOutbox.id.in_([record.id for record in records])
+            )
+            q = q.values(next_attempt_at=lease_until)
+
+            await self.session.execute(q)
+
+        return records
+
+    async def mark_sent(self, ids: List[int]) -> None:
+        q = update(EmailOutbox).where(EmailOutbox.id.in_(ids))
+        q = q.values(status="sent")
+        q = q.values(attempts=EmailOutbox.attempts + 1)
+        q = q.values(sent_at=datetime.datetime.utcnow())
+        q = q.values(last_error=None)
+
+        await self.session.execute(q)
+
+    # Without a next attempt the email is moved to the dead letter status
+    async def mark_failed(
+        self,
+        id: int,
+        attempts: int,
+        error: str,
+        next_attempt_at: Optional[datetime.datetime],
+    ) -> None:
+        q = update(EmailOutbox).where(EmailOutbox.id == id)
+        q = q.values(attempts=attempts)
+        q = q.values(last_error=error[:1000])
+
+        if next_attempt_at:
+            q = q.values(next_attempt_at=next_attempt_at)
+        else:
+            q = q.values(status="dead")
+
+        await self.session.execute(q)
+
+    async def requeue(self, id: int) -> int:
+        q = update(EmailOutbox).where(
+            EmailOutbox.id == id, EmailOutbox.status == "dead"
+        )
+        q = q.values(status="pending")
+        q = q.values(attempts=0)
+        q = q.values(next_attempt_at=datetime.datetime.utcnow())
+
+        result = await self.session.execute(q)
+        return result.rowcount
+
+    async def get_outbox_stats(self):
+        q = await self.session.execute(
+            select(
+                func.count().filter(EmailOutbox.status == "pending").label("pending"),
+                func.count()
+                .filter(and_(EmailOutbox.status == "pending", EmailOutbox.attempts > 0))
+                .label("retrying"),
+                func.count().filter(EmailOutbox.status == "sent").label("sent"),
+                func.count().filter(EmailOutbox.status == "dead").label("dead"),
+                func.min(EmailOutbox.created_at)
+                .filter(EmailOutbox.status == "pending")
+                .label("oldest_pending"),
+            )
+        )
+        return q.one()
+
+    async def get_failures(self, limit: int):
+        q = await self.session.execute(
+            select(
+                EmailOutbox.id,
+                EmailOutbox.category,
+                EmailOutbox.status,
+                EmailOutbox.attempts,
+                EmailOutbox.last_error,
+                EmailOutbox.next_attempt_at,
+                EmailOutbox.created_at,
+            )
+            .where(
+                or_(
+                    EmailOutbox.status == "dead",
+                    and_(EmailOutbox.status == "pending", EmailOutbox.attempts > 0),
+                )
+            )
+            .order_by(EmailOutbox.id.desc())
+            .limit(limit)
+        )
+        return q.all()
+
+    async def get_campaign_batches(self, campaign: str):
+        q = await self.session.execute(
+            select(
+                EmailOutbox.id,
+                EmailOutbox.status,
+                EmailOutbox.recipient_count,
+                EmailOutbox.attempts,
+                EmailOutbox.last_error,
+                EmailOutbox.sent_at,
+            )
+            .where(EmailOutbox.campaign == campaign)
+            .order_by(EmailOutbox.id)
+        )
+        return q.all()
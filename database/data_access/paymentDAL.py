@@ -0,0 +1,105 @@
+import datetime
+from typing import List
+from typing import Optional
+
+from sqlalchemy import or_
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from database.models import PaymentEvent
+from database.models import RenewalPayment
+
+DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+class PaymentDAL:
+    def __init__(self, session: Session):
+        self.session = session
+
+    # Returns False when the event was already recorded
+    async def record_event(
+        self,
+        event_id: str,
+        event: str,
+        order_id: Optional[str],
+        payment_id: Optional[str],
+        payload: dict,
+        status: str,
+    ) -> bool:
+        insert = DIALECT_INSERTS[self.session.bind.dialect.name]
+
+        q = insert(PaymentEvent).values(
+            event_id=event_id,
+            event=event,
+            order_id=order_id,
+            payment_id=payment_id,
+            payload=payload,
+            status=status,
+            received_at=datetime.datetime.utcnow(),
+        )
+        q = q.on_conflict_do_nothing(index_elements=["event_id"])
+
+        result = await self.session.execute(q)
+
+        # Committed straight away so that the worker can pick the event up
+        await self.session.commit()
+        return result.rowcount == 1
+
+    # Locks the oldest pending events that are due, skipping the ones claimed
+    # by other workers
+    async def claim_pending(self, limit: int):
+        q = await self.session.execute(
+            select(
+                PaymentEvent.id,
+                PaymentEvent.order_id,
+                PaymentEvent.payment_id,
+                PaymentEvent.attempts,
+            )
+            .where(
+                PaymentEvent.status == "pending",
+                or_(
+                    PaymentEvent.next_attempt_at == None,
+                    PaymentEvent.next_attempt_at <= datetime.datetime.utcnow(),
+                ),
+            )
+            .order_by(PaymentEvent.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        return q.all()
+
+    async def mark_events(self, ids: List[int], status: str) -> None:
+        q = update(PaymentEvent).where(PaymentEvent.id.in_(ids))
+        q = q.values(status=status)
+        q = q.values(applied_at=datetime.datetime.utcnow())
+        q = q.execution_options(synchronize_session=False)
+
+        await self.session.execute(q)
+
+    async def retry_events(
+        self, ids: List[int], attempts: int, next_attempt_at: datetime.datetime
+    ) -> None:
+        q = update(PaymentEvent).where(PaymentEvent.id.in_(ids))
+        q = q.values(attempts=attempts)
+        q = q.values(next_attempt_at=next_attempt_at)
+        q = q.execution_options(synchronize_session=False)
+
+        await self.session.execute(q)
+
+    # The orders of the given ones that were paid for a renewal
+    async def get_renewal_orders(self, order_ids: List[str]) -> List[str]:
+        if not order_ids:
+            return []
+
+        q = await self.session.execute(
+            select(RenewalPayment.order_id).where(
+                RenewalPayment.order_id.in_(order_ids)
+            )
+        )
+        return q.scalars().all()
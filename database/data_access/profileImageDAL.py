@@ -0,0 +1,85 @@
+import datetime
+
+from sqlalchemy import delete
+from sqlalchemy import exists
+from sqlalchemy import update
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from database.models import ProfileImageUpload
+from database.models import User
+
+
+class ProfileImageDAL:
+    def __init__(self, session: Session):
+        self.session = session
+
+    # Not committed here, so that the upload is saved in the same transaction
+    # as the user it belongs to
+    def enqueue(self, alt_user_id: str, image: bytes, extension: str) -> None:
+        now = datetime.datetime.utcnow()
+
+        self.session.add(
+            ProfileImageUpload(
+                alt_user_id=alt_user_id,
+                image=image,
+                extension=extension,
+                attempts=0,
+                next_attempt_at=now,
+                created_at=now,
+            )
+        )
+
+    # Locks the due uploads, skipping the ones claimed by other workers, and
+    # pushes their next attempt back so that an upload interrupted by a crash
+    # is picked up again once the lease runs out
+    async def claim_due(self, limit: int, lease_until: datetime.datetime):
+        q = await self.session.execute(
+            select(
+                ProfileImageUpload.id,
+                ProfileImageUpload.alt_user_id,
+                ProfileImageUpload.image,
+                ProfileImageUpload.extension,
+                ProfileImageUpload.attempts,
+                exists()
+                .where(User.alt_user_id == ProfileImageUpload.alt_user_id)
+                .label("user_exists"),
+            )
+            .where(ProfileImageUpload.next_attempt_at <= datetime.datetime.utcnow())
+            .order_by(ProfileImageUpload.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True, of=ProfileImageUpload)
+        )
+        records = q.all()
+
+        if records:
+            q = update(ProfileImageUpload).where(
+                ProfileImageUpload.id.in_([record.id for record in records])
+            )
+            q = q.values(next_attempt_at=lease_until)
+
+            await self.session.execute(q)
+
+        return records
+
+    async def mark_failed(
+        self, id: int, attempts: int, error: str, next_attempt_at: datetime.datetime
+    ) -> None:
+        q = update(ProfileImageUpload).where(ProfileImageUpload.id == id)
+        q = q.values(attempts=attempts)
+        q = q.values(last_error=error[:1000])
+        q = q.values(next_attempt_at=next_attempt_at)
+
+        await self.session.execute(q)
+
+    async def delete_upload(self, id: int) -> None:
+        await self.session.execute(
+            delete(ProfileImageUpload).where(ProfileImageUpload.id == id)
+        )
+
+    async def delete_user_uploads(self, alt_user_id: str) -> None:
+        await self.session.execute(
+            delete(ProfileImageUpload).where(
+                ProfileImageUpload.alt_user_id == alt_user_id
+            )
+        )
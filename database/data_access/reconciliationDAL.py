@@ -0,0 +1,242 @@
+import datetime
+from typing import List
+
+from sqlalchemy import BigInteger
+from sqlalchemy import cast
+from sqlalchemy import Column
+from sqlalchemy import func
+from sqlalchemy import Index
+from sqlalchemy import insert
+from sqlalchemy import literal
+from sqlalchemy import MetaData
+from sqlalchemy import null
+from sqlalchemy import String
+from sqlalchemy import Table
+from sqlalchemy import update
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from database.models import ReconciliationMismatch
+from database.models import ReconciliationRun
+from database.models import RenewalPayment
+from database.models import User
+
+# Payments reported by the gateway for the current run. The table is
+# temporary, so it only exists on the connection of the run
+settlement_rows = Table(
+    "settlement_rows",
+    MetaData(),
+    Column("order_id", String(100), nullable=False),
+    Column("payment_id", String(100)),
+    Column("amount", BigInteger),
+    Index("ix_settlement_rows_order_id", "order_id"),
+    prefixes=["TEMPORARY"],
+)
+
+MISMATCH_COLUMNS = [
+    "run_id",
+    "kind",
+    "order_id",
+    "payment_id",
+    "user_id",
+    "email",
+    "settled_amount",
+    "payment_amount",
+]
+
+
+class ReconciliationDAL:
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def create_settlement_table(self) -> None:
+        connection = await self.session.connection()
+        await connection.run_sync(settlement_rows.create)
+
+    async def drop_settlement_table(self) -> None:
+        connection = await self.session.connection()
+        await connection.run_sync(settlement_rows.drop)
+
+    async def load_settlement_rows(self, rows: List[dict]) -> None:
+        await self.session.execute(insert(settlement_rows), rows)
+
+    async def create_run(
+        self, source: str, window_start: datetime.date, window_end: datetime.date
+    ) -> int:
+        run = ReconciliationRun(
+            run_at=datetime.datetime.utcnow(),
+            source=source,
+            window_start=window_start,
+            window_end=window_end,
+            settlement_rows=0,
+            mismatch_count=0,
+        )
+
+        self.session.add(run)
+        await self.session.flush()
+        return run.id
+
+    # Joins the settlement rows against the users and stores every mismatch of
+    # the run, one INSERT ... SELECT per kind of mismatch
+    async def record_mismatches(
+        self, run_id: int, window_start: datetime.date, window_end: datetime.date
+    ) -> int:
+        # An order can be settled in parts, e.g. when a payment is retried
+        settled = (
+            select(
+                settlement_rows.c.order_id,
+                func.min(settlement_rows.c.payment_id).label("payment_id"),
+                func.sum(settlement_rows.c.amount).label("amount"),
+            )
+            .group_by(settlement_rows.c.order_id)
+            .subquery("settled")
+        )
+
+        # Typed, as Postgres cannot infer the type of a bare parameter here
+        run = cast(literal(run_id), BigInteger)
+
+        joined = settled.join(User, User.razorpay_order_id == settled.c.order_id)
+
+        def settled_user_mismatches(kind: str):
+            return select(
+                run,
+                literal(kind),
+                settled.c.order_id,
+                settled.c.payment_id,
+                User.id,
+                User.email,
+                settled.c.amount,
+                User.payment_amount,
+            ).select_from(joined)
+
+        queries = [
+            # Paid at the gateway, not marked as paid
+            settled_user_mismatches("unpaid").where(User.payment_status == False),
+            # Renewals overwrite the amount, so only first payments are compared
+            settled_user_mismatches("amount").where(
+                User.payment_status == True,
+                User.date_renewed == None,
+                func.round(User.payment_amount * 100) != settled.c.amount,
+            ),
+            # Renewals keep their own orders and amounts
+            select(
+                run,
+                literal("amount"),
+                settled.c.order_id,
+                settled.c.payment_id,
+                RenewalPayment.user_id,
+                User.email,
+                settled.c.amount,
+                RenewalPayment.payment_amount,
+            )
+            .select_from(
+                settled.join(
+                    RenewalPayment, RenewalPayment.order_id == settled.c.order_id
+                ).outerjoin(User, User.id == RenewalPayment.user_id)
+            )
+            .where(func.round(RenewalPayment.payment_amount * 100) != settled.c.amount),
+            # Paid at the gateway for an order no user registered or renewed with
+            select(
+                run,
+                literal("unknown_order"),
+                settled.c.order_id,
+                settled.c.payment_id,
+                null(),
+                null(),
+                settled.c.amount,
+                null(),
+            )
+            .select_from(
+                settled.outerjoin(
+                    User, User.razorpay_order_id == settled.c.order_id
+                ).outerjoin(
+                    RenewalPayment, RenewalPayment.order_id == settled.c.order_id
+                )
+            )
+            .where(User.id == None, RenewalPayment.id == None),
+            # Marked as paid online, missing from the settlements
+            select(
+                run,
+                literal("not_settled"),
+                User.razorpay_order_id,
+                User.razorpay_payment_id,
+                User.id,
+                User.email,
+                null(),
+                User.payment_amount,
+            )
+            .select_from(
+                User.__table__.outerjoin(
+                    settled, settled.c.order_id == User.razorpay_order_id
+                )
+            )
+            .where(
+                settled.c.order_id == None,
+                User.payment_status == True,
+                User.payment_mode == "O",
+                User.razorpay_order_id != None,
+                User.date_created.between(window_start, window_end),
+            ),
+            # Renewed online, missing from the settlements
+            select(
+                run,
+                literal("not_settled"),
+                RenewalPayment.order_id,
+                RenewalPayment.payment_id,
+                RenewalPayment.user_id,
+                User.email,
+                null(),
+                RenewalPayment.payment_amount,
+            )
+            .select_from(
+                RenewalPayment.__table__.outerjoin(
+                    settled, settled.c.order_id == RenewalPayment.order_id
+                ).outerjoin(User, User.id == RenewalPayment.user_id)
+            )
+            .where(
+                settled.c.order_id == None,
+                RenewalPayment.date_renewed.between(window_start, window_end),
+            ),
+        ]
+
+        mismatch_count = 0
+
+        for query in queries:
+            result = await self.session.execute(
+                insert(ReconciliationMismatch).from_select(MISMATCH_COLUMNS, query)
+            )
+            mismatch_count += result.rowcount
+
+        return mismatch_count
+
+    async def finish_run(
+        self, run_id: int, settlement_row_count: int, mismatch_count: int
+    ) -> None:
+        q = update(ReconciliationRun).where(ReconciliationRun.id == run_id)
+        q = q.values(settlement_rows=settlement_row_count)
+        q = q.values(mismatch_count=mismatch_count)
+
+        await self.session.execute(q)
+
+    async def get_latest_run(self):
+        q = await self.session.execute(
+            select(ReconciliationRun).order_by(ReconciliationRun.id.desc()).limit(1)
+        )
+        return q.scalars().first()
+
+    async def get_mismatches(self, run_id: int, limit: int):
+        q = await self.session.execute(
+            select(ReconciliationMismatch)
+            .where(ReconciliationMismatch.run_id == run_id)
+            .order_by(ReconciliationMismatch.kind, ReconciliationMismatch.id)
+            .limit(limit)
+        )
+        return q.scalars().all()
+
+    async def count_mismatches_by_kind(self, run_id: int):
+        q = await self.session.execute(
+            select(ReconciliationMismatch.kind, func.count())
+            .where(ReconciliationMismatch.run_id == run_id)
+            .group_by(ReconciliationMismatch.kind)
+        )
+        return dict(q.all())
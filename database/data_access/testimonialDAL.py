@@ -4,13 +4,18 @@ from sqlalchemy import update
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
 
+from database.db import read_from_replica
 from database.models import Testimonial
+from helpers.cache import CONTENT_CACHE_TTL
+from helpers.cache import ttl_cache
 
 
 class TestimonialDAL:
     def __init__(self, session: Session):
         self.session = session
 
+    @ttl_cache(ttl=CONTENT_CACHE_TTL, method=True)
+    @read_from_replica()
     async def fetch_all_testimonials(self) -> List[Testimonial]:
         q = await self.session.execute(
             select(Testimonial)
@@ -48,3 +53,7 @@ class TestimonialDAL:
         q = q.values(approved=True)
 
         await self.session.execute(q)
+        await self.session.commit()
+
+        # Newly approved testimonials have to show up on the site right away
+        TestimonialDAL.fetch_all_testimonials.cache_clear()
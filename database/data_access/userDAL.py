@@ -1,16 +1,29 @@
 import datetime
+import operator
 import secrets
+from functools import reduce
+from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Tuple
 
 from sqlalchemy import and_
-from sqlalchemy import cast
-from sqlalchemy import Date
+from sqlalchemy import bindparam
+from sqlalchemy import column
 from sqlalchemy import delete
+from sqlalchemy import extract
+from sqlalchemy import func
+from sqlalchemy import or_
+from sqlalchemy import String
+from sqlalchemy import tuple_
 from sqlalchemy import update
+from sqlalchemy import values
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
 
+from database.data_access.paymentDAL import DIALECT_INSERTS
+from database.db import read_from_replica
+from database.models import RenewalPayment
 from database.models import User
 
 
@@ -22,6 +35,58 @@ class UserDAL:
         q = await self.session.execute(select(User).order_by(User.id))
         return q.scalars().all()
 
+    async def get_dashboard_totals(self):
+        # All the dashboard counters are computed in a single aggregate query
+        is_lifetime = User.membership_type == "Lifetime"
+        is_annual = User.membership_type == "Annual"
+        is_paid = User.payment_status == True
+        is_unpaid = User.payment_status == False
+        is_expired = User.membership_expired == True
+        is_active = User.membership_expired == False
+        is_manual = User.payment_mode == "M"
+        is_online = User.payment_mode == "O"
+
+        # Mirrors the "^[pay_]" pattern used to identify Razorpay payment ids
+        has_online_payment_id = func.substr(User.razorpay_payment_id, 1, 1).in_(
+            ["p", "a", "y", "_"]
+        )
+
+        q = await self.session.execute(
+            select(
+                func.count().filter(is_paid).label("successful_registrations"),
+                func.count()
+                .filter(is_unpaid, is_active, is_manual)
+                .label("pending_registrations"),
+                func.count().filter(is_lifetime, is_paid).label("life_members"),
+                func.count()
+                .filter(is_lifetime, is_unpaid, is_manual)
+                .label("pending_life_members"),
+                func.count()
+                .filter(is_annual, is_paid, is_active)
+                .label("annual_members"),
+                func.count()
+                .filter(is_annual, is_unpaid, is_active, is_manual)
+                .label("pending_annual_members"),
+                func.count()
+                .filter(is_annual, is_unpaid, is_expired)
+                .label("expired_memberships"),
+                func.coalesce(func.sum(User.payment_amount).filter(is_paid), 0).label(
+                    "total_amount"
+                ),
+                func.coalesce(
+                    func.sum(User.payment_amount).filter(is_lifetime, is_paid), 0
+                ).label("total_amount_lm"),
+                func.coalesce(
+                    func.sum(User.payment_amount).filter(is_annual, is_paid), 0
+                ).label("total_amount_am"),
+                func.count()
+                .filter(is_online, has_online_payment_id, is_paid)
+                .label("online_payments"),
+                func.count().filter(is_manual, is_paid).label("manual_payments"),
+            )
+        )
+        return q.one()
+
     async def create_user(
         self,
         prefix: str,
@@ -56,6 +121,7 @@ class UserDAL:
         id_card_url: str,
         membership_certificate_url: str,
         paid_amount: float,
+        profile_image_status: Optional[str] = None,
     ):
         new_user = User(
             prefix=prefix,
@@ -87,6 +153,7 @@ class UserDAL:
             alt_user_id=alt_user_id,
             membership_valid_upto=membership_valid_upto,
             profile_url=profile_url,
+            profile_image_status=profile_image_status,
             id_card_url=id_card_url,
             membership_certificate_url=membership_certificate_url,
             payment_amount=paid_amount,
@@ -119,6 +186,8 @@ class UserDAL:
         )
         return q.scalars().first()
 
+    # Falls back to the primary so that just registered members are found
+    @read_from_replica(fallback_on_empty=True)
     async def get_user_details_for_alt_id(self, alt_user_id: str) -> List[User]:
         q = await self.session.execute(
             select(User).where(User.alt_user_id == alt_user_id)
@@ -158,40 +227,112 @@ class UserDAL:
 
         await self.session.execute(q)
 
+    # Marks the users holding the given orders as paid, all in one statement.
+    # Takes a mapping of order id to payment id and returns the order ids that
+    # belong to a user
+    async def apply_payments(self, payments: Dict[str, str]) -> List[str]:
+        if not payments:
+            return []
+
+        if self.session.bind.dialect.name == "postgresql":
+            payment_values = values(
+                column("order_id", String),
+                column("payment_id", String),
+                name="payments",
+            ).data(list(payments.items()))
+
+            q = update(User).where(User.razorpay_order_id == payment_values.c.order_id)
+            q = q.values(payment_status=True)
+            q = q.values(razorpay_payment_id=payment_values.c.payment_id)
+            q = q.returning(User.razorpay_order_id)
+            q = q.execution_options(synchronize_session=False)
+
+            result = await self.session.execute(q)
+            return list(set(result.scalars().all()))
+
+        q = update(User.__table__).where(
+            User.razorpay_order_id == bindparam("payment_order_id")
+        )
+        q = q.values(payment_status=True)
+        q = q.values(razorpay_payment_id=bindparam("payment_payment_id"))
+
+        await self.session.execute(
+            q,
+            [
+                {"payment_order_id": order_id, "payment_payment_id": payment_id}
+                for order_id, payment_id in payments.items()
+            ],
+        )
+
+        q = await self.session.execute(
+            select(User.razorpay_order_id)
+            .where(User.razorpay_order_id.in_(list(payments)))
+            .distinct()
+        )
+        return q.scalars().all()
+
+    # Returns 0 when the user no longer exists
+    async def update_profile_image(
+        self, alt_user_id: str, profile_url: Optional[str], profile_image_status: str
+    ) -> int:
+        q = update(User).where(User.alt_user_id == alt_user_id)
+        q = q.values(profile_url=profile_url)
+        q = q.values(profile_image_status=profile_image_status)
+
+        result = await self.session.execute(q)
+        return result.rowcount
+
     async def update_manual_payment_notification(self, email: str) -> None:
         q = update(User).where(User.email == email)
         q = q.values(manual_payment_notification=True)
 
         await self.session.execute(q)
 
-    async def get_registered_members(
-        self, member_type: str, payment: int
-    ) -> List[User]:
-        q = await self.session.execute(
-            select(User)
-            .where(
-                User.membership_type == member_type,
-                User.payment_status == bool(payment),
-                User.membership_expired == False,
-            )
-            .order_by(User.id.desc())
+    async def get_registered_members_page(
+        self,
+        member_type: str,
+        payment: int,
+        columns: List[str],
+        limit: int,
+        after: Optional[int] = None,
+    ):
+        q = select(*[getattr(User, column) for column in columns]).where(
+            User.membership_type == member_type,
+            User.payment_status == bool(payment),
+            User.membership_expired == False,
         )
-        return q.scalars().all()
 
-    async def get_registered_pending_members(
-        self, member_type: str, payment: int
-    ) -> List[User]:
-        q = await self.session.execute(
-            select(User)
-            .where(
-                User.membership_type == member_type,
-                User.payment_status == bool(payment),
-                User.membership_expired == False,
-                User.payment_mode == "M",
-            )
-            .order_by(User.id.desc())
-        )
-        return q.scalars().all()
+        # Pending registrations are only listed for manual payments
+        if not payment:
+            q = q.where(User.payment_mode == "M")
+
+        # Keyset pagination - continue from the last id of the previous page
+        if after is not None:
+            q = q.where(User.id < after)
+
+        q = await self.session.execute(q.order_by(User.id.desc()).limit(limit))
+        return q.all()
+
+    async def stream_members(
+        self,
+        columns: List[str],
+        member_type: Optional[str] = None,
+        payment: Optional[int] = None,
+        partition_size: int = 500,
+    ):
+        q = select(*[getattr(User, column) for column in columns])
+
+        if member_type is not None:
+            q = q.where(User.membership_type == member_type)
+
+        if payment is not None:
+            q = q.where(User.payment_status == bool(payment))
+
+        # Rows are pulled from a server-side cursor one partition at a time
+        result = await self.session.stream(q.order_by(User.id))
+
+        async for partition in result.partitions(partition_size):
+            yield partition
 
     async def search_alumni(
         self,
@@ -212,6 +353,60 @@ class UserDAL:
 
         return q.scalars().all()
 
+    async def search_members(self, text: str, limit: int, offset: int):
+        searchable_columns = (User.first_name, User.last_name, User.profession)
+
+        # Every word has to match at least one of the searchable columns
+        terms = text.split()[:5]
+
+        if not terms:
+            return []
+
+        q = select(
+            User.prefix,
+            User.first_name,
+            User.last_name,
+            User.duration_end,
+            User.profession,
+            User.profile_url,
+        ).where(User.payment_status == True, User.membership_expired == False)
+
+        for term in terms:
+            pattern = term.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+            q = q.where(
+                or_(
+                    *[
+                        column.ilike(f"%{pattern}%", escape="!")
+                        for column in searchable_columns
+                    ]
+                )
+            )
+
+        if self.session.bind.dialect.name == "postgresql":
+            # The ILIKE predicates are served by the trigram indexes and the
+            # results are ranked by how closely each word matches a column
+            rank = reduce(
+                operator.add,
+                [
+                    func.greatest(
+                        *[
+                            func.coalesce(func.word_similarity(term, column), 0)
+                            for column in searchable_columns
+                        ]
+                    )
+                    for term in terms
+                ],
+            )
+
+            q = q.order_by(rank.desc(), User.id)
+        else:
+            # Fallback for databases without pg_trgm (e.g. SQLite)
+            q = q.order_by(User.last_name, User.first_name, User.id)
+
+        q = await self.session.execute(q.limit(limit).offset(offset))
+        return q.all()
+
     async def fetch_expired_members(self):
         q = await self.session.execute(
             select(User).where(
@@ -240,9 +435,15 @@ class UserDAL:
 
         await self.session.execute(q)
 
-    async def get_alumni_birthdays(self) -> List[User]:
-        q = await self.session.execute(select(User))
-        return q.scalars().all()
+    async def get_alumni_birthdays(self, month_days: List[Tuple[int, int]]):
+        q = await self.session.execute(
+            select(User.first_name, User.email, User.birthday).where(
+                tuple_(
+                    extract("month", User.birthday), extract("day", User.birthday)
+                ).in_(month_days)
+            )
+        )
+        return q.all()
 
     async def get_user_renewal_details(self, hash: str):
         q = await self.session.execute(
@@ -261,6 +462,8 @@ class UserDAL:
         membership_certificate_url: Optional[str],
         date_renewed: datetime.date,
         payment_mode,
+        razorpay_order_id: Optional[str] = None,
+        razorpay_payment_id: Optional[str] = None,
     ) -> None:
         q = update(User).where(User.email == email)
         q = q.values(membership_type=membership_type)
@@ -277,24 +480,65 @@ class UserDAL:
         q = q.values(payment_status=payment_mode == "O")
 
         await self.session.execute(q)
+
+        # Recorded so that the reconciliation can match the renewal's order. A
+        # renewal submitted again for the same order keeps the first record
+        if payment_mode == "O" and razorpay_order_id:
+            q = await self.session.execute(
+                select(User.id).where(User.email == email).order_by(User.id).limit(1)
+            )
+            user_id = q.scalar()
+
+            if user_id is not None:
+                insert = DIALECT_INSERTS[self.session.bind.dialect.name]
+
+                q = insert(RenewalPayment).values(
+                    user_id=user_id,
+                    order_id=razorpay_order_id,
+                    payment_id=razorpay_payment_id,
+                    payment_amount=payment_amount,
+                    date_renewed=date_renewed,
+                )
+                q = q.on_conflict_do_nothing(index_elements=["order_id"])
+
+                await self.session.execute(q)
+
         return email
 
     async def get_expiring_memberships(self, expiry_date: str):
         expiry_date = datetime.datetime.strptime(expiry_date, "%Y-%m-%d").date()
         q = await self.session.execute(
             select(User).where(
-                cast(User.membership_valid_upto, Date) == expiry_date,
                 User.membership_type == "Annual",
+                User.membership_valid_upto == expiry_date,
             )
         )
         return q.scalars().all()
 
+    async def get_expiring_memberships_for_dates(
+        self, expiry_dates: List[datetime.date]
+    ):
+        q = await self.session.execute(
+            select(
+                User.first_name,
+                User.email,
+                User.alt_user_id,
+                User.membership_valid_upto,
+            )
+            .where(
+                User.membership_type == "Annual",
+                User.membership_valid_upto.in_(expiry_dates),
+            )
+            .order_by(User.membership_valid_upto, User.id)
+        )
+        return q.all()
+
     async def get_recently_expired_memberships(self, today: str):
         today = datetime.datetime.strptime(today, "%Y-%m-%d").date()
         q = await self.session.execute(
             select(User).where(
-                (cast(User.membership_valid_upto, Date) - today) == -1,
                 User.membership_type == "Annual",
+                User.membership_valid_upto == today - datetime.timedelta(days=1),
                 User.renewal_hash != None,
             )
         )
@@ -310,6 +554,40 @@ class UserDAL:
         await self.session.execute(q)
         return renewal_hash
 
+    # Gives every user a renewal hash of their own. On PostgreSQL this is a
+    # single UPDATE ... FROM (VALUES ...) statement
+    async def create_renewal_hashes(self, emails: List[str]) -> Dict[str, str]:
+        renewal_hashes = {email: secrets.token_hex(48) for email in emails}
+
+        if not renewal_hashes:
+            return renewal_hashes
+
+        if self.session.bind.dialect.name == "postgresql":
+            hash_values = values(
+                column("email", String),
+                column("renewal_hash", String),
+                name="renewal_hashes",
+            ).data(list(renewal_hashes.items()))
+
+            q = update(User).where(User.email == hash_values.c.email)
+            q = q.values(renewal_hash=hash_values.c.renewal_hash)
+            q = q.execution_options(synchronize_session=False)
+
+            await self.session.execute(q)
+        else:
+            q = update(User.__table__).where(User.email == bindparam("hash_email"))
+            q = q.values(renewal_hash=bindparam("hash_value"))
+
+            await self.session.execute(
+                q,
+                [
+                    {"hash_email": email, "hash_value": renewal_hash}
+                    for email, renewal_hash in renewal_hashes.items()
+                ],
+            )
+
+        return renewal_hashes
+
     async def clear_renewal_hash(self, id: str):
         q = update(User).where(User.alt_user_id == id)
 
@@ -323,21 +601,28 @@ class UserDAL:
 
         await self.session.execute(q)
 
-    async def get_all_users_subscribed_to_emails(self):
-        q = await self.session.execute(
-            select(User).where(User.email_subscription_status == True)
-        )
+    async def mark_memberships_as_expired(self, emails: List[str]) -> int:
+        q = update(User).where(User.email.in_(emails))
+        q = q.values(payment_status=False, membership_expired=True)
+        q = q.execution_options(synchronize_session=False)
 
-        return q.scalars().all()
+        result = await self.session.execute(q)
+        return result.rowcount
 
-    async def get_all_users_for_bulk_email_send(self):
-        q = await self.session.execute(
-            select(User).where(
-                User.payment_status == True, User.membership_expired == False
-            )
-        )
+    # Distinct addresses of the users subscribed to emails, one partition at a
+    # time. Optionally limited to members whose membership is active
+    async def stream_subscribed_emails(
+        self, active_members_only: bool = False, partition_size: int = 1000
+    ):
+        q = select(User.email).where(User.email_subscription_status == True)
 
-        return q.scalars().all()
+        if active_members_only:
+            q = q.where(User.payment_status == True, User.membership_expired == False)
+
+        result = await self.session.stream(q.distinct().order_by(User.email))
+
+        async for partition in result.partitions(partition_size):
+            yield [record.email for record in partition]
 
     # async def update_user_details(
     #     self,
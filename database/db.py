@@ -2,12 +2,220 @@ import dotenv
 
 dotenv.load_dotenv()
 
+import asyncio
+import contextlib
+import functools
 import os
+import time
+import zlib
+from typing import Optional
+
+from sentry_sdk import capture_exception
+from sqlalchemy import BigInteger, func, literal, select
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+# Engine settings per deployment profile. Individual values can be overridden
+# through the DB_* environment variables
+ENGINE_PROFILES = {
+    "dev": {
+        "echo": True,
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_pre_ping": False,
+        "statement_cache_size": 100,
+    },
+    "test": {
+        "echo": False,
+        "pool_size": 2,
+        "max_overflow": 0,
+        "pool_timeout": 10,
+        "pool_recycle": -1,
+        "pool_pre_ping": False,
+        "statement_cache_size": 0,
+    },
+    "prod": {
+        "echo": False,
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_timeout": 10,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_cache_size": 500,
+    },
+}
+
+
+def env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+
+    if value is None or value == "":
+        return default
+
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+
+    return int(value) if value else default
+
+
+def engine_options(
+    database_uri: str, profile_name: str, connect_timeout: Optional[int] = None
+) -> dict:
+    if profile_name not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown database profile: {profile_name}")
+
+    profile = ENGINE_PROFILES[profile_name]
+
+    options = {
+        "future": True,
+        "echo": env_flag("DB_ECHO", profile["echo"]),
+    }
+
+    # SQLite (used for local testing) does not use a connection queue
+    if database_uri.startswith("sqlite"):
+        return options
+
+    options.update(
+        pool_size=env_int("DB_POOL_SIZE", profile["pool_size"]),
+        max_overflow=env_int("DB_MAX_OVERFLOW", profile["max_overflow"]),
+        pool_timeout=env_int("DB_POOL_TIMEOUT", profile["pool_timeout"]),
+        pool_recycle=env_int("DB_POOL_RECYCLE", profile["pool_recycle"]),
+        pool_pre_ping=env_flag("DB_POOL_PRE_PING", profile["pool_pre_ping"]),
+    )
+
+    if database_uri.startswith("postgresql+asyncpg"):
+        options["connect_args"] = {
+            "statement_cache_size": env_int(
+                "DB_STATEMENT_CACHE_SIZE", profile["statement_cache_size"]
+            )
+        }
+
+        if connect_timeout is not None:
+            options["connect_args"]["timeout"] = connect_timeout
+
+    return options
+
+
+database_profile = os.getenv("DATABASE_PROFILE") or "prod"
 
 engine = create_async_engine(
-    os.getenv("SQLALCHEMY_DATABASE_URI"), future=True, echo=True
+    os.getenv("SQLALCHEMY_DATABASE_URI"),
+    **engine_options(os.getenv("SQLALCHEMY_DATABASE_URI"), database_profile),
 )
 async_session = sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+
+# Sessions for pure reads. The connection runs in autocommit mode, so no
+# BEGIN/COMMIT round trips are made around the queries
+read_only_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+async_read_only_session = sessionmaker(
+    bind=read_only_engine, expire_on_commit=False, class_=AsyncSession
+)
 Base = declarative_base()
+
+# Optional read replica for the public read endpoints
+replica_database_uri = os.getenv("SQLALCHEMY_REPLICA_URI")
+
+replica_engine = (
+    create_async_engine(
+        replica_database_uri,
+        **engine_options(
+            replica_database_uri,
+            database_profile,
+            connect_timeout=env_int("DB_REPLICA_CONNECT_TIMEOUT", 2),
+        ),
+    ).execution_options(isolation_level="AUTOCOMMIT")
+    if replica_database_uri
+    else None
+)
+async_replica_session = (
+    sessionmaker(bind=replica_engine, expire_on_commit=False, class_=AsyncSession)
+    if replica_engine
+    else None
+)
+
+# After a failure the replica is skipped for this many seconds
+REPLICA_RETRY_SECONDS = env_int("DB_REPLICA_RETRY_SECONDS", 30)
+replica_unavailable_until = 0.0
+
+
+# Runs a DAL method against the read replica, falling back to the DAL's own
+# (primary) session if the replica is not configured or cannot be reached.
+# With fallback_on_empty, an empty result is also re-read from the primary
+# so that rows which have not replicated yet are still found. The replica read
+# goes through a DAL of its own, as the DAL's session is shared by the
+# concurrent calls of the request
+def read_from_replica(fallback_on_empty: bool = False):
+    def decorator(method):
+        @functools.wraps(method)
+        async def route_to_replica(self, *args, **kwargs):
+            global replica_unavailable_until
+
+            if (
+                async_replica_session is None
+                or time.monotonic() < replica_unavailable_until
+            ):
+                return await method(self, *args, **kwargs)
+
+            try:
+                async with async_replica_session() as session:
+                    result = await method(type(self)(session), *args, **kwargs)
+            except (DBAPIError, OSError, asyncio.TimeoutError) as e:
+                capture_exception(e)
+                replica_unavailable_until = time.monotonic() + REPLICA_RETRY_SECONDS
+                fallback = True
+            else:
+                fallback = fallback_on_empty and not result
+
+            if fallback:
+                return await method(self, *args, **kwargs)
+
+            return result
+
+        return route_to_replica
+
+    return decorator
+
+
+# Lets only one of several app processes do a piece of work. The session level
+# lock is held on a connection of its own, so the work done under it can
+# commit freely. Other databases (SQLite) always get the lock
+@contextlib.asynccontextmanager
+async def advisory_lock(name: str):
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+
+    # The CRC is unsigned, so it is bound as a bigint. asyncpg would send a
+    # plain int as int4, which half of the keys do not fit in
+    key = literal(zlib.crc32(name.encode()), BigInteger)
+
+    async with engine.connect() as conn:
+        locked = (await conn.execute(select(func.pg_try_advisory_lock(key)))).scalar()
+
+        try:
+            yield locked
+        finally:
+            if locked:
+                await conn.execute(select(func.pg_advisory_unlock(key)))
+
+
+def pool_status(db_engine=engine) -> dict:
+    pool = db_engine.sync_engine.pool
+
+    if not isinstance(pool, QueuePool):
+        return {}
+
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        # Negative while the pool has not yet opened all of its connections
+        "overflow": max(pool.overflow(), 0),
+    }
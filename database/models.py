@@ -5,19 +5,29 @@ from sqlalchemy import BigInteger
 from sqlalchemy import Boolean
 from sqlalchemy import Column
 from sqlalchemy import Date
+from sqlalchemy import DateTime
+from sqlalchemy import DDL
+from sqlalchemy import event
+from sqlalchemy import extract
 from sqlalchemy import Float
+from sqlalchemy import Index
 from sqlalchemy import Integer
+from sqlalchemy import JSON
+from sqlalchemy import LargeBinary
 from sqlalchemy import String
 from sqlalchemy.dialects.postgresql import UUID
 
 from database.db import Base
 
+# SQLite, used for local testing, only autoincrements INTEGER primary keys
+BigIntegerKey = BigInteger().with_variant(Integer, "sqlite")
+
 
 class Committee(Base):
 
     __tablename__ = "committee"
 
-    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
+    id = Column(BigIntegerKey, primary_key=True, index=True, autoincrement=True)
     name = Column(String(100), nullable=False)
     role = Column(String(50), nullable=False)
     designation = Column(String(50), nullable=False)
@@ -30,7 +40,7 @@ class Committee(Base):
 class Testimonial(Base):
     __tablename__ = "testimonials"
 
-    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
+    id = Column(BigIntegerKey, primary_key=True, index=True, autoincrement=True)
     name = Column(String(100), nullable=False)
     batch = Column(String(10), nullable=False)
     message = Column(String(1000), nullable=False)
@@ -44,7 +54,7 @@ class Testimonial(Base):
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
+    id = Column(BigIntegerKey, primary_key=True, index=True, autoincrement=True)
     prefix = Column(String(10), nullable=False)
     first_name = Column(String(50), nullable=False)
     last_name = Column(String(50), nullable=False)
@@ -76,6 +86,9 @@ class User(Base):
     renewal_hash = Column(String(200))
     alt_user_id = Column(String(50))
     profile_url = Column(String(500))
+    # pending while the uploaded profile image is being processed, then
+    # uploaded or failed
+    profile_image_status = Column(String(10))
     id_card_url = Column(String(500))
     membership_certificate_url = Column(String(500))
     payment_mode = Column(String(1), default="O")
@@ -84,14 +97,57 @@ class User(Base):
     manual_payment_notification = Column(Boolean, default=False)
     email_subscription_status = Column(Boolean, default=True)
 
+    __table_args__ = (
+        # Backs the expiring and expired annual membership lookups
+        Index(
+            "ix_users_membership_type_valid_upto",
+            "membership_type",
+            "membership_valid_upto",
+        ),
+        # Trigram indexes that back the ILIKE predicates of the alumni search
+        Index(
+            "ix_users_first_name_trgm",
+            "first_name",
+            postgresql_using="gin",
+            postgresql_ops={"first_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_users_last_name_trgm",
+            "last_name",
+            postgresql_using="gin",
+            postgresql_ops={"last_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_users_profession_trgm",
+            "profession",
+            postgresql_using="gin",
+            postgresql_ops={"profession": "gin_trgm_ops"},
+        ),
+    )
+
     def __repr__(self):
         return f"User({self.id}, {self.email}, {self.country})"
 
 
+# Expression index used by the daily birthday lookup
+Index(
+    "ix_users_birthday_month_day",
+    extract("month", User.birthday),
+    extract("day", User.birthday),
+)
+
+# The trigram operator classes are provided by the pg_trgm extension
+event.listen(
+    User.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
 class FamousAlumni(Base):
     __tablename__ = "famous_alumni"
 
-    id = Column(BigInteger, primary_key=True, autoincrement=True, index=True)
+    id = Column(BigIntegerKey, primary_key=True, autoincrement=True, index=True)
     name = Column(String(100))
     award = Column(String(100))
     year = Column(String(4))
@@ -104,6 +160,21 @@ class FamousAlumni(Base):
         return f"FamousAlumni({self.id}, {self.name})"
 
 
+class GalleryImage(Base):
+
+    __tablename__ = "gallery_images"
+
+    file_id = Column(String(50), primary_key=True)
+    url = Column(String(500), nullable=False)
+    width = Column(Integer)
+    height = Column(Integer)
+    position = Column(Integer, nullable=False, index=True)
+    refreshed_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"GalleryImage({self.file_id})"
+
+
 class Admin(Base):
     __tablename__ = "admin"
 
@@ -123,6 +194,12 @@ class Job(Base):
     job_name = Column(String(50), nullable=False)
     job_id = Column(Integer, nullable=False)
     job_last_runtime = Column(Date, nullable=False)
+    # Outcome of the last run made by the built in scheduler
+    last_run_started_at = Column(DateTime)
+    last_run_duration_ms = Column(Integer)
+    last_run_rows = Column(Integer)
+    last_run_status = Column(String(10))
+    last_run_error = Column(String(1000))
 
     def __repr__(self):
         return f"Job({self.job_name}, {self.job_last_runtime})"
@@ -139,6 +216,141 @@ class Event(Base):
     event_date = Column(Date, nullable=False)
     event_time = Column(String(10), nullable=False)
     chief_guest = Column(String(500))
+    cover_photo_url = Column(String(500))
 
     def __repr__(self):
         return f"Event({self.name})"
+
+
+class EmailOutbox(Base):
+
+    __tablename__ = "email_outbox"
+
+    id = Column(BigIntegerKey, primary_key=True, autoincrement=True)
+    # The SendGrid v3 request body of the email
+    message = Column(JSON, nullable=False)
+    category = Column(String(50), nullable=False)
+    # Groups the batches of a bulk send
+    campaign = Column(String(50), index=True)
+    recipient_count = Column(Integer, nullable=False, default=1)
+    # pending until the email is sent, dead once it can no longer be sent
+    status = Column(String(10), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    last_error = Column(String(1000))
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    sent_at = Column(DateTime)
+
+    __table_args__ = (
+        # Backs the worker's lookup of the emails that are due
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    def __repr__(self):
+        return f"EmailOutbox({self.id}, {self.category}, {self.status})"
+
+
+class ProfileImageUpload(Base):
+
+    __tablename__ = "profile_image_uploads"
+
+    id = Column(BigIntegerKey, primary_key=True, autoincrement=True)
+    alt_user_id = Column(String(50), nullable=False, index=True)
+    # The processed image, kept until it is uploaded to ImageKit. The row is
+    # deleted once the upload succeeds or is given up
+    image = Column(LargeBinary, nullable=False)
+    extension = Column(String(10), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    last_error = Column(String(1000))
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"ProfileImageUpload({self.id}, {self.alt_user_id})"
+
+
+class PaymentEvent(Base):
+
+    __tablename__ = "payment_events"
+
+    id = Column(BigIntegerKey, primary_key=True, autoincrement=True)
+    # Razorpay sends the same event again until it is acknowledged, the id
+    # keeps every event to a single row
+    event_id = Column(String(100), nullable=False, unique=True)
+    event = Column(String(50), nullable=False)
+    order_id = Column(String(100))
+    payment_id = Column(String(100))
+    payload = Column(JSON, nullable=False)
+    # pending until it is applied to the users, unmatched when no user has the
+    # order after the last attempt and ignored for events that do not confirm a
+    # payment
+    status = Column(String(10), nullable=False, default="pending")
+    # The event can arrive before the order is saved, so an unmatched event is
+    # tried again until it runs out of attempts
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime)
+    received_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    applied_at = Column(DateTime)
+
+    __table_args__ = (
+        # Backs the worker's lookup of the pending events
+        Index("ix_payment_events_status_id", "status", "id"),
+    )
+
+    def __repr__(self):
+        return f"PaymentEvent({self.event_id}, {self.event}, {self.status})"
+
+
+class RenewalPayment(Base):
+
+    __tablename__ = "renewal_payments"
+
+    id = Column(BigIntegerKey, primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, nullable=False, index=True)
+    # A renewal paid online has an order of its own, the user keeps the order
+    # of the registration
+    order_id = Column(String(100), nullable=False, unique=True)
+    payment_id = Column(String(100))
+    payment_amount = Column(Float, nullable=False)
+    date_renewed = Column(Date, nullable=False)
+
+    def __repr__(self):
+        return f"RenewalPayment({self.order_id}, {self.user_id})"
+
+
+class ReconciliationRun(Base):
+
+    __tablename__ = "reconciliation_runs"
+
+    id = Column(BigIntegerKey, primary_key=True, autoincrement=True)
+    run_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    # export or gateway
+    source = Column(String(20), nullable=False)
+    # Registrations made in this window are expected in the settlements
+    window_start = Column(Date, nullable=False)
+    window_end = Column(Date, nullable=False)
+    settlement_rows = Column(Integer, nullable=False, default=0)
+    mismatch_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"ReconciliationRun({self.id}, {self.run_at})"
+
+
+class ReconciliationMismatch(Base):
+
+    __tablename__ = "reconciliation_mismatches"
+
+    id = Column(BigIntegerKey, primary_key=True, autoincrement=True)
+    run_id = Column(BigInteger, nullable=False, index=True)
+    # unpaid, not_settled, amount or unknown_order
+    kind = Column(String(20), nullable=False)
+    order_id = Column(String(100))
+    payment_id = Column(String(100))
+    user_id = Column(BigInteger)
+    email = Column(String(50))
+    # In paise, as reported by the gateway
+    settled_amount = Column(BigInteger)
+    payment_amount = Column(Float)
+
+    def __repr__(self):
+        return f"ReconciliationMismatch({self.kind}, {self.order_id})"
@@ -4,7 +4,11 @@ if [ $TRAVIS_BRANCH == 'main' ] ; then
   eval "$(ssh-agent -s)"
   ssh-add ~/.ssh/id_rsa
 
-  rsync -a --exclude={"tests","deploy.sh","travis_rsa.enc","alembic","alembic.ini","isort.cfg"} * travis@143.244.132.151:/home/mesalumni/mesalumni-api
+  rsync -a --exclude={"tests","deploy.sh","travis_rsa.enc","isort.cfg"} * travis@143.244.132.151:/home/mesalumni/mesalumni-api
+
+  # The api does not create or alter the tables itself, so the schema is
+  # brought up to date on every deploy. A failed migration fails the deploy
+  ssh travis@143.244.132.151 "cd /home/mesalumni/mesalumni-api && venv/bin/alembic upgrade head"
   echo "Deployed successfully!"
 else
   echo "Not deploying, since the branch isn't main."
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import Header
+from fastapi import HTTPException
+from fastapi import status
+from jose import jwt
+from jose.exceptions import JWTError
+
+# Number of verified admin tokens remembered by each process
+ADMIN_TOKEN_CACHE_SIZE = int(os.getenv("ADMIN_TOKEN_CACHE_SIZE") or 1024)
+
+
+# Verifies admin tokens, remembering the ones already verified until they
+# expire so that a dashboard making many calls with the same token only pays
+# for the signature check once. Tokens are kept by their digest, never in
+# clear. Revocations are kept in memory and only apply to this process
+class AdminTokenVerifier:
+    def __init__(self, secret_key: str, algorithm: str, admin_uuid: str, maxsize: int):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.admin_uuid = admin_uuid
+        self.maxsize = maxsize
+        self._verified = OrderedDict()
+        self._revoked = {}
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    # Returns the expiry of a valid admin token, None otherwise
+    def _decode(self, token: str) -> Optional[float]:
+        try:
+            claims = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except JWTError:
+            return None
+
+        if claims.get("sub") != self.admin_uuid or "exp" not in claims:
+            return None
+
+        return claims["exp"]
+
+    def verify(self, token: str) -> bool:
+        digest = self.digest(token)
+
+        if digest in self._revoked:
+            return False
+
+        exp = self._verified.get(digest)
+
+        if exp is None:
+            exp = self._decode(token)
+
+            if exp is None:
+                return False
+
+            self._verified[digest] = exp
+
+            while len(self._verified) > self.maxsize:
+                self._verified.popitem(last=False)
+
+        if time.time() >= exp:
+            del self._verified[digest]
+            return False
+
+        self._verified.move_to_end(digest)
+        return True
+
+    # The token stays revoked until it would have expired anyway
+    def revoke(self, token: str) -> None:
+        digest = self.digest(token)
+        exp = self._verified.pop(digest, None) or self._decode(token)
+
+        if exp is None:
+            return
+
+        now = time.time()
+
+        self._revoked = {
+            revoked: revoked_exp
+            for revoked, revoked_exp in self._revoked.items()
+            if revoked_exp > now
+        }
+        self._revoked[digest] = exp
+
+
+# The key material is read once, on first use
+@lru_cache(maxsize=None)
+def admin_token_verifier():
+    return AdminTokenVerifier(
+        os.getenv("SECRET_KEY"),
+        os.getenv("ALGORITHM"),
+        os.getenv("ADMIN_UUID"),
+        ADMIN_TOKEN_CACHE_SIZE,
+    )
+
+
+# Dependency of the admin routes. Returns the verified token
+async def require_admin(authorization: Optional[str] = Header(None)) -> str:
+    token = authorization
+
+    if token and token.lower().startswith("bearer "):
+        token = token[len("bearer ") :]
+
+    if not token or not admin_token_verifier().verify(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Uh uh uh... You didn't say the magic word",
+        )
+
+    return token
@@ -0,0 +1,89 @@
+import datetime
+import os
+import secrets
+from typing import AsyncIterator
+from typing import Callable
+from typing import List
+
+from sendgrid.helpers.mail import Mail
+from sendgrid.helpers.mail import Personalization
+from sendgrid.helpers.mail import To
+
+from database.data_access.outboxDAL import OutboxDAL
+from helpers.email_outbox import enqueue_mail
+
+# SendGrid accepts at most 1000 personalizations per request
+MAX_PERSONALIZATIONS = 1000
+
+BULK_MAIL_BATCH_SIZE = min(
+    int(os.getenv("BULK_MAIL_BATCH_SIZE") or MAX_PERSONALIZATIONS),
+    MAX_PERSONALIZATIONS,
+)
+
+
+def new_campaign_id(category: str) -> str:
+    return (
+        f"{category}-{datetime.datetime.utcnow():%Y%m%d%H%M%S}-{secrets.token_hex(3)}"
+    )
+
+
+# Every recipient gets a personalization of their own, so recipients never
+# see each other's addresses
+def personalized_message(
+    build_message: Callable[[], Mail], recipients: List[str], template_data: dict
+) -> Mail:
+    message = build_message()
+
+    for recipient in recipients:
+        personalization = Personalization()
+        personalization.add_to(To(recipient))
+        personalization.dynamic_template_data = template_data
+
+        message.add_personalization(personalization)
+
+    return message
+
+
+async def chunk_recipients(
+    recipient_partitions: AsyncIterator[List[str]], size: int
+) -> AsyncIterator[List[str]]:
+    chunk = []
+
+    async for recipients in recipient_partitions:
+        for recipient in recipients:
+            chunk.append(recipient)
+
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+
+    if chunk:
+        yield chunk
+
+
+# Queues one outbox email per batch of recipients. The outbox worker sends the
+# batches with its rate limit and retries, and records the result of each
+# batch under the returned campaign id
+async def enqueue_bulk_mail(
+    outboxDAL: OutboxDAL,
+    recipient_partitions: AsyncIterator[List[str]],
+    build_message: Callable[[], Mail],
+    template_data: dict,
+    category: str,
+) -> dict:
+    campaign = new_campaign_id(category)
+
+    batches = 0
+    recipient_count = 0
+
+    async for recipients in chunk_recipients(
+        recipient_partitions, BULK_MAIL_BATCH_SIZE
+    ):
+        message = personalized_message(build_message, recipients, template_data)
+
+        await enqueue_mail(outboxDAL, [message], category, campaign)
+
+        batches += 1
+        recipient_count += len(recipients)
+
+    return {"campaign": campaign, "batches": batches, "recipients": recipient_count}
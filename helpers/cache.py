@@ -0,0 +1,78 @@
+import asyncio
+import functools
+import os
+import time
+from collections import OrderedDict
+
+# Lifetime (in seconds) of cached content that rarely changes, e.g. the
+# committee, famous alumni and testimonials
+CONTENT_CACHE_TTL = int(os.getenv("CONTENT_CACHE_TTL") or 3600)
+
+
+class AsyncTTLCache:
+    def __init__(self, ttl: float, maxsize: int = 128):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._generation = 0
+
+    async def get_or_load(self, key, loader):
+        entry = self._entries.get(key)
+
+        if entry and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            return entry[1]
+
+        # Concurrent misses for the same key wait on a single load
+        task = self._pending.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._pending[key] = task
+
+        return await asyncio.shield(task)
+
+    async def _load(self, key, loader):
+        generation = self._generation
+
+        try:
+            value = await loader()
+
+            # Values loaded before an invalidation are not cached
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(key)
+
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+            return value
+        finally:
+            if self._pending.get(key) is asyncio.current_task():
+                del self._pending[key]
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+        self._pending.clear()
+
+
+# Caches the results of a coroutine function. For methods, pass method=True so
+# that the instance is left out of the cache key
+def ttl_cache(ttl: float, maxsize: int = 128, method: bool = False):
+    cache = AsyncTTLCache(ttl, maxsize)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def cached(*args, **kwargs):
+            key = (args[1:] if method else args, tuple(sorted(kwargs.items())))
+
+            return await cache.get_or_load(key, lambda: fn(*args, **kwargs))
+
+        cached.cache = cache
+        cached.cache_clear = cache.clear
+
+        return cached
+
+    return decorator
@@ -0,0 +1,118 @@
+import calendar
+import datetime
+import os
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy.orm import Session
+
+from database.data_access.outboxDAL import OutboxDAL
+from database.data_access.userDAL import UserDAL
+from helpers.email_outbox import enqueue_mail
+from helpers.email_templates import birthday_message
+from helpers.email_templates import expired_membership_message
+from helpers.email_templates import renewal_message
+from helpers.reconciliation import reconcile_payments
+
+# Annual members are reminded this many days before their membership expires
+RENEWAL_REMINDER_DAYS = [30, 15, 7, 1]
+
+
+# Maps every (month, day) birthday in the window to the date it is celebrated on
+def birthday_window(start: datetime.date, days_ahead: int):
+    window = {}
+
+    for offset in range(days_ahead + 1):
+        day = start + datetime.timedelta(days=offset)
+        window[(day.month, day.day)] = day
+
+        # Alumni born on 29th February are wished on the 28th in non-leap years
+        if day.month == 2 and day.day == 28 and not calendar.isleap(day.year):
+            window[(2, 29)] = day
+
+    return window
+
+
+def renewal_url(alt_user_id: str, renewal_hash: str) -> str:
+    return f"{os.getenv('SITE_DOMAIN')}/renewal/{alt_user_id}-{renewal_hash}"
+
+
+# Each job does the whole daily run on the given session and returns the
+# number of alumni it processed. The emails are queued in the outbox in the
+# same transaction as the updates they describe
+async def send_birthday_emails(session: Session) -> int:
+    window = birthday_window(datetime.date.today(), 0)
+
+    records = await UserDAL(session).get_alumni_birthdays(list(window.keys()))
+
+    if not records:
+        return 0
+
+    messages = [birthday_message(record.email, record.first_name) for record in records]
+
+    return await enqueue_mail(OutboxDAL(session), messages, "birthday")
+
+
+async def send_renewal_reminders(session: Session) -> int:
+    userDAL = UserDAL(session)
+
+    today = datetime.date.today()
+
+    expiry_dates = {
+        today + relativedelta(days=days_remaining): days_remaining
+        for days_remaining in RENEWAL_REMINDER_DAYS
+    }
+
+    records = await userDAL.get_expiring_memberships_for_dates(
+        list(expiry_dates.keys())
+    )
+
+    if not records:
+        return 0
+
+    renewal_hashes = await userDAL.create_renewal_hashes(
+        [record.email for record in records]
+    )
+
+    messages = [
+        renewal_message(
+            record.email,
+            record.first_name.title(),
+            expiry_dates[record.membership_valid_upto],
+            renewal_url(record.alt_user_id, renewal_hashes[record.email]),
+        )
+        for record in records
+    ]
+
+    return await enqueue_mail(OutboxDAL(session), messages, "renewal")
+
+
+async def expire_memberships(session: Session) -> int:
+    userDAL = UserDAL(session)
+
+    records = await userDAL.get_recently_expired_memberships(
+        datetime.date.today().strftime("%Y-%m-%d")
+    )
+
+    if not records:
+        return 0
+
+    await userDAL.mark_memberships_as_expired([record.email for record in records])
+
+    messages = [
+        expired_membership_message(
+            record.email,
+            record.first_name.title(),
+            renewal_url(record.alt_user_id, record.renewal_hash),
+        )
+        for record in records
+    ]
+
+    return await enqueue_mail(OutboxDAL(session), messages, "expired_membership")
+
+
+DAILY_JOBS = {
+    "birthdays": send_birthday_emails,
+    "renewal_reminders": send_renewal_reminders,
+    "membership_expiry": expire_memberships,
+    "payment_reconciliation": reconcile_payments,
+}
@@ -0,0 +1,180 @@
+import asyncio
+import datetime
+import os
+import random
+import time
+from typing import List
+from typing import Optional
+
+from sendgrid.helpers.mail import Mail
+from sentry_sdk import capture_exception
+
+from database.data_access.outboxDAL import OutboxDAL
+from database.db import async_session
+from helpers.mail_transport import MailDeliveryError
+from helpers.mail_transport import send_mail
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE") or 50)
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS") or 5)
+
+# Emails sent per second, across all batches
+OUTBOX_RATE_LIMIT = float(os.getenv("OUTBOX_RATE_LIMIT") or 10)
+
+# Failed sends are retried after OUTBOX_RETRY_SECONDS, doubling with every
+# attempt up to OUTBOX_MAX_RETRY_SECONDS. After OUTBOX_MAX_ATTEMPTS the email
+# is moved to the dead letter status
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS") or 8)
+OUTBOX_RETRY_SECONDS = int(os.getenv("OUTBOX_RETRY_SECONDS") or 30)
+OUTBOX_MAX_RETRY_SECONDS = int(os.getenv("OUTBOX_MAX_RETRY_SECONDS") or 3600)
+
+# Claimed emails are not handed to another worker for this long
+OUTBOX_LEASE_SECONDS = 300
+
+outbox_worker = None
+outbox_wakeup = None
+
+
+# Spaces out the sends evenly so that bursts stay within the rate limit
+class RateLimiter:
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self.next_slot = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(self.next_slot, now) + self.interval
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def enqueue_mail(
+    outboxDAL: OutboxDAL,
+    messages: List[Mail],
+    category: str,
+    campaign: Optional[str] = None,
+):
+    count = await outboxDAL.enqueue(
+        [message.get() for message in messages], category, campaign
+    )
+
+    if outbox_wakeup:
+        outbox_wakeup.set()
+
+    return count
+
+
+# SendGrid rejects the request as a whole for client errors other than rate
+# limiting, so those are not retried
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, MailDeliveryError):
+        return error.status_code == 429 or error.status_code >= 500
+
+    return True
+
+
+def next_attempt_time(attempts: int) -> datetime.datetime:
+    delay = min(OUTBOX_RETRY_SECONDS * 2 ** (attempts - 1), OUTBOX_MAX_RETRY_SECONDS)
+
+    # Jitter keeps retries of a failed batch from arriving all at once
+    delay *= random.uniform(0.8, 1.2)
+
+    return datetime.datetime.utcnow() + datetime.timedelta(seconds=delay)
+
+
+async def send_outbox_message(record, rate_limiter: RateLimiter):
+    await rate_limiter.acquire()
+
+    try:
+        await send_mail(record.message)
+    except Exception as e:
+        return e
+
+
+async def drain_outbox_batch(rate_limiter: RateLimiter) -> int:
+    lease_until = datetime.datetime.utcnow() + datetime.timedelta(
+        seconds=OUTBOX_LEASE_SECONDS
+    )
+
+    async with async_session() as session:
+        async with session.begin():
+            records = await OutboxDAL(session).claim_due(OUTBOX_BATCH_SIZE, lease_until)
+
+    if not records:
+        return 0
+
+    errors = await asyncio.gather(
+        *[send_outbox_message(record, rate_limiter) for record in records]
+    )
+
+    async with async_session() as session:
+        async with session.begin():
+            outboxDAL = OutboxDAL(session)
+
+            sent_ids = [
+                record.id for record, error in zip(records, errors) if error is None
+            ]
+
+            if sent_ids:
+                await outboxDAL.mark_sent(sent_ids)
+
+            for record, error in zip(records, errors):
+                if error is None:
+                    continue
+
+                capture_exception(error)
+
+                attempts = record.attempts + 1
+
+                await outboxDAL.mark_failed(
+                    record.id,
+                    attempts,
+                    repr(error),
+                    next_attempt_time(attempts)
+                    if is_retryable(error) and attempts < OUTBOX_MAX_ATTEMPTS
+                    else None,
+                )
+
+    return len(records)
+
+
+async def run_outbox_worker():
+    rate_limiter = RateLimiter(OUTBOX_RATE_LIMIT)
+
+    while True:
+        outbox_wakeup.clear()
+
+        try:
+            processed = await drain_outbox_batch(rate_limiter)
+        except Exception as e:
+            capture_exception(e)
+            processed = 0
+
+        # A full batch means more emails are probably due
+        if processed == OUTBOX_BATCH_SIZE:
+            continue
+
+        try:
+            await asyncio.wait_for(outbox_wakeup.wait(), OUTBOX_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_outbox_worker():
+    global outbox_worker, outbox_wakeup
+
+    outbox_wakeup = asyncio.Event()
+    outbox_worker = asyncio.ensure_future(run_outbox_worker())
+
+
+async def stop_outbox_worker():
+    if outbox_worker:
+        outbox_worker.cancel()
+
+        try:
+            await outbox_worker
+        except asyncio.CancelledError:
+            pass
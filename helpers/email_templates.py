@@ -0,0 +1,46 @@
+import os
+
+from sendgrid.helpers.mail import Mail
+
+from helpers.random_messages import return_random_message
+
+
+def birthday_message(to_email: str, name: str) -> Mail:
+    message = Mail(from_email=os.getenv("CONTACT_EMAIL"), to_emails=to_email)
+
+    message.dynamic_template_data = {
+        "name": name,
+        "birthday_message": return_random_message(),
+    }
+
+    message.template_id = os.getenv("BIRTHDAY_EMAIL_TEMPLATE")
+
+    return message
+
+
+def renewal_message(to_email: str, name: str, days: int, renewal_url: str) -> Mail:
+    message = Mail(from_email=os.getenv("ADMIN_EMAIL"), to_emails=to_email)
+
+    message.dynamic_template_data = {
+        "name": name,
+        "days": days,
+        "day": days == 1,
+        "renewal_url": renewal_url,
+    }
+
+    message.template_id = os.getenv("RENEWAL_EMAIL_TEMPLATE")
+
+    return message
+
+
+def expired_membership_message(to_email: str, name: str, renewal_url: str) -> Mail:
+    message = Mail(from_email=os.getenv("ADMIN_EMAIL"), to_emails=to_email)
+
+    message.dynamic_template_data = {
+        "name": name,
+        "renewal_url": renewal_url,
+    }
+
+    message.template_id = os.getenv("MEMBERSHIP_EXPIRED_EMAIL_TEMPLATE")
+
+    return message
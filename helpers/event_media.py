@@ -0,0 +1,77 @@
+import asyncio
+import os
+import uuid
+from typing import Dict
+
+from sentry_sdk import capture_exception
+
+from database.data_access.eventDAL import EventDAL
+from database.db import async_session
+from helpers.cache import ttl_cache
+from helpers.imagekit_init import imagekit_client
+from helpers.imagekit_init import run_on_imagekit_executor
+
+# Lifetime (in seconds) of a resolved cover photo
+EVENT_MEDIA_CACHE_TTL = int(os.getenv("EVENT_MEDIA_CACHE_TTL") or 600)
+
+
+def event_folder(event_name: str):
+    formatted_name = event_name.split(" ")
+    formatted_name = ("-").join(formatted_name)
+
+    return f"MES-AA/Events/{formatted_name}"
+
+
+def fetch_cover_photo_url(folder: str):
+    cover_photo = imagekit_client().list_files(
+        {"path": f"{folder}/cover-photo", "limit": 1}
+    )
+
+    return (
+        cover_photo["response"][0]["url"] if len(cover_photo["response"]) != 0 else None
+    )
+
+
+def fetch_event_images(folder: str):
+    files = imagekit_client().list_files({"path": folder, "limit": 100})
+
+    return files["response"]
+
+
+@ttl_cache(ttl=EVENT_MEDIA_CACHE_TTL, maxsize=512)
+async def resolve_cover_photo(folder: str):
+    return await run_on_imagekit_executor(fetch_cover_photo_url, folder)
+
+
+# Resolves the cover photos of several events concurrently. A failed lookup
+# yields None (and is not cached) instead of failing the whole list
+async def resolve_cover_photos(event_names):
+    cover_photos = await asyncio.gather(
+        *[resolve_cover_photo(event_folder(name)) for name in event_names],
+        return_exceptions=True,
+    )
+
+    for index, cover_photo in enumerate(cover_photos):
+        if isinstance(cover_photo, Exception):
+            capture_exception(cover_photo)
+            cover_photos[index] = None
+
+    return cover_photos
+
+
+# Saves the cover photos resolved for a listing, so that the events are not
+# looked up on ImageKit again. The listing is read only, so they are written
+# in a transaction of their own
+async def store_cover_photos(cover_photos: Dict[uuid.UUID, str]):
+    if not cover_photos:
+        return
+
+    try:
+        async with async_session() as session:
+            async with session.begin():
+                eventDAL = EventDAL(session)
+
+                for id, cover_photo_url in cover_photos.items():
+                    await eventDAL.update_cover_photo_url(id, cover_photo_url)
+    except Exception as e:
+        capture_exception(e)
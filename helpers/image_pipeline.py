@@ -0,0 +1,126 @@
+import asyncio
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from PIL import ExifTags
+from PIL import Image
+
+# Uploads larger than this are rejected before they are decoded
+MAX_UPLOAD_BYTES = int(os.getenv("PROFILE_IMAGE_MAX_BYTES") or 10 * 1024 * 1024)
+
+# Profile images are downscaled to fit within a square of this size
+MAX_DIMENSION = int(os.getenv("PROFILE_IMAGE_MAX_DIMENSION") or 800)
+
+# Output profile of the processed image, WEBP or JPEG
+OUTPUT_FORMAT = (os.getenv("PROFILE_IMAGE_FORMAT") or "JPEG").upper()
+OUTPUT_QUALITY = int(os.getenv("PROFILE_IMAGE_QUALITY") or 85)
+
+OUTPUT_EXTENSIONS = {"JPEG": ".jpeg", "WEBP": ".webp"}
+
+if OUTPUT_FORMAT not in OUTPUT_EXTENSIONS:
+    raise ValueError(f"Unsupported profile image format: {OUTPUT_FORMAT}")
+
+# Pillow releases the GIL while decoding, resizing and encoding, so a thread
+# pool keeps the event loop free without the cost of pickling images
+image_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("IMAGE_PIPELINE_MAX_WORKERS") or 2),
+    thread_name_prefix="image-pipeline",
+)
+
+
+class UploadTooLargeError(Exception):
+    pass
+
+
+class ProcessedImage(NamedTuple):
+    file: io.BytesIO
+    extension: str
+    timings: dict
+
+
+async def read_upload(upload) -> bytes:
+    # Read one byte past the limit to tell a file of exactly the limit apart
+    # from a larger one
+    data = await upload.read(MAX_UPLOAD_BYTES + 1)
+
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise UploadTooLargeError
+
+    return data
+
+
+# This function is mainly for images clicked on phones where the exif data causes image rotation
+def fix_image_orientation(optimized_image):
+    # sourcery skip: remove-unnecessary-else, swap-if-else-branches
+    for orientation in ExifTags.TAGS.keys():
+        if ExifTags.TAGS[orientation] == "Orientation":
+            break
+
+    exif = optimized_image.getexif()
+
+    if exif:
+        if 274 in exif.keys():
+            if exif[274] == 3:
+                optimized_image = optimized_image.rotate(180, expand=True)
+            elif exif[274] == 6:
+                optimized_image = optimized_image.rotate(270, expand=True)
+            elif exif[274] == 8:
+                optimized_image = optimized_image.rotate(90, expand=True)
+    else:
+        return optimized_image
+
+    return optimized_image
+
+
+def elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def optimize_image(data: bytes) -> ProcessedImage:
+    timings = {}
+
+    start = time.perf_counter()
+    image = Image.open(io.BytesIO(data))
+
+    # For JPEGs the decoder itself scales down by 1/2, 1/4 or 1/8, so a large
+    # phone photo is never decoded at full resolution
+    image.draft("RGB", (MAX_DIMENSION, MAX_DIMENSION))
+    image.load()
+    timings["decode"] = elapsed_ms(start)
+
+    # thumbnail() does a cheap reduce() before the final resample and keeps the
+    # aspect ratio
+    start = time.perf_counter()
+    image.thumbnail((MAX_DIMENSION, MAX_DIMENSION), reducing_gap=3.0)
+    timings["resize"] = elapsed_ms(start)
+
+    # The bounding box is square, so rotating after the resize gives the same
+    # result on far fewer pixels
+    start = time.perf_counter()
+    image = fix_image_orientation(image)
+    timings["orient"] = elapsed_ms(start)
+
+    start = time.perf_counter()
+
+    # Only WebP can keep the alpha channel of e.g. PNG uploads
+    keep_alpha = OUTPUT_FORMAT == "WEBP" and "A" in image.getbands()
+    output_mode = "RGBA" if keep_alpha else "RGB"
+
+    if image.mode != output_mode:
+        image = image.convert(output_mode)
+
+    output = io.BytesIO()
+    image.save(output, format=OUTPUT_FORMAT, quality=OUTPUT_QUALITY, optimize=True)
+    output.seek(0)
+    timings["encode"] = elapsed_ms(start)
+
+    return ProcessedImage(output, OUTPUT_EXTENSIONS[OUTPUT_FORMAT], timings)
+
+
+async def process_image(data: bytes) -> ProcessedImage:
+    loop = asyncio.get_event_loop()
+
+    return await loop.run_in_executor(image_executor, optimize_image, data)
@@ -1,7 +1,21 @@
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
+import requests_async as requests
 from imagekitio import ImageKit
 
+from helpers.metrics import track_outbound
+
+IMAGEKIT_FOLDER_API = "https://api.imagekit.io/v1/folder/"
+
+# The ImageKit SDK is blocking, so its calls run on a bounded thread pool
+imagekit_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("IMAGEKIT_MAX_WORKERS") or 8),
+    thread_name_prefix="imagekit",
+)
+
 
 def initialize_imagekit():
     return ImageKit(
@@ -17,3 +31,35 @@ def initialize_imagekit_prod():
         public_key=os.getenv("IMAGEKIT_PUBLIC_KEY_PROD"),
         url_endpoint=os.getenv("IMAGEKIT_URL_ENDPOINT_PROD"),
     )
+
+
+# Shared client for the calls made on the executor
+@lru_cache(maxsize=None)
+def imagekit_client():
+    return initialize_imagekit_prod()
+
+
+async def run_on_imagekit_executor(fn, *args):
+    loop = asyncio.get_event_loop()
+
+    with track_outbound("imagekit", fn.__name__):
+        return await loop.run_in_executor(imagekit_executor, fn, *args)
+
+
+# The SDK has no folder calls, so the folders are managed through the API
+async def create_imagekit_folder(folder_name: str, parent_folder_path: str):
+    with track_outbound("imagekit", "create_folder"):
+        return await requests.post(
+            IMAGEKIT_FOLDER_API,
+            auth=(os.getenv("IMAGEKIT_PRIVATE_KEY_PROD") + ":", " "),
+            data={"folderName": folder_name, "parentFolderPath": parent_folder_path},
+        )
+
+
+async def delete_imagekit_folder(folder_path: str):
+    with track_outbound("imagekit", "delete_folder"):
+        return await requests.delete(
+            IMAGEKIT_FOLDER_API,
+            auth=(os.getenv("IMAGEKIT_PRIVATE_KEY_PROD") + ":", " "),
+            data={"folderPath": folder_path},
+        )
@@ -0,0 +1,104 @@
+import ipaddress
+import os
+import time
+from collections import deque
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Request
+
+LOGIN_WINDOW_SECONDS = int(os.getenv("LOGIN_WINDOW_SECONDS") or 300)
+LOGIN_MAX_ATTEMPTS_PER_IP = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_IP") or 20)
+LOGIN_MAX_ATTEMPTS_PER_EMAIL = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_EMAIL") or 5)
+
+# Addresses or networks of the reverse proxies in front of the api, comma
+# separated. X-Forwarded-For is only believed on requests coming from them
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip(), strict=False)
+    for proxy in (os.getenv("TRUSTED_PROXIES") or "").split(",")
+    if proxy.strip()
+]
+
+
+def is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+
+    return any(address in network for network in TRUSTED_PROXIES)
+
+
+# The address of the client the login attempt is counted against. Behind a
+# trusted proxy it is the last X-Forwarded-For entry the proxies did not add,
+# since the entries before it are sent by the client and can be anything
+def client_ip(request: Request) -> str:
+    host = request.client.host if request.client else "unknown"
+
+    if not is_trusted_proxy(host):
+        return host
+
+    forwarded_for = request.headers.get("x-forwarded-for", "")
+
+    for forwarded_host in reversed(forwarded_for.split(",")):
+        forwarded_host = forwarded_host.strip()
+
+        if not forwarded_host:
+            continue
+
+        if not is_trusted_proxy(forwarded_host):
+            return forwarded_host
+
+        host = forwarded_host
+
+    return host
+
+
+# Sliding window count of attempts per key. Only the most recently used keys
+# are kept, so a flood of distinct keys cannot grow it without bound. The
+# counts are per process
+class AttemptThrottle:
+    def __init__(self, max_attempts: int, window: float, maxsize: int = 10000):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.maxsize = maxsize
+        self._attempts = OrderedDict()
+
+    def _recent(self, key: str) -> deque:
+        attempts = self._attempts.get(key)
+
+        if attempts is None:
+            return deque()
+
+        cutoff = time.monotonic() - self.window
+
+        while attempts and attempts[0] <= cutoff:
+            attempts.popleft()
+
+        return attempts
+
+    # Seconds until the next attempt is allowed, or None if it is allowed now
+    def retry_after(self, key: str) -> Optional[float]:
+        attempts = self._recent(key)
+
+        if len(attempts) < self.max_attempts:
+            return None
+
+        return attempts[0] + self.window - time.monotonic()
+
+    def record(self, key: str):
+        attempts = self._recent(key)
+        attempts.append(time.monotonic())
+
+        self._attempts[key] = attempts
+        self._attempts.move_to_end(key)
+
+        while len(self._attempts) > self.maxsize:
+            self._attempts.popitem(last=False)
+
+    def reset(self, key: str):
+        self._attempts.pop(key, None)
+
+
+ip_throttle = AttemptThrottle(LOGIN_MAX_ATTEMPTS_PER_IP, LOGIN_WINDOW_SECONDS)
+email_throttle = AttemptThrottle(LOGIN_MAX_ATTEMPTS_PER_EMAIL, LOGIN_WINDOW_SECONDS)
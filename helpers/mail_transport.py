@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import urllib3
+
+from helpers.metrics import track_outbound
+
+# Upper bound on the number of emails being sent at the same time. It is also
+# the number of kept alive connections to SendGrid
+MAIL_MAX_CONCURRENCY = int(os.getenv("MAIL_MAX_CONCURRENCY") or 4)
+
+# Sends are blocking HTTP calls, so they run on a thread pool of their own
+mail_executor = ThreadPoolExecutor(
+    max_workers=MAIL_MAX_CONCURRENCY, thread_name_prefix="mail"
+)
+
+
+class MailDeliveryError(Exception):
+    def __init__(self, status_code: int, body: bytes):
+        super().__init__(f"Mail delivery failed with status {status_code}: {body}")
+        self.status_code = status_code
+        self.body = body
+
+
+# Posts to the SendGrid v3 API over a pool of kept alive HTTPS connections
+# instead of opening a new connection for every email
+class SendGridBackend:
+    name = "sendgrid"
+
+    def __init__(self):
+        self.api_key = os.getenv("SENDGRID_API_KEY")
+        self.pool = urllib3.HTTPSConnectionPool(
+            "api.sendgrid.com",
+            maxsize=MAIL_MAX_CONCURRENCY,
+            block=True,
+            timeout=urllib3.Timeout(connect=5, read=30),
+            # Only failed connections are retried, a request that reached
+            # SendGrid is never sent twice
+            retries=urllib3.Retry(total=2, read=0, redirect=0),
+        )
+
+    def send(self, message: dict) -> int:
+        response = self.pool.request(
+            "POST",
+            "/v3/mail/send",
+            body=json.dumps(message),
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+            },
+        )
+
+        if response.status >= 400:
+            raise MailDeliveryError(response.status, response.data)
+
+        return response.status
+
+    def close(self):
+        self.pool.close()
+
+
+# Writes each email as a JSON file instead of sending it. Meant for local
+# development and tests
+class FileBackend:
+    name = "file"
+
+    def __init__(self):
+        self.directory = os.getenv("MAIL_FILE_DIRECTORY") or "sent_emails"
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def send(self, message: dict) -> int:
+        file_name = f"{time.time_ns()}-{secrets.token_hex(4)}.json"
+
+        with open(os.path.join(self.directory, file_name), "w") as file:
+            json.dump(message, file, indent=2)
+
+        return 202
+
+    def close(self):
+        pass
+
+
+MAIL_BACKENDS = {
+    "sendgrid": SendGridBackend,
+    "file": FileBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def mail_backend():
+    backend_name = os.getenv("MAIL_BACKEND") or "sendgrid"
+
+    if backend_name not in MAIL_BACKENDS:
+        raise ValueError(f"Unknown mail backend: {backend_name}")
+
+    return MAIL_BACKENDS[backend_name]()
+
+
+# Takes the SendGrid v3 request body of the email, i.e. Mail.get()
+async def send_mail(message: dict) -> int:
+    loop = asyncio.get_event_loop()
+    backend = mail_backend()
+
+    with track_outbound(backend.name, "send"):
+        return await loop.run_in_executor(mail_executor, backend.send, message)
+
+
+def close_mail_transport():
+    if mail_backend.cache_info().currsize:
+        mail_backend().close()
+        mail_backend.cache_clear()
@@ -0,0 +1,256 @@
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Callable
+from typing import Dict
+from typing import Tuple
+
+from database.db import engine
+from database.db import pool_status
+from database.db import replica_engine
+
+# Latency buckets in seconds, shared by the request and outbound histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Label of requests that did not match any route, so that scans of random
+# paths do not create new series
+UNMATCHED_ROUTE = "unmatched"
+
+HTTP_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+
+    pairs = []
+
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        value = value.replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+
+        for label_values, value in sorted(self._values.items()):
+            yield f"{self.name}{format_labels(self.labels, label_values)} {value}"
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...],
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # Per label set, the count of every bucket (not cumulative), the sum
+        # and the total count
+        self._values = {}
+
+    def observe(self, value: float, *label_values):
+        series = self._values.get(label_values)
+
+        if series is None:
+            series = self._values[label_values] = [[0] * len(self.buckets), 0.0, 0]
+
+        index = bisect.bisect_left(self.buckets, value)
+
+        if index < len(self.buckets):
+            series[0][index] += 1
+
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+
+        for label_values, (bucket_counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = format_labels(
+                    self.labels + ("le",), label_values + (str(bound),)
+                )
+                yield f"{self.name}_bucket{labels} {cumulative}"
+
+            labels = format_labels(self.labels + ("le",), label_values + ("+Inf",))
+            yield f"{self.name}_bucket{labels} {count}"
+
+            labels = format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {total}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+# Read when the metrics are scraped instead of being recorded as they change
+class Gauge:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...],
+        collect: Callable[[], Dict[tuple, float]],
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.collect = collect
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+
+        for label_values, value in sorted(self.collect().items()):
+            yield f"{self.name}{format_labels(self.labels, label_values)} {value}"
+
+
+def collect_pool_status() -> Dict[tuple, float]:
+    engines = {"primary": engine}
+
+    if replica_engine is not None:
+        engines["replica"] = replica_engine
+
+    values = {}
+
+    for engine_name, db_engine in engines.items():
+        for stat, value in pool_status(db_engine).items():
+            values[(engine_name, stat)] = value
+
+    return values
+
+
+http_requests = Counter(
+    "http_requests_total",
+    "Requests handled, by route template and status code.",
+    ("method", "route", "status"),
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time taken to handle a request, by route template.",
+    ("method", "route"),
+)
+outbound_requests = Counter(
+    "outbound_requests_total",
+    "Calls made to external services.",
+    ("service", "operation", "outcome"),
+)
+outbound_request_duration = Histogram(
+    "outbound_request_duration_seconds",
+    "Time taken by calls to external services, including the wait for a thread.",
+    ("service", "operation"),
+)
+db_pool = Gauge(
+    "db_pool_connections",
+    "Connections of the database pools.",
+    ("engine", "state"),
+    collect_pool_status,
+)
+
+METRICS = [
+    http_requests,
+    http_request_duration,
+    outbound_requests,
+    outbound_request_duration,
+    db_pool,
+]
+
+
+# Times a call to ImageKit, SendGrid or Razorpay
+@contextmanager
+def track_outbound(service: str, operation: str):
+    start = time.perf_counter()
+    outcome = "error"
+
+    try:
+        yield
+        outcome = "success"
+    finally:
+        outbound_request_duration.observe(
+            time.perf_counter() - start, service, operation
+        )
+        outbound_requests.inc(service, operation, outcome)
+
+
+def render_metrics() -> str:
+    lines = []
+
+    for metric in METRICS:
+        lines.extend(metric.render())
+
+    return "\n".join(lines) + "\n"
+
+
+# The template of the route that handled the request, e.g. /users/{id}, so
+# that the labels are bounded by the number of routes and not by the paths
+route_templates = {}
+
+
+def route_template(scope) -> str:
+    endpoint = scope.get("endpoint")
+
+    if endpoint is None:
+        return UNMATCHED_ROUTE
+
+    if endpoint not in route_templates:
+        route_templates[endpoint] = next(
+            (
+                route.path
+                for route in scope["app"].routes
+                if getattr(route, "endpoint", None) is endpoint
+            ),
+            UNMATCHED_ROUTE,
+        )
+
+    return route_templates[endpoint]
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router adds the matched endpoint to the scope
+            route = route_template(scope)
+            method = scope["method"] if scope["method"] in HTTP_METHODS else "OTHER"
+
+            http_request_duration.observe(time.perf_counter() - start, method, route)
+            http_requests.inc(method, route, str(status_code))
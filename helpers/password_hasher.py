@@ -0,0 +1,21 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.hash import pbkdf2_sha256
+
+# PBKDF2 takes tens of milliseconds by design. hashlib releases the GIL while
+# it runs, so verifying on a small thread pool keeps the event loop free and
+# caps the CPU that login attempts can take
+password_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PASSWORD_HASH_MAX_WORKERS") or 2),
+    thread_name_prefix="password-hash",
+)
+
+
+async def verify_password(plain_text_password: str, password_hash: str) -> bool:
+    loop = asyncio.get_event_loop()
+
+    return await loop.run_in_executor(
+        password_executor, pbkdf2_sha256.verify, plain_text_password, password_hash
+    )
@@ -0,0 +1,153 @@
+import asyncio
+import datetime
+import hashlib
+import os
+from typing import Optional
+from typing import Tuple
+
+from sentry_sdk import capture_exception
+
+from database.data_access.paymentDAL import PaymentDAL
+from database.data_access.userDAL import UserDAL
+from database.db import async_session
+
+PAYMENT_EVENTS_BATCH_SIZE = int(os.getenv("PAYMENT_EVENTS_BATCH_SIZE") or 500)
+PAYMENT_EVENTS_POLL_SECONDS = float(os.getenv("PAYMENT_EVENTS_POLL_SECONDS") or 10)
+
+# Attempts made at matching an event to an order, and the delay before the
+# first retry. The delay doubles with every attempt, so the defaults keep an
+# unmatched event for about two hours
+PAYMENT_EVENTS_MATCH_ATTEMPTS = int(os.getenv("PAYMENT_EVENTS_MATCH_ATTEMPTS") or 8)
+PAYMENT_EVENTS_RETRY_SECONDS = int(os.getenv("PAYMENT_EVENTS_RETRY_SECONDS") or 60)
+
+# Webhook events that confirm a payment
+PAYMENT_CONFIRMED_EVENTS = {"payment.captured", "order.paid"}
+
+payment_events_worker = None
+payment_events_wakeup = None
+
+
+# Razorpay identifies deliveries in the X-Razorpay-Event-Id header. Without it
+# the body itself identifies the event
+def webhook_event_id(event_id_header: Optional[str], body: bytes) -> str:
+    return event_id_header or hashlib.sha256(body).hexdigest()
+
+
+# Returns the order and payment ids of the event, if it carries a payment
+def payment_ids(payload: dict) -> Tuple[Optional[str], Optional[str]]:
+    payment = payload.get("payload", {}).get("payment", {}).get("entity", {})
+
+    return payment.get("order_id"), payment.get("id")
+
+
+def wake_payment_events_worker():
+    if payment_events_wakeup:
+        payment_events_wakeup.set()
+
+
+def next_attempt_time(attempts: int) -> datetime.datetime:
+    delay = PAYMENT_EVENTS_RETRY_SECONDS * 2 ** (attempts - 1)
+
+    return datetime.datetime.utcnow() + datetime.timedelta(seconds=delay)
+
+
+# Claims a batch of pending events and applies them to the users in a single
+# statement, in one transaction
+async def apply_payment_events_batch() -> int:
+    async with async_session() as session:
+        async with session.begin():
+            paymentDAL = PaymentDAL(session)
+
+            events = await paymentDAL.claim_pending(PAYMENT_EVENTS_BATCH_SIZE)
+
+            if not events:
+                return 0
+
+            payments = {
+                event.order_id: event.payment_id
+                for event in events
+                if event.order_id and event.payment_id
+            }
+
+            matched_orders = set(await UserDAL(session).apply_payments(payments))
+
+            # Renewals are recorded when they are paid for, so their events
+            # only need to be matched
+            matched_orders.update(
+                await paymentDAL.get_renewal_orders(
+                    [
+                        order_id
+                        for order_id in payments
+                        if order_id not in matched_orders
+                    ]
+                )
+            )
+
+            applied_ids = [
+                event.id for event in events if event.order_id in matched_orders
+            ]
+            unmatched_ids = []
+            retried_ids = {}
+
+            for event in events:
+                if event.order_id in matched_orders:
+                    continue
+
+                attempts = event.attempts + 1
+
+                if event.order_id and attempts < PAYMENT_EVENTS_MATCH_ATTEMPTS:
+                    retried_ids.setdefault(attempts, []).append(event.id)
+                else:
+                    unmatched_ids.append(event.id)
+
+            if applied_ids:
+                await paymentDAL.mark_events(applied_ids, "applied")
+
+            if unmatched_ids:
+                await paymentDAL.mark_events(unmatched_ids, "unmatched")
+
+            for attempts, ids in retried_ids.items():
+                await paymentDAL.retry_events(
+                    ids, attempts, next_attempt_time(attempts)
+                )
+
+    return len(events)
+
+
+async def run_payment_events_worker():
+    while True:
+        payment_events_wakeup.clear()
+
+        try:
+            processed = await apply_payment_events_batch()
+        except Exception as e:
+            capture_exception(e)
+            processed = 0
+
+        # A full batch means more events are probably pending
+        if processed == PAYMENT_EVENTS_BATCH_SIZE:
+            continue
+
+        try:
+            await asyncio.wait_for(
+                payment_events_wakeup.wait(), PAYMENT_EVENTS_POLL_SECONDS
+            )
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_payment_events_worker():
+    global payment_events_worker, payment_events_wakeup
+
+    payment_events_wakeup = asyncio.Event()
+    payment_events_worker = asyncio.ensure_future(run_payment_events_worker())
+
+
+async def stop_payment_events_worker():
+    if payment_events_worker:
+        payment_events_worker.cancel()
+
+        try:
+            await payment_events_worker
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import razorpay
+import requests
+from razorpay.errors import SignatureVerificationError
+from requests.adapters import HTTPAdapter
+
+from helpers.cache import AsyncTTLCache
+from helpers.metrics import track_outbound
+
+# Upper bound on concurrent Razorpay calls. It is also the number of kept alive
+# connections to Razorpay
+PAYMENT_GATEWAY_MAX_WORKERS = int(os.getenv("PAYMENT_GATEWAY_MAX_WORKERS") or 4)
+
+# Seconds to wait for Razorpay before giving up on a call
+PAYMENT_GATEWAY_TIMEOUT = float(os.getenv("PAYMENT_GATEWAY_TIMEOUT") or 10)
+
+# Orders created for a receipt are handed out again for this long, so that a
+# retried checkout does not create a second order
+ORDER_CACHE_TTL = int(os.getenv("ORDER_CACHE_TTL") or 900)
+
+# The Razorpay SDK is blocking, so its calls run on a thread pool of their own
+payment_executor = ThreadPoolExecutor(
+    max_workers=PAYMENT_GATEWAY_MAX_WORKERS, thread_name_prefix="payment-gateway"
+)
+
+order_cache = AsyncTTLCache(ORDER_CACHE_TTL, maxsize=1024)
+
+
+class PaymentGatewayTimeout(Exception):
+    pass
+
+
+# Razorpay client sharing one requests session, so calls reuse kept alive
+# connections instead of a new TLS handshake every time
+class RazorpayGateway:
+    name = "razorpay"
+
+    def __init__(self):
+        session = requests.Session()
+        session.mount(
+            "https://",
+            HTTPAdapter(pool_connections=1, pool_maxsize=PAYMENT_GATEWAY_MAX_WORKERS),
+        )
+
+        self.client = razorpay.Client(
+            session=session,
+            auth=(os.getenv("RAZORPAY_KEY_ID"), os.getenv("RAZORPAY_KEY_SECRET")),
+        )
+        self.webhook_secret = os.getenv("RAZORPAY_VERIFICATION_SECRET")
+
+    def create_order(self, order_data: dict) -> dict:
+        return self.client.order.create(order_data, timeout=PAYMENT_GATEWAY_TIMEOUT)
+
+    # One page of the payments created between the two unix timestamps
+    def fetch_payments(self, since: int, until: int, skip: int, count: int) -> list:
+        return self.client.payment.all(
+            {"from": since, "to": until, "skip": skip, "count": count},
+            timeout=PAYMENT_GATEWAY_TIMEOUT,
+        )["items"]
+
+    # Raises SignatureVerificationError if the signature does not match
+    def verify_payment_signature(self, order_id: str, payment_id: str, signature: str):
+        self.client.utility.verify_payment_signature(
+            {
+                "razorpay_order_id": order_id,
+                "razorpay_payment_id": payment_id,
+                "razorpay_signature": signature,
+            }
+        )
+
+    # Raises SignatureVerificationError if the signature does not match
+    def verify_webhook_signature(self, body: bytes, signature: str):
+        self.client.utility.verify_webhook_signature(
+            body.decode(), signature, self.webhook_secret
+        )
+
+    def close(self):
+        self.client.session.close()
+
+
+# Creates orders locally, optionally after FAKE_GATEWAY_LATENCY_MS, and signs
+# payments the same way as Razorpay. Meant for local development, tests and
+# benchmarks
+class FakeGateway:
+    name = "fake"
+
+    def __init__(self):
+        self.key_secret = os.getenv("RAZORPAY_KEY_SECRET") or "fake_secret"
+        self.webhook_secret = (
+            os.getenv("RAZORPAY_VERIFICATION_SECRET") or "fake_webhook_secret"
+        )
+        self.latency = float(os.getenv("FAKE_GATEWAY_LATENCY_MS") or 0) / 1000
+        self.payments = []
+
+    def create_order(self, order_data: dict) -> dict:
+        if self.latency:
+            time.sleep(self.latency)
+
+        return {
+            "id": f"order_{secrets.token_hex(7)}",
+            "entity": "order",
+            "amount": order_data["amount"],
+            "amount_paid": 0,
+            "amount_due": order_data["amount"],
+            "currency": order_data["currency"],
+            "receipt": order_data["receipt"],
+            "status": "created",
+            "attempts": 0,
+            "notes": order_data.get("notes") or [],
+            "created_at": int(time.time()),
+        }
+
+    # Records a captured payment for the order, as if the member had paid
+    def capture_payment(self, order_id: str, amount: int) -> dict:
+        payment = {
+            "id": f"pay_{secrets.token_hex(7)}",
+            "entity": "payment",
+            "amount": amount,
+            "currency": "INR",
+            "status": "captured",
+            "order_id": order_id,
+            "created_at": int(time.time()),
+        }
+
+        self.payments.append(payment)
+        return payment
+
+    def fetch_payments(self, since: int, until: int, skip: int, count: int) -> list:
+        payments = [
+            payment
+            for payment in self.payments
+            if since <= payment["created_at"] <= until
+        ]
+
+        return payments[skip : skip + count]
+
+    def sign_payment(self, order_id: str, payment_id: str) -> str:
+        return hmac.new(
+            self.key_secret.encode(),
+            f"{order_id}|{payment_id}".encode(),
+            hashlib.sha256,
+        ).hexdigest()
+
+    def verify_payment_signature(self, order_id: str, payment_id: str, signature: str):
+        if not hmac.compare_digest(self.sign_payment(order_id, payment_id), signature):
+            raise SignatureVerificationError("Razorpay Signature Verification Failed")
+
+    def sign_webhook(self, body: bytes) -> str:
+        return hmac.new(self.webhook_secret.encode(), body, hashlib.sha256).hexdigest()
+
+    def verify_webhook_signature(self, body: bytes, signature: str):
+        if not hmac.compare_digest(self.sign_webhook(body), signature):
+            raise SignatureVerificationError("Razorpay Signature Verification Failed")
+
+    def close(self):
+        pass
+
+
+PAYMENT_GATEWAYS = {
+    "razorpay": RazorpayGateway,
+    "fake": FakeGateway,
+}
+
+
+@lru_cache(maxsize=None)
+def payment_gateway():
+    gateway_name = os.getenv("PAYMENT_GATEWAY") or "razorpay"
+
+    if gateway_name not in PAYMENT_GATEWAYS:
+        raise ValueError(f"Unknown payment gateway: {gateway_name}")
+
+    return PAYMENT_GATEWAYS[gateway_name]()
+
+
+async def run_on_payment_executor(fn, *args):
+    loop = asyncio.get_event_loop()
+
+    try:
+        with track_outbound(payment_gateway().name, fn.__name__):
+            return await asyncio.wait_for(
+                loop.run_in_executor(payment_executor, fn, *args),
+                PAYMENT_GATEWAY_TIMEOUT,
+            )
+    except asyncio.TimeoutError:
+        raise PaymentGatewayTimeout
+
+
+# Identical orders for the same receipt, including concurrent ones, share a
+# single Razorpay order. Failed calls are not cached
+async def create_order(order_data: dict) -> dict:
+    key = (order_data["receipt"], order_data["amount"], order_data["currency"])
+
+    return await order_cache.get_or_load(
+        key,
+        lambda: run_on_payment_executor(payment_gateway().create_order, order_data),
+    )
+
+
+def close_payment_gateway():
+    if payment_gateway.cache_info().currsize:
+        payment_gateway().close()
+        payment_gateway.cache_clear()
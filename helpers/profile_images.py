@@ -0,0 +1,184 @@
+import asyncio
+import datetime
+import io
+import os
+import secrets
+
+from sentry_sdk import capture_exception
+
+from database.data_access.profileImageDAL import ProfileImageDAL
+from database.data_access.userDAL import UserDAL
+from database.db import async_session
+from helpers.imagekit_init import delete_imagekit_folder
+from helpers.imagekit_init import imagekit_client
+from helpers.imagekit_init import run_on_imagekit_executor
+
+# Attempts made at uploading a profile image, and the delay before the first
+# retry. The delay doubles with every attempt
+PROFILE_UPLOAD_ATTEMPTS = int(os.getenv("PROFILE_UPLOAD_ATTEMPTS") or 3)
+PROFILE_UPLOAD_RETRY_SECONDS = int(os.getenv("PROFILE_UPLOAD_RETRY_SECONDS") or 2)
+PROFILE_UPLOAD_POLL_SECONDS = float(os.getenv("PROFILE_UPLOAD_POLL_SECONDS") or 10)
+
+PROFILE_UPLOAD_BATCH_SIZE = 5
+
+# Claimed uploads are not handed to another worker for this long
+PROFILE_UPLOAD_LEASE_SECONDS = 300
+
+profile_image_worker = None
+profile_image_wakeup = None
+
+
+def profile_folder(alt_user_id: str) -> str:
+    return f"MES-AA/Profile/{alt_user_id}"
+
+
+def upload_file_to_imagekit(alt_user_id: str, image: bytes, extension: str) -> str:
+    imagekit = imagekit_client()
+
+    random_file_name = secrets.token_hex(8)
+
+    uploaded_image = imagekit.upload_file(
+        file=io.BytesIO(image),
+        file_name=f"{random_file_name}{extension}",
+        options={
+            "folder": profile_folder(alt_user_id),
+            "is_private_file": False,
+            "use_unique_file_name": False,
+        },
+    )
+
+    return uploaded_image["response"]["url"]
+
+
+async def delete_profile_folder(alt_user_id: str) -> None:
+    await delete_imagekit_folder(profile_folder(alt_user_id))
+
+
+def wake_profile_image_worker():
+    if profile_image_wakeup:
+        profile_image_wakeup.set()
+
+
+def next_attempt_time(attempts: int) -> datetime.datetime:
+    delay = PROFILE_UPLOAD_RETRY_SECONDS * 2 ** (attempts - 1)
+
+    return datetime.datetime.utcnow() + datetime.timedelta(seconds=delay)
+
+
+async def upload_profile_image(record):
+    try:
+        image_url = await run_on_imagekit_executor(
+            upload_file_to_imagekit, record.alt_user_id, record.image, record.extension
+        )
+    except Exception as e:
+        return None, e
+
+    return image_url, None
+
+
+async def drain_profile_image_batch() -> int:
+    lease_until = datetime.datetime.utcnow() + datetime.timedelta(
+        seconds=PROFILE_UPLOAD_LEASE_SECONDS
+    )
+
+    async with async_session() as session:
+        async with session.begin():
+            records = await ProfileImageDAL(session).claim_due(
+                PROFILE_UPLOAD_BATCH_SIZE, lease_until
+            )
+
+    if not records:
+        return 0
+
+    # Images of users deleted in the meantime are not uploaded
+    uploads = [record for record in records if record.user_exists]
+
+    results = await asyncio.gather(
+        *[upload_profile_image(record) for record in uploads]
+    )
+
+    deleted_users = []
+
+    async with async_session() as session:
+        async with session.begin():
+            profileImageDAL = ProfileImageDAL(session)
+            userDAL = UserDAL(session)
+
+            for record in records:
+                if not record.user_exists:
+                    await profileImageDAL.delete_upload(record.id)
+
+            for record, (image_url, error) in zip(uploads, results):
+                if error is None:
+                    updated = await userDAL.update_profile_image(
+                        record.alt_user_id, image_url, "uploaded"
+                    )
+                    await profileImageDAL.delete_upload(record.id)
+
+                    if not updated:
+                        deleted_users.append(record.alt_user_id)
+
+                    continue
+
+                capture_exception(error)
+
+                attempts = record.attempts + 1
+
+                if attempts < PROFILE_UPLOAD_ATTEMPTS:
+                    await profileImageDAL.mark_failed(
+                        record.id, attempts, repr(error), next_attempt_time(attempts)
+                    )
+                else:
+                    await userDAL.update_profile_image(
+                        record.alt_user_id, None, "failed"
+                    )
+                    await profileImageDAL.delete_upload(record.id)
+
+    # The user was deleted while the image was being uploaded, so the upload
+    # recreated the folder that the deletion had removed
+    for alt_user_id in deleted_users:
+        try:
+            await delete_profile_folder(alt_user_id)
+        except Exception as e:
+            capture_exception(e)
+
+    return len(records)
+
+
+async def run_profile_image_worker():
+    while True:
+        profile_image_wakeup.clear()
+
+        try:
+            processed = await drain_profile_image_batch()
+        except Exception as e:
+            capture_exception(e)
+            processed = 0
+
+        # A full batch means more uploads are probably due
+        if processed == PROFILE_UPLOAD_BATCH_SIZE:
+            continue
+
+        try:
+            await asyncio.wait_for(
+                profile_image_wakeup.wait(), PROFILE_UPLOAD_POLL_SECONDS
+            )
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_profile_image_worker():
+    global profile_image_worker, profile_image_wakeup
+
+    profile_image_wakeup = asyncio.Event()
+    profile_image_worker = asyncio.ensure_future(run_profile_image_worker())
+
+
+async def stop_profile_image_worker():
+    if profile_image_worker:
+        profile_image_worker.cancel()
+
+        try:
+            await profile_image_worker
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,170 @@
+import csv
+import datetime
+import json
+import os
+import time
+from typing import Iterator
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from database.data_access.reconciliationDAL import ReconciliationDAL
+from helpers.payment_gateway import payment_gateway
+from helpers.payment_gateway import run_on_payment_executor
+
+# Settlement export (.csv, .json or .jsonl) to reconcile against, with the
+# fields of the Razorpay API and amounts in paise. Without it the payments are
+# pulled from the gateway
+PAYMENT_SETTLEMENT_EXPORT = os.getenv("PAYMENT_SETTLEMENT_EXPORT")
+
+# Registrations of the last this many days, up to yesterday, are expected in
+# the settlements
+RECONCILIATION_DAYS = int(os.getenv("RECONCILIATION_DAYS") or 7)
+
+# Settlement rows are loaded into the database this many at a time
+RECONCILIATION_CHUNK_SIZE = 1000
+
+# Maximum page size of the Razorpay list payments API
+RAZORPAY_PAGE_SIZE = 100
+
+
+# The settlement row of a captured payment, None for anything else
+def settlement_row(item: dict) -> Optional[dict]:
+    if (item.get("type") or item.get("entity") or "payment") != "payment":
+        return None
+
+    if item.get("status") and item["status"] != "captured":
+        return None
+
+    if not item.get("order_id"):
+        return None
+
+    return {
+        "order_id": item["order_id"],
+        "payment_id": item.get("payment_id") or item.get("entity_id") or item.get("id"),
+        "amount": int(item["amount"]) if item.get("amount") else None,
+    }
+
+
+# The day a payment was created on, None when the row does not say. Razorpay
+# reports unix timestamps, the dashboard exports dates
+def payment_date(item: dict) -> Optional[datetime.date]:
+    created_at = item.get("created_at")
+
+    if not created_at:
+        return None
+
+    if isinstance(created_at, (int, float)) or str(created_at).isdigit():
+        return datetime.date.fromtimestamp(int(created_at))
+
+    for date_format in ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y"):
+        try:
+            return datetime.datetime.strptime(created_at, date_format).date()
+        except ValueError:
+            pass
+
+    try:
+        return datetime.datetime.fromisoformat(created_at).date()
+    except ValueError:
+        return None
+
+
+def read_settlement_export(path: str) -> Iterator[dict]:
+    with open(path, newline="") as file:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(file)
+        elif path.endswith(".jsonl"):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            export = json.load(file)
+            yield from export["items"] if isinstance(export, dict) else export
+
+
+# Rows of the export for payments created in the window, the same payments
+# the gateway would return. Rows without a date are kept
+async def export_settlement_chunks(
+    path: str, window_start: datetime.date, window_end: datetime.date
+):
+    chunk = []
+
+    for item in read_settlement_export(path):
+        created_on = payment_date(item)
+
+        if created_on and not window_start <= created_on <= window_end:
+            continue
+
+        row = settlement_row(item)
+
+        if row:
+            chunk.append(row)
+
+        if len(chunk) == RECONCILIATION_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+async def gateway_settlement_chunks(
+    window_start: datetime.date, window_end: datetime.date
+):
+    since = int(time.mktime(window_start.timetuple()))
+    until = int(time.mktime((window_end + datetime.timedelta(days=1)).timetuple())) - 1
+
+    skip = 0
+
+    while True:
+        payments = await run_on_payment_executor(
+            payment_gateway().fetch_payments, since, until, skip, RAZORPAY_PAGE_SIZE
+        )
+
+        rows = [row for row in map(settlement_row, payments) if row]
+
+        if rows:
+            yield rows
+
+        if len(payments) < RAZORPAY_PAGE_SIZE:
+            return
+
+        skip += RAZORPAY_PAGE_SIZE
+
+
+# Loads the settled payments into a temporary table and records every
+# mismatch against the users. Returns the number of mismatches
+async def reconcile_payments(session: Session) -> int:
+    reconciliationDAL = ReconciliationDAL(session)
+
+    window_end = datetime.date.today() - datetime.timedelta(days=1)
+    window_start = window_end - datetime.timedelta(days=RECONCILIATION_DAYS - 1)
+
+    if PAYMENT_SETTLEMENT_EXPORT:
+        source = "export"
+        chunks = export_settlement_chunks(
+            PAYMENT_SETTLEMENT_EXPORT, window_start, window_end
+        )
+    else:
+        source = "gateway"
+        chunks = gateway_settlement_chunks(window_start, window_end)
+
+    run_id = await reconciliationDAL.create_run(source, window_start, window_end)
+
+    # Created in the job's transaction, so a failed run rolls it back as well
+    await reconciliationDAL.create_settlement_table()
+
+    settlement_row_count = 0
+
+    async for chunk in chunks:
+        await reconciliationDAL.load_settlement_rows(chunk)
+        settlement_row_count += len(chunk)
+
+    mismatch_count = await reconciliationDAL.record_mismatches(
+        run_id, window_start, window_end
+    )
+
+    await reconciliationDAL.drop_settlement_table()
+    await reconciliationDAL.finish_run(run_id, settlement_row_count, mismatch_count)
+
+    return mismatch_count
@@ -0,0 +1,125 @@
+import asyncio
+import datetime
+import os
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi import status
+from sentry_sdk import capture_exception
+
+from database.data_access.adminDAL import AdminDAL
+from database.db import advisory_lock
+from database.db import async_session
+from database.db import env_flag
+from helpers.daily_jobs import DAILY_JOBS
+
+# Off until the external cron is retired, see the README. While it is on, the
+# HTTP endpoints the cron calls are turned off so that no work is done twice
+JOB_SCHEDULER_ENABLED = env_flag("JOB_SCHEDULER_ENABLED", False)
+
+# Local time after which the daily jobs are run
+DAILY_JOBS_AT = datetime.time.fromisoformat(os.getenv("DAILY_JOBS_AT") or "06:00")
+
+# A failed job is tried again after this many minutes, on the same day
+JOB_RETRY_MINUTES = int(os.getenv("JOB_RETRY_MINUTES") or 30)
+
+SCHEDULER_POLL_SECONDS = 60
+
+scheduler = None
+
+
+def is_due(job, now: datetime.datetime) -> bool:
+    if now.time() < DAILY_JOBS_AT:
+        return False
+
+    if job is None or job.job_last_runtime < now.date():
+        return True
+
+    return (
+        job.last_run_status == "failure"
+        and now - job.last_run_started_at
+        >= datetime.timedelta(minutes=JOB_RETRY_MINUTES)
+    )
+
+
+# Runs the job unless another process is running it or it has already run
+# today, and records the outcome in the jobs table
+async def run_job(job_name: str, force: bool = False) -> Optional[dict]:
+    async with advisory_lock(f"job:{job_name}") as locked:
+        if not locked:
+            return None
+
+        async with async_session() as session:
+            job = await AdminDAL(session).find_job_by_name(job_name)
+
+        started_at = datetime.datetime.now()
+
+        if not force and not is_due(job, started_at):
+            return None
+
+        start = time.perf_counter()
+
+        try:
+            async with async_session() as session:
+                async with session.begin():
+                    rows = await DAILY_JOBS[job_name](session)
+
+            run_status, error = "success", None
+        except Exception as e:
+            capture_exception(e)
+            rows, run_status, error = None, "failure", repr(e)
+
+        duration_ms = int((time.perf_counter() - start) * 1000)
+
+        async with async_session() as session:
+            async with session.begin():
+                await AdminDAL(session).record_job_run(
+                    job_name, started_at, duration_ms, rows, run_status, error
+                )
+
+        return {
+            "job": job_name,
+            "status": run_status,
+            "processed": rows,
+            "duration_ms": duration_ms,
+        }
+
+
+# Dependency of the endpoints called by the external cron. They do the same
+# work as the daily jobs outside of run_job, so they are refused once the
+# scheduler runs the jobs
+async def require_external_cron():
+    if JOB_SCHEDULER_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The daily jobs are run by the scheduler",
+        )
+
+
+async def run_scheduler():
+    while True:
+        for job_name in DAILY_JOBS:
+            try:
+                await run_job(job_name)
+            except Exception as e:
+                capture_exception(e)
+
+        await asyncio.sleep(SCHEDULER_POLL_SECONDS)
+
+
+def start_scheduler():
+    global scheduler
+
+    if JOB_SCHEDULER_ENABLED:
+        scheduler = asyncio.ensure_future(run_scheduler())
+
+
+async def stop_scheduler():
+    if scheduler:
+        scheduler.cancel()
+
+        try:
+            await scheduler
+        except asyncio.CancelledError:
+            pass
@@ -4,45 +4,58 @@ from database.data_access.adminDAL import AdminDAL
 from database.data_access.committeDAL import CommitteeDAL
 from database.data_access.eventDAL import EventDAL
 from database.data_access.famous_alumniDAL import FamousAlumniDAL
+from database.data_access.galleryDAL import GalleryDAL
+from database.data_access.outboxDAL import OutboxDAL
+from database.data_access.paymentDAL import PaymentDAL
+from database.data_access.profileImageDAL import ProfileImageDAL
+from database.data_access.reconciliationDAL import ReconciliationDAL
 from database.data_access.testimonialDAL import TestimonialDAL
 from database.data_access.userDAL import UserDAL
+from database.db import async_read_only_session
 from database.db import async_session
 
 
 router = APIRouter()
 
 
-async def get_committee_dal():
-    async with async_session() as session:
-        async with session.begin():
-            yield CommitteeDAL(session)
-
-
-async def get_testimonial_dal():
-    async with async_session() as session:
-        async with session.begin():
-            yield TestimonialDAL(session)
-
-
-async def get_user_dal():
-    async with async_session() as session:
-        async with session.begin():
-            yield UserDAL(session)
-
-
-async def get_famous_alumni_dal():
-    async with async_session() as session:
-        async with session.begin():
-            yield FamousAlumniDAL(session)
-
-
-async def get_admin_dal():
-    async with async_session() as session:
-        async with session.begin():
-            yield AdminDAL(session)
-
-
-async def get_event_dal():
-    async with async_session() as session:
-        async with session.begin():
-            yield EventDAL(session)
+# Builds a dependency that hands out the given DALs on one shared session.
+# A single DAL is yielded as is, several DALs are yielded as a tuple.
+# Read only dependencies skip the explicit transaction and must not be used
+# by endpoints that write to the database
+def dal_dependency(*dal_classes, read_only: bool = False):
+    session_factory = async_read_only_session if read_only else async_session
+
+    async def get_dals():
+        async with session_factory() as session:
+            dals = tuple(dal_class(session) for dal_class in dal_classes)
+            dals = dals[0] if len(dals) == 1 else dals
+
+            if read_only:
+                yield dals
+            else:
+                async with session.begin():
+                    yield dals
+
+    return get_dals
+
+
+get_committee_dal = dal_dependency(CommitteeDAL)
+get_testimonial_dal = dal_dependency(TestimonialDAL)
+get_user_dal = dal_dependency(UserDAL)
+get_famous_alumni_dal = dal_dependency(FamousAlumniDAL)
+get_admin_dal = dal_dependency(AdminDAL)
+get_event_dal = dal_dependency(EventDAL)
+get_gallery_dal = dal_dependency(GalleryDAL)
+get_outbox_dal = dal_dependency(OutboxDAL)
+get_payment_dal = dal_dependency(PaymentDAL)
+get_user_and_profile_image_dals = dal_dependency(UserDAL, ProfileImageDAL)
+
+get_read_only_committee_dal = dal_dependency(CommitteeDAL, read_only=True)
+get_read_only_testimonial_dal = dal_dependency(TestimonialDAL, read_only=True)
+get_read_only_user_dal = dal_dependency(UserDAL, read_only=True)
+get_read_only_famous_alumni_dal = dal_dependency(FamousAlumniDAL, read_only=True)
+get_read_only_admin_dal = dal_dependency(AdminDAL, read_only=True)
+get_read_only_event_dal = dal_dependency(EventDAL, read_only=True)
+get_read_only_gallery_dal = dal_dependency(GalleryDAL, read_only=True)
+get_read_only_outbox_dal = dal_dependency(OutboxDAL, read_only=True)
+get_read_only_reconciliation_dal = dal_dependency(ReconciliationDAL, read_only=True)
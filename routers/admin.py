@@ -1,8 +1,11 @@
+import math
 import os
 from datetime import timedelta
 from typing import Optional
 
 from fastapi import Depends
+from fastapi import HTTPException
+from fastapi import Request
 from fastapi import status
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.security import OAuth2PasswordRequestForm
@@ -11,6 +14,11 @@ from pydantic import BaseModel
 from . import get_admin_dal
 from . import router
 from database.data_access.adminDAL import AdminDAL
+from helpers.admin_auth import admin_token_verifier
+from helpers.admin_auth import require_admin
+from helpers.login_throttle import client_ip
+from helpers.login_throttle import email_throttle
+from helpers.login_throttle import ip_throttle
 
 oauth2_schema = OAuth2PasswordBearer(tokenUrl="/auth")
 
@@ -31,11 +39,33 @@ class UserAuth(BaseModel):
 
 @router.post("/auth", status_code=status.HTTP_200_OK)
 async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     adminDAL: AdminDAL = Depends(get_admin_dal),
 ):
+    ip_key = client_ip(request)
+    email_key = form_data.username.lower()
+
+    # Attempts over the limit are turned away before any password is hashed
+    retry_after = max(
+        ip_throttle.retry_after(ip_key) or 0,
+        email_throttle.retry_after(email_key) or 0,
+    )
+
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts. Please try again later.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+    ip_throttle.record(ip_key)
+    email_throttle.record(email_key)
+
     user = await adminDAL.authenticate_user(form_data.username, form_data.password)
 
+    email_throttle.reset(email_key)
+
     id = str(user.id)
 
     access_token_expires = timedelta(
@@ -46,3 +76,11 @@ async def login(
         data={"sub": id}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
+
+
+# Revokes the token on this process until it expires
+@router.post("/auth/logout", status_code=status.HTTP_200_OK)
+async def logout(token: str = Depends(require_admin)):
+    admin_token_verifier().revoke(token)
+
+    return {"status": "logged out"}
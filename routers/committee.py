@@ -3,7 +3,7 @@ from fastapi import status
 from pydantic import BaseModel
 from sentry_sdk import capture_exception
 
-from . import get_committee_dal
+from . import get_read_only_committee_dal
 from . import router
 from database.data_access.committeDAL import CommitteeDAL
 
@@ -18,7 +18,7 @@ class CommitteeMain(BaseModel):
 
 @router.get("/committee", status_code=status.HTTP_200_OK)
 async def get_committee_members(
-    committee_dal: CommitteeDAL = Depends(get_committee_dal),
+    committee_dal: CommitteeDAL = Depends(get_read_only_committee_dal),
 ):
     try:
         return await committee_dal.fetch_all_committe_members()
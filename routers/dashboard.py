@@ -1,26 +1,35 @@
+import csv
 import datetime
+import io
+import json
 import os
-import re
-from functools import reduce
 from typing import Optional
 
 from babel.numbers import format_decimal
 from fastapi import Depends
 from fastapi import Header
 from fastapi import HTTPException
+from fastapi import Query
 from fastapi import status
+from fastapi.responses import StreamingResponse
 from jose.exceptions import ExpiredSignatureError
 from pydantic import BaseModel
 from sentry_sdk import capture_exception
 
 from . import get_admin_dal
+from . import get_read_only_admin_dal
+from . import get_read_only_user_dal
 from . import get_user_dal
 from . import router
 from database.data_access.adminDAL import AdminDAL
 from database.data_access.userDAL import UserDAL
+from database.db import pool_status
+from helpers.admin_auth import require_admin
+from helpers.daily_jobs import DAILY_JOBS
 from helpers.modified_id import abbreviated_membership
 from helpers.modified_id import modify_record_id
-from helpers.token_decoder import decode_auth_token
+from helpers.scheduler import JOB_SCHEDULER_ENABLED
+from helpers.scheduler import require_external_cron
 
 
 class JobsBase(BaseModel):
@@ -31,180 +40,52 @@ class JobsBase(BaseModel):
 
 
 # Endpoints
-@router.get("/alumniassn/dashboard/totals", status_code=status.HTTP_200_OK)
+@router.get(
+    "/alumniassn/dashboard/totals",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_admin)],
+)
 async def generate_dashboard_information(
-    userDAL: UserDAL = Depends(get_user_dal),
-    authorization: Optional[str] = Header(None),
+    userDAL: UserDAL = Depends(get_read_only_user_dal),
 ):
-    if not authorization:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Uh uh uh... You didn't say the magic word",
-        )
-
-    valid_token = decode_auth_token(authorization)
-
-    online_payment_match = re.compile("^[pay_]")
-
-    if not valid_token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Uh uh uh... You didn't say the magic word",
-        )
-
     try:
-        records = await userDAL.get_all_users()
-
-        # Total successful registrations
-        successful_registrations = len(
-            [record for record in records if record.payment_status]
-        )
-
-        # Pending registrations
-        pending_registrations = len(
-            [
-                record
-                for record in records
-                if not record.payment_status
-                and not record.membership_expired
-                and record.payment_mode == "M"
-            ]
-        )
+        totals = await userDAL.get_dashboard_totals()
 
         # Total registrations
-        total_registrations = int(successful_registrations + pending_registrations)
-
-        # Total life members
-        life_members = len(
-            [
-                record
-                for record in records
-                if record.membership_type == "Lifetime" and record.payment_status
-            ]
-        )
-
-        # Total pending life members
-        pending_life_members = len(
-            [
-                record
-                for record in records
-                if record.membership_type == "Lifetime"
-                and not record.payment_status
-                and record.payment_mode == "M"
-            ]
-        )
-
-        # Annual members
-        annual_members = len(
-            [
-                record
-                for record in records
-                if record.membership_type == "Annual"
-                and record.payment_status
-                and not record.membership_expired
-            ]
-        )
-
-        # Total pending annual members
-        pending_annual_members = len(
-            [
-                record
-                for record in records
-                if record.membership_type == "Annual"
-                and not record.payment_status
-                and not record.membership_expired
-                and record.payment_mode == "M"
-            ]
-        )
-
-        # Total pending annual members
-        expired_memberships = len(
-            [
-                record
-                for record in records
-                if record.membership_type == "Annual"
-                and not record.payment_status
-                and record.membership_expired
-            ]
-        )
-
-        # Total amount collected
-        total_amount = 0
-
-        amounts = [record.payment_amount for record in records if record.payment_status]
-
-        if amounts:
-            total_amount = reduce(lambda x, y: x + y, amounts)
-
-        # Total amount from life members
-        total_amount_lm = 0
-
-        amounts_lm = [
-            record.payment_amount
-            for record in records
-            if record.membership_type == "Lifetime" and record.payment_status
-        ]
-
-        if amounts_lm:
-            total_amount_lm = reduce(lambda x, y: x + y, amounts_lm)
-
-        # Total amount from annual members
-        total_amount_am = 0
-
-        amounts_am = [
-            record.payment_amount or 0
-            for record in records
-            if record.membership_type == "Annual" and record.payment_status
-        ]
-
-        if amounts_am:
-            total_amount_am = reduce(lambda x, y: x + y, amounts_am)
-
-        # Count of online payments
-        online_payments = len(
-            [
-                record
-                for record in records
-                if record.payment_mode == "O"
-                and re.match(online_payment_match, record.razorpay_payment_id)
-                and record.payment_status
-            ]
-        )
-
-        manual_payments = len(
-            [
-                record
-                for record in records
-                if record.payment_mode == "M" and record.payment_status
-            ]
+        total_registrations = int(
+            totals.successful_registrations + totals.pending_registrations
         )
 
         return {
             "total_registrations": format_decimal(total_registrations, locale="en_IN"),
             "successful_registrations": format_decimal(
-                successful_registrations, locale="en_IN"
+                totals.successful_registrations, locale="en_IN"
             ),
             "pending_registrations": format_decimal(
-                pending_registrations, locale="en_IN"
+                totals.pending_registrations, locale="en_IN"
+            ),
+            "life_members": format_decimal(totals.life_members, locale="en_IN"),
+            "annual_members": format_decimal(totals.annual_members, locale="en_IN"),
+            "total_amount_collected": format_decimal(
+                totals.total_amount, locale="en_IN"
             ),
-            "life_members": format_decimal(life_members, locale="en_IN"),
-            "annual_members": format_decimal(annual_members, locale="en_IN"),
-            "total_amount_collected": format_decimal(total_amount, locale="en_IN"),
             "total_amount_from_life_members": format_decimal(
-                total_amount_lm, locale="en_IN"
+                totals.total_amount_lm, locale="en_IN"
             ),
             "total_amount_from_annual_members": format_decimal(
-                total_amount_am, locale="en_IN"
+                totals.total_amount_am, locale="en_IN"
             ),
             "pending_life_members": format_decimal(
-                pending_life_members, locale="en_IN"
+                totals.pending_life_members, locale="en_IN"
             ),
             "pending_annual_members": format_decimal(
-                pending_annual_members, locale="en_IN"
+                totals.pending_annual_members, locale="en_IN"
+            ),
+            "expired_memberships": format_decimal(
+                totals.expired_memberships, locale="en_IN"
             ),
-            "expired_memberships": format_decimal(expired_memberships, locale="en_IN"),
-            "online_payments": online_payments,
-            "manual_payments": manual_payments,
+            "online_payments": totals.online_payments,
+            "manual_payments": totals.manual_payments,
         }
     except ExpiredSignatureError as e:
         capture_exception(e)
@@ -213,80 +94,135 @@ async def generate_dashboard_information(
         )
 
 
+def member_full_name(record):
+    return record.prefix + ". " + record.first_name + " " + record.last_name
+
+
+def member_membership_id(record):
+    return f"MESAA-{abbreviated_membership(record.membership_type)}-{str(record.duration_end)[-2:]}-{modify_record_id(record.id)}"
+
+
+# Fields of the member listing, in response order, mapped to the columns they need
+MEMBER_FIELDS = {
+    "id": (["id"], lambda record: record.id),
+    "membership_id": (["id", "membership_type", "duration_end"], member_membership_id),
+    "full_name": (["prefix", "first_name", "last_name"], member_full_name),
+    "email": (["email"], lambda record: record.email),
+    "mobile": (["mobile"], lambda record: record.mobile),
+    "birthday": (["birthday"], lambda record: record.birthday),
+    "address1": (["address1"], lambda record: record.address1),
+    "address2": (["address2"], lambda record: record.address2),
+    "city": (["city"], lambda record: record.city),
+    "state": (["state"], lambda record: record.state),
+    "pincode": (["pincode"], lambda record: record.pincode),
+    "country": (["country"], lambda record: record.country),
+    "batch": (["duration_end"], lambda record: record.duration_end),
+    "puc": (["course_puc"], lambda record: record.course_puc),
+    "degree": (["course_degree"], lambda record: record.course_degree),
+    "pg": (["course_pg"], lambda record: record.course_pg),
+    "other_courses": (["course_others"], lambda record: record.course_others),
+    "profession": (["profession"], lambda record: record.profession),
+    "other_interests": (["other_interests"], lambda record: record.other_interests),
+    "vision": (["vision"], lambda record: record.vision),
+    "profile_url": (["profile_url"], lambda record: record.profile_url),
+    "id_card_url": (["id_card_url"], lambda record: record.id_card_url),
+    "membership_certificate_url": (
+        ["membership_certificate_url"],
+        lambda record: record.membership_certificate_url,
+    ),
+    "payment_mode": (["payment_mode"], lambda record: record.payment_mode),
+    "joining_date": (["date_created"], lambda record: record.date_created),
+}
+
+
+def resolve_member_fields(fields: Optional[str]):
+    requested_fields = (
+        [field.strip() for field in fields.split(",") if field.strip()]
+        if fields
+        else list(MEMBER_FIELDS.keys())
+    )
+
+    unknown_fields = [field for field in requested_fields if field not in MEMBER_FIELDS]
+
+    if unknown_fields:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown_fields)}",
+        )
+
+    # The id is always selected since it is the pagination cursor
+    columns = ["id"]
+
+    for field in requested_fields:
+        for column in MEMBER_FIELDS[field][0]:
+            if column not in columns:
+                columns.append(column)
+
+    return requested_fields, columns
+
+
+async def generate_member_export(partitions, requested_fields, export_format):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    if export_format == "csv":
+        writer.writerow(requested_fields)
+
+    # Every partition of rows fetched from the cursor is flushed as one chunk
+    async for partition in partitions:
+        for record in partition:
+            member = [MEMBER_FIELDS[field][1](record) for field in requested_fields]
+
+            if export_format == "csv":
+                writer.writerow(member)
+            else:
+                buffer.write(
+                    json.dumps(dict(zip(requested_fields, member)), default=str) + "\n"
+                )
+
+        yield buffer.getvalue()
+
+        buffer.seek(0)
+        buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
 # Pull all active registrations based on type of membership
 @router.get(
     "/alumniassn/dashboard/{membership_type}/{payment_status}",
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_admin)],
 )
 async def get_all_active_members(
     membership_type: str,
     payment_status: int,
-    userDAL: UserDAL = Depends(get_user_dal),
-    authorization: Optional[str] = Header(None),
+    limit: int = Query(50, ge=1, le=500),
+    after: Optional[int] = None,
+    fields: Optional[str] = None,
+    userDAL: UserDAL = Depends(get_read_only_user_dal),
 ):
-    if not authorization:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Uh uh uh... You didn't say the magic word",
-        )
-
-    valid_token = decode_auth_token(authorization)
-
-    if not valid_token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Uh uh uh... You didn't say the magic word",
-        )
+    requested_fields, columns = resolve_member_fields(fields)
 
     try:
-
-        if payment_status:
-            records = await userDAL.get_registered_members(
-                membership_type, payment_status
-            )
-
-        if not payment_status:
-            records = await userDAL.get_registered_pending_members(
-                membership_type, payment_status
-            )
+        records = await userDAL.get_registered_members_page(
+            membership_type, payment_status, columns, limit, after
+        )
 
         all_members = []
         member = {}
 
         for record in records:
-            member["id"] = record.id
-            member[
-                "membership_id"
-            ] = f"MESAA-{abbreviated_membership(membership_type)}-{str(record.duration_end)[-2:]}-{modify_record_id(record.id)}"
-            member["full_name"] = (
-                record.prefix + ". " + record.first_name + " " + record.last_name
-            )
-            member["email"] = record.email
-            member["mobile"] = record.mobile
-            member["birthday"] = record.birthday
-            member["address1"] = record.address1
-            member["address2"] = record.address2
-            member["city"] = record.city
-            member["state"] = record.state
-            member["pincode"] = record.pincode
-            member["country"] = record.country
-            member["batch"] = record.duration_end
-            member["puc"] = record.course_puc
-            member["degree"] = record.course_degree
-            member["pg"] = record.course_pg
-            member["other_courses"] = record.course_others
-            member["profession"] = record.profession
-            member["other_interests"] = record.other_interests
-            member["vision"] = record.vision
-            member["profile_url"] = record.profile_url
-            member["id_card_url"] = record.id_card_url
-            member["membership_certificate_url"] = record.membership_certificate_url
-            member["payment_mode"] = record.payment_mode
-            member["joining_date"] = record.date_created
+            for field in requested_fields:
+                member[field] = MEMBER_FIELDS[field][1](record)
 
             all_members.append(member.copy())
 
-        return all_members
+        return {
+            "members": all_members,
+            "next_cursor": records[-1].id if len(records) == limit else None,
+        }
     except Exception as e:
         capture_exception(e)
         raise HTTPException(
@@ -294,25 +230,47 @@ async def get_all_active_members(
         )
 
 
-@router.get("/alumniassn/dashboard/expired_members", status_code=status.HTTP_200_OK)
-async def get_all_expired_memberships(
-    userDal: UserDAL = Depends(get_user_dal),
-    authorization: Optional[str] = Header(None),
+@router.get(
+    "/alumniassn/dashboard/export",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_admin)],
+)
+async def export_member_registry(
+    export_format: str = Query("ndjson", alias="format", regex="^(ndjson|csv)$"),
+    membership_type: Optional[str] = None,
+    payment_status: Optional[int] = None,
+    fields: Optional[str] = None,
+    userDAL: UserDAL = Depends(get_user_dal),
 ):
-    if not authorization:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Uh uh uh... You didn't say the magic word",
-        )
+    requested_fields, columns = resolve_member_fields(fields)
+
+    try:
+        partitions = userDAL.stream_members(columns, membership_type, payment_status)
 
-    valid_token = decode_auth_token(authorization)
+        media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+        file_name = f"members-{datetime.date.today().isoformat()}.{export_format}"
 
-    if not valid_token:
+        return StreamingResponse(
+            generate_member_export(partitions, requested_fields, export_format),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{file_name}"'},
+        )
+    except Exception as e:
+        capture_exception(e)
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Uh uh uh... You didn't say the magic word",
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not export members",
         )
 
+
+@router.get(
+    "/alumniassn/dashboard/expired_members",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_admin)],
+)
+async def get_all_expired_memberships(
+    userDal: UserDAL = Depends(get_read_only_user_dal),
+):
     try:
         records = await userDal.fetch_expired_members()
 
@@ -346,25 +304,15 @@ async def get_all_expired_memberships(
         )
 
 
-@router.get("/alumniassn/dashboard/recently_renewed", status_code=status.HTTP_200_OK)
+@router.get(
+    "/alumniassn/dashboard/recently_renewed",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_admin)],
+)
 async def get_recently_renewed_memberships(
-    userDAL: UserDAL = Depends(get_user_dal),
-    authorization: Optional[str] = Header(None),
+    userDAL: UserDAL = Depends(get_read_only_user_dal),
 ):
 
-    if not authorization:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Uh uh uh... You didn't say the magic word",
-        )
-
-    valid_token = decode_auth_token(authorization)
-
-    if not valid_token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Uh uh uh... You didn't say the magic word",
-        )
     try:
         records = await userDAL.fetch_recently_renewed_memberships()
 
@@ -399,15 +347,28 @@ async def get_recently_renewed_memberships(
         )
 
 
+@router.get(
+    "/alumniassn/dashboard/db_pool",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_admin)],
+)
+async def get_database_pool_status():
+    return pool_status()
+
+
 @router.get("/jobs", status_code=status.HTTP_200_OK)
 async def job_status(
-    adminDAL: AdminDAL = Depends(get_admin_dal),
+    adminDAL: AdminDAL = Depends(get_read_only_admin_dal),
 ):
     jobs = []
     job_obj = {}
 
     try:
-        records = await adminDAL.fetch_status_of_all_jobs()
+        # The rows kept up to date through PUT /jobs by the external cron go
+        # stale once the scheduler runs the jobs, so only its own are shown
+        records = await adminDAL.fetch_status_of_all_jobs(
+            list(DAILY_JOBS) if JOB_SCHEDULER_ENABLED else None
+        )
 
         for job in records:
             job_obj["name"] = job.job_name.title()
@@ -415,8 +376,12 @@ async def job_status(
             job_obj["status"] = (
                 "Success"
                 if datetime.date.today() == job.job_last_runtime
+                and job.last_run_status != "failure"
                 else "Failure"
             )
+            job_obj["last_run_duration_ms"] = job.last_run_duration_ms
+            job_obj["last_run_rows"] = job.last_run_rows
+            job_obj["last_run_error"] = job.last_run_error
 
             jobs.append(job_obj.copy())
 
@@ -429,7 +394,11 @@ async def job_status(
         )
 
 
-@router.put("/jobs", status_code=status.HTTP_201_CREATED)
+@router.put(
+    "/jobs",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_external_cron)],
+)
 async def job_runtime(
     job: JobsBase,
     adminDAL: AdminDAL = Depends(get_admin_dal),
@@ -1,25 +1,33 @@
 import datetime
 import os
+from typing import List
 from typing import Optional
 
 from dateutil.relativedelta import relativedelta
-from fastapi import BackgroundTasks
 from fastapi import Header
 from fastapi import HTTPException
+from fastapi import Query
 from fastapi import status
 from fastapi.param_functions import Depends
 from pydantic import BaseModel
-from sendgrid.helpers.mail import Bcc
 from sendgrid.helpers.mail import Email
 from sendgrid.helpers.mail import Mail
 from sentry_sdk import capture_exception
 
+from . import get_outbox_dal
+from . import get_read_only_outbox_dal
 from . import get_user_dal
 from . import router
+from database.data_access.outboxDAL import OutboxDAL
 from database.data_access.userDAL import UserDAL
+from helpers.admin_auth import require_admin
+from helpers.bulk_mail import enqueue_bulk_mail
+from helpers.email_outbox import enqueue_mail
+from helpers.email_templates import birthday_message
+from helpers.email_templates import expired_membership_message
+from helpers.email_templates import renewal_message
 from helpers.mailbox_name import mailbox_mapping
-from helpers.random_messages import return_random_message
-from helpers.sendgrid_init import send_message
+from helpers.scheduler import require_external_cron
 
 
 class EmailBase(BaseModel):
@@ -127,7 +135,9 @@ class BulkEmailNotification(BaseModel):
 
 
 @router.post("/email/welcome", status_code=status.HTTP_201_CREATED)
-def send_welcome_message(email: WelcomeEmail, background_task: BackgroundTasks):
+async def send_welcome_message(
+    email: WelcomeEmail, outboxDAL: OutboxDAL = Depends(get_outbox_dal)
+):
     message = Mail(from_email=os.getenv("PRESIDENT_EMAIL"), to_emails=email.to_email)
 
     message.dynamic_template_data = {
@@ -137,7 +147,7 @@ def send_welcome_message(email: WelcomeEmail, background_task: BackgroundTasks):
     message.template_id = os.getenv("WELCOME_EMAIL_TEMPLATE")
 
     try:
-        background_task.add_task(send_message, message)
+        await enqueue_mail(outboxDAL, [message], "welcome")
         return status.HTTP_202_ACCEPTED
     except Exception as e:
         capture_exception(e)
@@ -147,7 +157,9 @@ def send_welcome_message(email: WelcomeEmail, background_task: BackgroundTasks):
 
 
 @router.post("/email/contact", status_code=status.HTTP_201_CREATED)
-def send_contact_message(email: ContactEmail, background_task: BackgroundTasks):
+async def send_contact_message(
+    email: ContactEmail, outboxDAL: OutboxDAL = Depends(get_outbox_dal)
+):
     message = Mail(
         from_email=os.getenv("CONTACT_EMAIL"), to_emails=os.getenv("CONTACT_EMAIL")
     )
@@ -161,7 +173,7 @@ def send_contact_message(email: ContactEmail, background_task: BackgroundTasks):
     message.template_id = os.getenv("CONTACT_EMAIL_TEMPLATE")
 
     try:
-        background_task.add_task(send_message, message)
+        await enqueue_mail(outboxDAL, [message], "contact")
         return status.HTTP_202_ACCEPTED
     except Exception as e:
         capture_exception(e)
@@ -171,8 +183,8 @@ def send_contact_message(email: ContactEmail, background_task: BackgroundTasks):
 
 
 @router.post("/email/payment/manual", status_code=status.HTTP_201_CREATED)
-def send_manual_payment_email(
-    email: ManualPaymentEmail, background_task: BackgroundTasks
+async def send_manual_payment_email(
+    email: ManualPaymentEmail, outboxDAL: OutboxDAL = Depends(get_outbox_dal)
 ):
     message = Mail(from_email=os.getenv("CONTACT_EMAIL"), to_emails=email.to_email)
 
@@ -200,8 +212,7 @@ def send_manual_payment_email(
     message.template_id = os.getenv("MANUAL_PAYMENT_EMAIL_TEMPLATE")
 
     try:
-        background_task.add_task(send_message, message)
-        # send_message(message)
+        await enqueue_mail(outboxDAL, [message], "manual_payment")
         return status.HTTP_202_ACCEPTED
     except Exception as e:
         capture_exception(e)
@@ -211,8 +222,8 @@ def send_manual_payment_email(
 
 
 @router.post("/email/testimonial", status_code=status.HTTP_201_CREATED)
-def send_testimonial_approval_message(
-    email: TestimonialEmail, background_task: BackgroundTasks
+async def send_testimonial_approval_message(
+    email: TestimonialEmail, outboxDAL: OutboxDAL = Depends(get_outbox_dal)
 ):
     message = Mail(
         from_email=os.getenv("CONTACT_EMAIL"), to_emails=os.getenv("CONTACT_EMAIL")
@@ -228,7 +239,7 @@ def send_testimonial_approval_message(
     message.template_id = os.getenv("TESTIMONIAL_SUBMISSION_TEMPLATE")
 
     try:
-        background_task.add_task(send_message, message)
+        await enqueue_mail(outboxDAL, [message], "testimonial")
         return status.HTTP_202_ACCEPTED
     except Exception as e:
         capture_exception(e)
@@ -238,7 +249,9 @@ def send_testimonial_approval_message(
 
 
 @router.post("/email/receipt", status_code=status.HTTP_201_CREATED)
-def send_payment_receipt(email: PaymentReceiptEmail, background_task: BackgroundTasks):
+async def send_payment_receipt(
+    email: PaymentReceiptEmail, outboxDAL: OutboxDAL = Depends(get_outbox_dal)
+):
     message = Mail(from_email=os.getenv("ADMIN_EMAIL"), to_emails=email.to_email)
 
     message.add_cc(os.getenv("TREASURER_EMAIL"))
@@ -280,7 +293,7 @@ def send_payment_receipt(email: PaymentReceiptEmail, background_task: Background
     message.template_id = os.getenv("PAYMENT_RECEIPT_EMAIL_TEMPLATE")
 
     try:
-        background_task.add_task(send_message, message)
+        await enqueue_mail(outboxDAL, [message], "receipt")
         return status.HTTP_202_ACCEPTED
     except Exception as e:
         capture_exception(e)
@@ -290,10 +303,14 @@ def send_payment_receipt(email: PaymentReceiptEmail, background_task: Background
 
 
 # Job related
-@router.post("/email/birthday", status_code=status.HTTP_201_CREATED)
-def send_birthday_message(
+@router.post(
+    "/email/birthday",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_external_cron)],
+)
+async def send_birthday_message(
     email: BirthdayEmail,
-    background_task: BackgroundTasks,
+    outboxDAL: OutboxDAL = Depends(get_outbox_dal),
     job_secret: Optional[str] = Header(None),
 ):
     if not job_secret:
@@ -302,19 +319,10 @@ def send_birthday_message(
     if job_secret != os.getenv("JOB_SECRET"):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
 
-    message = Mail(from_email=os.getenv("CONTACT_EMAIL"), to_emails=email.to_email)
-
-    birthday_message = return_random_message()
-
-    message.dynamic_template_data = {
-        "name": email.name,
-        "birthday_message": birthday_message,
-    }
-
-    message.template_id = os.getenv("BIRTHDAY_EMAIL_TEMPLATE")
+    message = birthday_message(email.to_email, email.name)
 
     try:
-        background_task.add_task(send_message, message)
+        await enqueue_mail(outboxDAL, [message], "birthday")
         return status.HTTP_202_ACCEPTED
     except Exception as e:
         capture_exception(e)
@@ -324,10 +332,14 @@ def send_birthday_message(
 
 
 # Job related
-@router.post("/email/renewal", status_code=status.HTTP_201_CREATED)
-def send_renewal_notification(
-    email: RenewalEmail,
-    background_task: BackgroundTasks,
+@router.post(
+    "/email/birthday/batch",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_external_cron)],
+)
+async def send_birthday_messages(
+    emails: List[BirthdayEmail],
+    outboxDAL: OutboxDAL = Depends(get_outbox_dal),
     job_secret: Optional[str] = Header(None),
 ):
     if not job_secret:
@@ -336,19 +348,41 @@ def send_renewal_notification(
     if job_secret != os.getenv("JOB_SECRET"):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
 
-    message = Mail(from_email=os.getenv("ADMIN_EMAIL"), to_emails=email.to_email)
+    if not emails:
+        return {"queued": 0}
 
-    message.dynamic_template_data = {
-        "name": email.name,
-        "days": email.days,
-        "day": email.days == 1,
-        "renewal_url": email.renewal_url,
-    }
+    messages = [birthday_message(email.to_email, email.name) for email in emails]
+
+    try:
+        return {"queued": await enqueue_mail(outboxDAL, messages, "birthday")}
+    except Exception as e:
+        capture_exception(e)
+        raise HTTPException(
+            status.HTTP_403_FORBIDDEN, detail="The emails could not be sent"
+        )
+
+
+# Job related
+@router.post(
+    "/email/renewal",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_external_cron)],
+)
+async def send_renewal_notification(
+    email: RenewalEmail,
+    outboxDAL: OutboxDAL = Depends(get_outbox_dal),
+    job_secret: Optional[str] = Header(None),
+):
+    if not job_secret:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
 
-    message.template_id = os.getenv("RENEWAL_EMAIL_TEMPLATE")
+    if job_secret != os.getenv("JOB_SECRET"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+
+    message = renewal_message(email.to_email, email.name, email.days, email.renewal_url)
 
     try:
-        background_task.add_task(send_message, message)
+        await enqueue_mail(outboxDAL, [message], "renewal")
         return status.HTTP_202_ACCEPTED
     except Exception as e:
         capture_exception(e)
@@ -357,23 +391,50 @@ def send_renewal_notification(
         )
 
 
-# Partial job related. Hence skipping the secret
-@router.post("/email/expired_membership", status_code=status.HTTP_201_CREATED)
-def send_expiry_notification(
-    email: ExpiredMembershipEmail, background_task: BackgroundTasks
+# Job related
+@router.post(
+    "/email/renewal/batch",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_external_cron)],
+)
+async def send_renewal_notifications(
+    emails: List[RenewalEmail],
+    outboxDAL: OutboxDAL = Depends(get_outbox_dal),
+    job_secret: Optional[str] = Header(None),
 ):
+    if not job_secret:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
 
-    message = Mail(from_email=os.getenv("ADMIN_EMAIL"), to_emails=email.to_email)
+    if job_secret != os.getenv("JOB_SECRET"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
 
-    message.dynamic_template_data = {
-        "name": email.name,
-        "renewal_url": email.renewal_url,
-    }
+    if not emails:
+        return {"queued": 0}
 
-    message.template_id = os.getenv("MEMBERSHIP_EXPIRED_EMAIL_TEMPLATE")
+    messages = [
+        renewal_message(email.to_email, email.name, email.days, email.renewal_url)
+        for email in emails
+    ]
 
     try:
-        background_task.add_task(send_message, message)
+        return {"queued": await enqueue_mail(outboxDAL, messages, "renewal")}
+    except Exception as e:
+        capture_exception(e)
+        raise HTTPException(
+            status.HTTP_403_FORBIDDEN, detail="The emails could not be sent"
+        )
+
+
+# Partial job related. Hence skipping the secret. It is also called outside
+# of the cron, so it stays open when the scheduler runs the jobs
+@router.post("/email/expired_membership", status_code=status.HTTP_201_CREATED)
+async def send_expiry_notification(
+    email: ExpiredMembershipEmail, outboxDAL: OutboxDAL = Depends(get_outbox_dal)
+):
+    message = expired_membership_message(email.to_email, email.name, email.renewal_url)
+
+    try:
+        await enqueue_mail(outboxDAL, [message], "expired_membership")
         return status.HTTP_202_ACCEPTED
     except Exception as e:
         capture_exception(e)
@@ -385,16 +446,10 @@ def send_expiry_notification(
 @router.post("/email/events", status_code=status.HTTP_201_CREATED)
 async def send_event_notification(
     email: EventNotificationEmail,
-    background_task: BackgroundTasks,
+    outboxDAL: OutboxDAL = Depends(get_outbox_dal),
     userDAL: UserDAL = Depends(get_user_dal),
 ):
-    records = await userDAL.get_all_users_subscribed_to_emails()
-
-    emails = [record.email for record in records]
-
-    message = Mail(from_email=os.getenv("ADMIN_EMAIL"), to_emails=emails)
-
-    message.dynamic_template_data = {
+    template_data = {
         "event_name": email.event_name,
         "event_date": email.event_date.strftime("%d %B %Y"),
         "event_time": email.event_time,
@@ -402,11 +457,20 @@ async def send_event_notification(
         "chief_guest": email.chief_guest,
     }
 
-    message.template_id = os.getenv("EVENT_NOTIFICATION_EMAIL_TEMPLATE")
+    def build_message():
+        message = Mail(from_email=os.getenv("ADMIN_EMAIL"))
+        message.template_id = os.getenv("EVENT_NOTIFICATION_EMAIL_TEMPLATE")
+
+        return message
 
     try:
-        background_task.add_task(send_message, message)
-        return status.HTTP_202_ACCEPTED
+        return await enqueue_bulk_mail(
+            outboxDAL,
+            userDAL.stream_subscribed_emails(),
+            build_message,
+            template_data,
+            "event_notification",
+        )
     except Exception as e:
         capture_exception(e)
         raise HTTPException(
@@ -414,42 +478,50 @@ async def send_event_notification(
         )
 
 
+# The association's own mailboxes receive a copy of every bulk email
+async def bulk_email_recipients(userDAL: UserDAL):
+    yield [assn_email for assn_email in mailbox_mapping.keys() if assn_email]
+
+    async for alumni_emails in userDAL.stream_subscribed_emails(
+        active_members_only=True
+    ):
+        yield alumni_emails
+
+
 @router.post("/email/alumni", status_code=status.HTTP_201_CREATED)
 async def send_bulk_emails_to_alumni(
     email: BulkEmailNotification,
-    background_task: BackgroundTasks,
+    outboxDAL: OutboxDAL = Depends(get_outbox_dal),
     userDAL: UserDAL = Depends(get_user_dal),
 ):
-    records = await userDAL.get_all_users_for_bulk_email_send()
-
-    association_emails = [assn_email for assn_email in mailbox_mapping.keys()]
-    alumni_emails = [record.email for record in records]
-
-    message = Mail(
-        from_email=Email(
-            email.mailbox,
-            f"{mailbox_mapping[email.mailbox]} - The MES College Alumni Association®",
-        ),
-        to_emails=association_emails,
-    )
-
-    for alumni_email in alumni_emails:
-        message.add_bcc(Bcc(alumni_email))
-
     mailbox_name = mailbox_mapping[email.mailbox]
     modified_message = email.message.replace("\n", "<br />")
 
-    message.dynamic_template_data = {
+    template_data = {
         "subject": email.subject,
         "mailbox_name": mailbox_name,
         "message": modified_message,
     }
 
-    message.template_id = os.getenv("BULK_EMAIL_TEMPLATE")
+    def build_message():
+        message = Mail(
+            from_email=Email(
+                email.mailbox,
+                f"{mailbox_name} - The MES College Alumni Association®",
+            )
+        )
+        message.template_id = os.getenv("BULK_EMAIL_TEMPLATE")
+
+        return message
 
     try:
-        background_task.add_task(send_message, message)
-        return status.HTTP_202_ACCEPTED
+        return await enqueue_bulk_mail(
+            outboxDAL,
+            bulk_email_recipients(userDAL),
+            build_message,
+            template_data,
+            "bulk",
+        )
     except Exception as e:
         capture_exception(e)
         raise HTTPException(
@@ -458,7 +530,9 @@ async def send_bulk_emails_to_alumni(
 
 
 @router.post("/email/auto_response", status_code=status.HTTP_201_CREATED)
-async def send_auto_response_email(email: EmailBase, background_task: BackgroundTasks):
+async def send_auto_response_email(
+    email: EmailBase, outboxDAL: OutboxDAL = Depends(get_outbox_dal)
+):
     message = Mail(
         from_email=os.getenv("ADMIN_EMAIL"),
         to_emails=email.to_email,
@@ -467,10 +541,120 @@ async def send_auto_response_email(email: EmailBase, background_task: Background
     message.template_id = os.getenv("AUTO_RESPONSE_EMAIL_TEMPLATE")
 
     try:
-        background_task.add_task(send_message, message)
+        await enqueue_mail(outboxDAL, [message], "auto_response")
         return status.HTTP_202_ACCEPTED
     except Exception as e:
         capture_exception(e)
         raise HTTPException(
             status.HTTP_403_FORBIDDEN, detail="The email could not be sent"
         )
+
+
+@router.get(
+    "/email/outbox",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_admin)],
+)
+async def get_outbox_status(
+    limit: int = Query(20, ge=1, le=100),
+    outboxDAL: OutboxDAL = Depends(get_read_only_outbox_dal),
+):
+    try:
+        stats = await outboxDAL.get_outbox_stats()
+        records = await outboxDAL.get_failures(limit)
+
+        failures = []
+        failure_obj = {}
+
+        for record in records:
+            failure_obj["id"] = record.id
+            failure_obj["category"] = record.category
+            failure_obj["status"] = record.status
+            failure_obj["attempts"] = record.attempts
+            failure_obj["last_error"] = record.last_error
+            failure_obj["next_attempt_at"] = (
+                record.next_attempt_at if record.status == "pending" else None
+            )
+            failure_obj["created_at"] = record.created_at
+
+            failures.append(failure_obj.copy())
+
+        return {
+            "pending": stats.pending,
+            "retrying": stats.retrying,
+            "sent": stats.sent,
+            "dead": stats.dead,
+            "oldest_pending_seconds": (
+                datetime.datetime.utcnow() - stats.oldest_pending
+            ).total_seconds()
+            if stats.oldest_pending
+            else None,
+            "failures": failures,
+        }
+    except Exception as e:
+        capture_exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not fetch the outbox status",
+        )
+
+
+@router.get(
+    "/email/campaigns/{campaign}",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_admin)],
+)
+async def get_campaign_status(
+    campaign: str,
+    outboxDAL: OutboxDAL = Depends(get_read_only_outbox_dal),
+):
+    records = await outboxDAL.get_campaign_batches(campaign)
+
+    if not records:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No emails were found for the campaign",
+        )
+
+    batches = []
+    batch_obj = {}
+
+    for record in records:
+        batch_obj["id"] = record.id
+        batch_obj["status"] = record.status
+        batch_obj["recipients"] = record.recipient_count
+        batch_obj["attempts"] = record.attempts
+        batch_obj["last_error"] = record.last_error
+        batch_obj["sent_at"] = record.sent_at
+
+        batches.append(batch_obj.copy())
+
+    return {
+        "campaign": campaign,
+        "recipients": sum(batch["recipients"] for batch in batches),
+        "sent": sum(
+            batch["recipients"] for batch in batches if batch["status"] == "sent"
+        ),
+        "batches": batches,
+    }
+
+
+# Moves a dead email back to the queue, e.g. after the cause has been fixed
+@router.put(
+    "/email/outbox/{id}/requeue",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_admin)],
+)
+async def requeue_outbox_email(
+    id: int,
+    outboxDAL: OutboxDAL = Depends(get_outbox_dal),
+):
+    requeued = await outboxDAL.requeue(id)
+
+    if not requeued:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No dead email was found for the id",
+        )
+
+    return {"requeued": id}
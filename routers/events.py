@@ -1,21 +1,26 @@
 import datetime
-import os
 import uuid
 from typing import Optional
 
-import requests_async as requests
 from fastapi import Depends
-from fastapi import Header
 from fastapi import HTTPException
 from fastapi import status
 from pydantic import BaseModel
 from sentry_sdk import capture_exception
 
 from . import get_event_dal
+from . import get_read_only_event_dal
 from . import router
 from database.data_access.eventDAL import EventDAL
-from helpers.imagekit_init import initialize_imagekit_prod
-from helpers.token_decoder import decode_auth_token
+from helpers.admin_auth import require_admin
+from helpers.event_media import event_folder
+from helpers.event_media import fetch_cover_photo_url
+from helpers.event_media import fetch_event_images
+from helpers.event_media import resolve_cover_photo
+from helpers.event_media import resolve_cover_photos
+from helpers.event_media import store_cover_photos
+from helpers.imagekit_init import create_imagekit_folder
+from helpers.imagekit_init import run_on_imagekit_executor
 
 
 class EventBase(BaseModel):
@@ -30,26 +35,15 @@ class EventBase(BaseModel):
         orm_mode = True
 
 
-@router.post("/events", status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/events",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_admin)],
+)
 async def post_new_event(
     event: EventBase,
-    authorization: Optional[str] = Header(None),
     eventDAL: EventDAL = Depends(get_event_dal),
 ):
-    if not authorization:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Uh uh uh... You didn't say the magic word",
-        )
-
-    valid_token = decode_auth_token(authorization)
-
-    if not valid_token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Uh uh uh... You didn't say the magic word",
-        )
-
     try:
         record = await eventDAL.create_new_event(
             event.name,
@@ -63,20 +57,8 @@ async def post_new_event(
         formatted_name = event.name.split(" ")
         formatted_name = ("-").join(formatted_name)
 
-        await requests.post(
-            "https://api.imagekit.io/v1/folder/",
-            auth=(os.getenv("IMAGEKIT_PRIVATE_KEY_PROD") + ":", " "),
-            data={"folderName": formatted_name, "parentFolderPath": "MES-AA/Events"},
-        )
-
-        await requests.post(
-            "https://api.imagekit.io/v1/folder/",
-            auth=(os.getenv("IMAGEKIT_PRIVATE_KEY_PROD") + ":", " "),
-            data={
-                "folderName": "cover-photo",
-                "parentFolderPath": f"MES-AA/Events/{formatted_name}",
-            },
-        )
+        await create_imagekit_folder(formatted_name, "MES-AA/Events")
+        await create_imagekit_folder("cover-photo", f"MES-AA/Events/{formatted_name}")
 
         if not record:
             raise HTTPException(
@@ -102,13 +84,48 @@ async def post_new_event(
         )
 
 
+# Called after the cover photo of an event is uploaded or replaced
+@router.put(
+    "/events/{id}/cover_photo",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_admin)],
+)
+async def refresh_event_cover_photo(
+    id: uuid.UUID,
+    eventDAL: EventDAL = Depends(get_event_dal),
+):
+    record = await eventDAL.fetch_specific_event(id)
+
+    if not record:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Event not found"
+        )
+
+    try:
+        cover_photo_url = await run_on_imagekit_executor(
+            fetch_cover_photo_url, event_folder(record.name)
+        )
+
+        await eventDAL.update_cover_photo_url(id, cover_photo_url)
+
+        resolve_cover_photo.cache_clear()
+
+        return {"event_id": id, "cover_photo": cover_photo_url}
+    except Exception as e:
+        capture_exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not refresh the cover photo",
+        )
+
+
 @router.get("/events/{status}", status_code=status.HTTP_200_OK)
-async def get_all_events(status: str, eventDAL: EventDAL = Depends(get_event_dal)):
+async def get_all_events(
+    status: str, eventDAL: EventDAL = Depends(get_read_only_event_dal)
+):
     events = []
     event_obj = {}
 
-    imagekit = initialize_imagekit_prod()
-
     try:
         if status == "upcoming":
             records = await eventDAL.fetch_all_upcoming_events()
@@ -116,6 +133,20 @@ async def get_all_events(status: str, eventDAL: EventDAL = Depends(get_event_dal
         if status == "completed":
             records = await eventDAL.fetch_all_completed_events()
 
+        # Cover photos that have not been stored yet are looked up concurrently
+        # and stored for the next listings
+        unresolved = [record for record in records if not record.cover_photo_url]
+        cover_photos = await resolve_cover_photos(
+            [record.name for record in unresolved]
+        )
+        resolved = {
+            record.id: cover_photo
+            for record, cover_photo in zip(unresolved, cover_photos)
+            if cover_photo
+        }
+
+        await store_cover_photos(resolved)
+
         for record in records:
             date_of_event = (
                 "TODAY"
@@ -123,18 +154,7 @@ async def get_all_events(status: str, eventDAL: EventDAL = Depends(get_event_dal
                 else record.event_date.strftime("%d-%b-%Y")
             )
 
-            formatted_name = record.name.split(" ")
-            formatted_name = ("-").join(formatted_name)
-
-            cover_photo = imagekit.list_files(
-                {"path": f"MES-AA/Events/{formatted_name}/cover-photo", "limit": 1}
-            )
-
-            cover_photo = (
-                cover_photo["response"][0]["url"]
-                if len(cover_photo["response"]) != 0
-                else None
-            )
+            cover_photo = record.cover_photo_url or resolved.get(record.id)
 
             event_obj["event_id"] = record.id
             event_obj["name"] = record.name.capitalize()
@@ -158,18 +178,15 @@ async def get_all_events(status: str, eventDAL: EventDAL = Depends(get_event_dal
 
 
 @router.get("/event/{id}", status_code=status.HTTP_200_OK)
-async def get_event(id: uuid.UUID, eventDAL: EventDAL = Depends(get_event_dal)):
+async def get_event(
+    id: uuid.UUID, eventDAL: EventDAL = Depends(get_read_only_event_dal)
+):
 
     try:
         record = await eventDAL.fetch_specific_event(id)
 
-        imagekit = initialize_imagekit_prod()
-
-        formatted_name = record.name.split(" ")
-        formatted_name = ("-").join(formatted_name)
-
-        files = imagekit.list_files(
-            {"path": f"MES-AA/Events/{formatted_name}", "limit": 100}
+        images = await run_on_imagekit_executor(
+            fetch_event_images, event_folder(record.name)
         )
 
         return {
@@ -179,7 +196,7 @@ async def get_event(id: uuid.UUID, eventDAL: EventDAL = Depends(get_event_dal)):
             "time": record.event_time,
             "venue": record.venue,
             "chief_guest": record.chief_guest,
-            "images": files["response"],
+            "images": images,
         }
     except Exception as e:
         capture_exception(e)
@@ -190,7 +207,9 @@ async def get_event(id: uuid.UUID, eventDAL: EventDAL = Depends(get_event_dal)):
 
 
 @router.get("/events/search/{search_text}", status_code=status.HTTP_200_OK)
-async def search_events(search_text: str, eventDAL: EventDAL = Depends(get_event_dal)):
+async def search_events(
+    search_text: str, eventDAL: EventDAL = Depends(get_read_only_event_dal)
+):
     events = []
     event_obj = {}
 
@@ -219,7 +238,7 @@ async def search_events(search_text: str, eventDAL: EventDAL = Depends(get_event
 
 
 @router.get("/events/upcoming/current_week", status_code=status.HTTP_200_OK)
-async def upcoming_events(eventDAL: EventDAL = Depends(get_event_dal)):
+async def upcoming_events(eventDAL: EventDAL = Depends(get_read_only_event_dal)):
     events = []
     event_obj = {}
 
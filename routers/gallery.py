@@ -1,31 +1,38 @@
+import hashlib
+import os
+from typing import Optional
+
+from fastapi import Depends
+from fastapi import Header
+from fastapi import HTTPException
+from fastapi import Query
+from fastapi import Response
 from fastapi import status
 from sentry_sdk import capture_exception
 
+from . import get_gallery_dal
+from . import get_read_only_gallery_dal
 from . import router
-from helpers.imagekit_init import initialize_imagekit_prod
+from database.data_access.galleryDAL import GalleryDAL
+from helpers.imagekit_init import imagekit_client
+from helpers.imagekit_init import run_on_imagekit_executor
 
-# import cloudinary.api
+GALLERY_FOLDER = "MES-AA/Gallery"
 
+# Maximum page size of the ImageKit list files API
+IMAGEKIT_PAGE_SIZE = 100
 
-@router.get("/gallery/images/all", status_code=status.HTTP_200_OK)
-async def get_images_for_gallery():
-    # cloudinary.config(
-    #     cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    #     api_key=os.getenv("CLOUDINARY_API_KEY"),
-    #     api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-    # )
 
-    # return cloudinary.api.resources(
-    #     prefix="MES-AA/main_gallery", type="upload", context=True, max_results=100
-    # )
+def fetch_gallery_files():
+    imagekit = imagekit_client()
 
-    try:
-        transformed_files = []
-        file_obj = {}
+    gallery_files = []
+    skip = 0
 
-        imagekit = initialize_imagekit_prod()
-
-        files = imagekit.list_files({"path": "MES-AA/Gallery", "limit": 100})
+    while True:
+        files = imagekit.list_files(
+            {"path": GALLERY_FOLDER, "limit": IMAGEKIT_PAGE_SIZE, "skip": skip}
+        )
 
         for file in files["response"]:
             file_url = imagekit.url(
@@ -37,13 +44,84 @@ async def get_images_for_gallery():
 
             file_url = file_url.split("?")
 
-            file_obj["url"] = file_url[0]
-            file_obj["fileId"] = file["fileId"]
-            file_obj["height"] = file["height"]
-            file_obj["width"] = file["width"]
+            gallery_files.append(
+                {
+                    "url": file_url[0],
+                    "fileId": file["fileId"],
+                    "height": file["height"],
+                    "width": file["width"],
+                }
+            )
+
+        if len(files["response"]) < IMAGEKIT_PAGE_SIZE:
+            return gallery_files
+
+        skip += IMAGEKIT_PAGE_SIZE
+
+
+@router.get("/gallery/images/all", status_code=status.HTTP_200_OK)
+async def get_images_for_gallery(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    galleryDAL: GalleryDAL = Depends(get_read_only_gallery_dal),
+    if_none_match: Optional[str] = Header(None),
+):
+    try:
+        total, refreshed_at = await galleryDAL.fetch_manifest_version()
+
+        # The manifest only changes when it is refreshed, so the refresh time
+        # together with the requested page identifies the response
+        version = f"{total}:{refreshed_at}:{limit}:{offset}"
+        etag = f'"{hashlib.sha1(version.encode()).hexdigest()}"'
+
+        if if_none_match == etag:
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+            )
+
+        records = await galleryDAL.fetch_manifest_page(limit, offset)
+
+        transformed_files = []
+        file_obj = {}
+
+        for record in records:
+            file_obj["url"] = record.url
+            file_obj["fileId"] = record.file_id
+            file_obj["height"] = record.height
+            file_obj["width"] = record.width
 
             transformed_files.append(file_obj.copy())
-        return transformed_files[::-1]
-        # return await gallery_DAL.fetch_all_images_for_gallery()
+
+        response.headers["ETag"] = etag
+        response.headers["X-Total-Count"] = str(total)
+
+        return transformed_files
+    except Exception as e:
+        capture_exception(e)
+
+
+# Job related. Also called after images are added to or removed from the gallery
+@router.put("/gallery/manifest", status_code=status.HTTP_201_CREATED)
+async def refresh_gallery_manifest(
+    galleryDAL: GalleryDAL = Depends(get_gallery_dal),
+    job_secret: Optional[str] = Header(None),
+):
+    if not job_secret:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+
+    if job_secret != os.getenv("JOB_SECRET"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        gallery_files = await run_on_imagekit_executor(fetch_gallery_files)
+
+        images = await galleryDAL.replace_manifest(gallery_files)
+
+        return {"images": images}
     except Exception as e:
         capture_exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not refresh the gallery manifest",
+        )
@@ -0,0 +1,53 @@
+import os
+from typing import Optional
+
+from fastapi import Header
+from fastapi import HTTPException
+from fastapi import Query
+from fastapi import status
+from sentry_sdk import capture_exception
+
+from . import router
+from helpers.daily_jobs import DAILY_JOBS
+from helpers.scheduler import run_job
+
+
+# Runs a daily job right away instead of waiting for the scheduler. Jobs that
+# already ran today are skipped unless force is set
+@router.post("/jobs/run/{job_name}", status_code=status.HTTP_201_CREATED)
+async def run_daily_job(
+    job_name: str,
+    force: bool = Query(False),
+    job_secret: Optional[str] = Header(None),
+):
+    if not job_secret:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+
+    if job_secret != os.getenv("JOB_SECRET"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+
+    if job_name not in DAILY_JOBS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown job: {job_name}",
+        )
+
+    try:
+        result = await run_job(job_name, force=force)
+    except Exception as e:
+        capture_exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"The {job_name} job failed",
+        )
+
+    if result is None:
+        return {"job": job_name, "status": "skipped"}
+
+    if result["status"] == "failure":
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"The {job_name} job failed",
+        )
+
+    return result
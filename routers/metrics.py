@@ -0,0 +1,31 @@
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header
+from fastapi import HTTPException
+from fastapi import status
+from fastapi.responses import PlainTextResponse
+
+from . import router
+from helpers.metrics import render_metrics
+
+# Prometheus text exposition format. The charset is added by the response
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+# Scraped by Prometheus with METRICS_TOKEN as the bearer token. Without the
+# token set the metrics are not served at all
+@router.get("/metrics", status_code=status.HTTP_200_OK, include_in_schema=False)
+async def get_metrics(authorization: Optional[str] = Header(None)):
+    metrics_token = os.getenv("METRICS_TOKEN")
+
+    if not metrics_token or not authorization:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+
+    if not hmac.compare_digest(
+        authorization.encode(), f"Bearer {metrics_token}".encode()
+    ):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
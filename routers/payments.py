@@ -1,18 +1,33 @@
+import json
 import os
 from typing import Dict
 from typing import Optional
 
-import razorpay
 from fastapi import Depends
+from fastapi import Header
 from fastapi import HTTPException
+from fastapi import Query
+from fastapi import Request
 from fastapi import status
 from pydantic import BaseModel
 from razorpay.errors import SignatureVerificationError
 from sentry_sdk import capture_exception
 
+from . import get_payment_dal
+from . import get_read_only_reconciliation_dal
 from . import get_user_dal
 from . import router
+from database.data_access.paymentDAL import PaymentDAL
+from database.data_access.reconciliationDAL import ReconciliationDAL
 from database.data_access.userDAL import UserDAL
+from helpers.admin_auth import require_admin
+from helpers.payment_events import PAYMENT_CONFIRMED_EVENTS
+from helpers.payment_events import payment_ids
+from helpers.payment_events import wake_payment_events_worker
+from helpers.payment_events import webhook_event_id
+from helpers.payment_gateway import create_order as create_gateway_order
+from helpers.payment_gateway import payment_gateway
+from helpers.payment_gateway import PaymentGatewayTimeout
 
 
 class Order(BaseModel):
@@ -29,16 +44,9 @@ class PaymentVerification(BaseModel):
     email: str
 
 
-client = razorpay.Client(os.getenv("RAZORPAY_KEY_ID"), os.getenv("RAZORPAY_KEY_SECRET"))
-
-
 @router.post("/orders", status_code=status.HTTP_201_CREATED)
 async def create_order(order: Order):
     try:
-        client = razorpay.Client(
-            auth=(os.getenv("RAZORPAY_KEY_ID"), os.getenv("RAZORPAY_KEY_SECRET"))
-        )
-
         order_data = {
             "amount": order.amount,
             "currency": order.currency,
@@ -46,38 +54,150 @@ async def create_order(order: Order):
             "notes": order.notes,
         }
 
-        return client.order.create(order_data)
+        return await create_gateway_order(order_data)
+    except PaymentGatewayTimeout as e:
+        capture_exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="The payment gateway did not respond",
+        )
     except Exception as e:
         capture_exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not create the order",
+        )
 
 
 @router.post("/verification", status_code=status.HTTP_201_CREATED)
 async def verify_payment(
     payment_verification: PaymentVerification, user_dal: UserDAL = Depends(get_user_dal)
 ):
-    client = razorpay.Client(
-        auth=(os.getenv("RAZORPAY_KEY_ID"), os.getenv("RAZORPAY_KEY_SECRET"))
-    )
-
-    params_dict = {
-        "razorpay_order_id": payment_verification.order_id,
-        "razorpay_payment_id": payment_verification.payment_id,
-        "razorpay_signature": payment_verification.signature,
-    }
-
     try:
-        verification_status = client.utility.verify_payment_signature(params_dict)
-
-        if verification_status is None:  # success
-            await user_dal.update_payment_status_by_email(
-                payment_verification.email,
-                payment_verification.payment_id,
-                payment_verification.order_id,
-            )
-            return {"status": verification_status}
+        # Only an HMAC of the ids, so it is not worth a trip to the executor
+        payment_gateway().verify_payment_signature(
+            payment_verification.order_id,
+            payment_verification.payment_id,
+            payment_verification.signature,
+        )
+
+        await user_dal.update_payment_status_by_email(
+            payment_verification.email,
+            payment_verification.payment_id,
+            payment_verification.order_id,
+        )
+        return {"status": None}
     except SignatureVerificationError:
         capture_exception(SignatureVerificationError)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Payment verification failed",
         )
+
+
+# Razorpay webhooks. The events are only recorded here, the payment events
+# worker applies them to the users in batches
+@router.post("/payments/webhook", status_code=status.HTTP_200_OK)
+async def payment_webhook(
+    request: Request,
+    x_razorpay_signature: Optional[str] = Header(None),
+    x_razorpay_event_id: Optional[str] = Header(None),
+    paymentDAL: PaymentDAL = Depends(get_payment_dal),
+):
+    body = await request.body()
+
+    if not x_razorpay_signature:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        payment_gateway().verify_webhook_signature(body, x_razorpay_signature)
+        payload = json.loads(body)
+    except (SignatureVerificationError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid webhook",
+        )
+
+    event = payload.get("event", "")
+    order_id, payment_id = payment_ids(payload)
+
+    confirms_payment = event in PAYMENT_CONFIRMED_EVENTS and order_id and payment_id
+
+    try:
+        recorded = await paymentDAL.record_event(
+            webhook_event_id(x_razorpay_event_id, body),
+            event,
+            order_id,
+            payment_id,
+            payload,
+            "pending" if confirms_payment else "ignored",
+        )
+    except Exception as e:
+        capture_exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not record the webhook event",
+        )
+
+    if recorded and confirms_payment:
+        wake_payment_events_worker()
+
+    return {"status": "recorded" if recorded else "duplicate"}
+
+
+# Mismatches found by the latest run of the payment reconciliation job
+@router.get(
+    "/payments/reconciliation",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_admin)],
+)
+async def get_payment_reconciliation(
+    limit: int = Query(500, ge=1, le=5000),
+    reconciliationDAL: ReconciliationDAL = Depends(get_read_only_reconciliation_dal),
+):
+    try:
+        run = await reconciliationDAL.get_latest_run()
+
+        if run:
+            counts = await reconciliationDAL.count_mismatches_by_kind(run.id)
+            records = await reconciliationDAL.get_mismatches(run.id, limit)
+    except Exception as e:
+        capture_exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not fetch the reconciliation report",
+        )
+
+    if not run:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Payments have not been reconciled yet",
+        )
+
+    mismatches = []
+    mismatch_obj = {}
+
+    for record in records:
+        mismatch_obj["kind"] = record.kind
+        mismatch_obj["order_id"] = record.order_id
+        mismatch_obj["payment_id"] = record.payment_id
+        mismatch_obj["user_id"] = record.user_id
+        mismatch_obj["email"] = record.email
+        # Settled amounts are in paise, the users' amounts in rupees
+        mismatch_obj["settled_amount"] = (
+            record.settled_amount / 100 if record.settled_amount is not None else None
+        )
+        mismatch_obj["payment_amount"] = record.payment_amount
+
+        mismatches.append(mismatch_obj.copy())
+
+    return {
+        "run_at": run.run_at,
+        "source": run.source,
+        "window_start": run.window_start,
+        "window_end": run.window_end,
+        "settlement_rows": run.settlement_rows,
+        "mismatch_count": run.mismatch_count,
+        "mismatches_by_kind": counts,
+        "mismatches": mismatches,
+    }
@@ -1,19 +1,23 @@
 import datetime
 import os
+from typing import List
 from typing import Optional
 
 from dateutil.relativedelta import relativedelta
 from fastapi import Depends
 from fastapi import Header
 from fastapi import HTTPException
+from fastapi import Query
 from fastapi import status
 from pydantic import BaseModel
 from sentry_sdk import capture_exception
 
+from . import get_read_only_user_dal
 from . import get_user_dal
 from . import router
 from database.data_access.userDAL import UserDAL
 from helpers.modified_id import modify_record_id
+from helpers.scheduler import require_external_cron
 
 
 class Renewal(BaseModel):
@@ -23,6 +27,9 @@ class Renewal(BaseModel):
     membership_valid_upto: str
     membership_certificate_url: Optional[str]
     payment_mode: str
+    # Order and payment of a renewal paid online
+    razorpay_order_id: Optional[str]
+    razorpay_payment_id: Optional[str]
 
     class Config:
         orm_mode = True
@@ -35,6 +42,13 @@ class RenewalHash(BaseModel):
         orm_mode = True
 
 
+class RenewalHashBatch(BaseModel):
+    emails: List[str]
+
+    class Config:
+        orm_mode = True
+
+
 class ClearRenewalHash(BaseModel):
     id: str
 
@@ -43,7 +57,9 @@ class ClearRenewalHash(BaseModel):
 
 
 @router.get("/renewal_details/{renewal_hash}", status_code=status.HTTP_200_OK)
-async def renewal_details(renewal_hash: str, userDAL: UserDAL = Depends(get_user_dal)):
+async def renewal_details(
+    renewal_hash: str, userDAL: UserDAL = Depends(get_read_only_user_dal)
+):
     try:
         split_hash = renewal_hash.split("-")
 
@@ -129,6 +145,8 @@ async def renew_annual_membership(
             membership_renewal.membership_certificate_url,
             date_renewed,
             membership_renewal.payment_mode,
+            membership_renewal.razorpay_order_id,
+            membership_renewal.razorpay_payment_id,
         )
     except Exception as e:
         capture_exception(e)
@@ -152,11 +170,61 @@ async def clear_hash_after_online_payment(
         )
 
 
+# Job related
+@router.get("/expiring_memberships", status_code=status.HTTP_200_OK)
+async def get_all_memberships_due_to_expire_by_bucket(
+    days: List[int] = Query([30, 15, 7, 1]),
+    userDAL: UserDAL = Depends(get_read_only_user_dal),
+    job_secret: Optional[str] = Header(None),
+):
+    if not job_secret:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+
+    if job_secret != os.getenv("JOB_SECRET"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+
+    today = datetime.date.today()
+
+    expiry_dates = {
+        today + relativedelta(days=days_remaining): days_remaining
+        for days_remaining in days
+    }
+
+    expiring_memberships = {str(days_remaining): [] for days_remaining in days}
+    expiring_membership_obj = {}
+
+    try:
+        records = await userDAL.get_expiring_memberships_for_dates(
+            list(expiry_dates.keys())
+        )
+
+        for record in records:
+            days_remaining = expiry_dates[record.membership_valid_upto]
+
+            expiring_membership_obj["name"] = record.first_name.title()
+            expiring_membership_obj["email"] = record.email
+            expiring_membership_obj["alt_user_id"] = record.alt_user_id
+            expiring_membership_obj["days_to_expiry"] = days_remaining
+
+            expiring_memberships[str(days_remaining)].append(
+                expiring_membership_obj.copy()
+            )
+
+        return expiring_memberships
+
+    except Exception as e:
+        capture_exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not fetch expiring memberships",
+        )
+
+
 # Job related
 @router.get("/expiring_memberships/{days_remaining}", status_code=status.HTTP_200_OK)
 async def get_all_memberships_due_to_expire(
     days_remaining: int,
-    userDAL: UserDAL = Depends(get_user_dal),
+    userDAL: UserDAL = Depends(get_read_only_user_dal),
     job_secret: Optional[str] = Header(None),
 ):
     if not job_secret:
@@ -196,7 +264,11 @@ async def get_all_memberships_due_to_expire(
 
 
 # Job related
-@router.put("/renewal_hash", status_code=status.HTTP_201_CREATED)
+@router.put(
+    "/renewal_hash",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_external_cron)],
+)
 async def generate_renewal_hash(
     renewal_hash: RenewalHash,
     userDAL: UserDAL = Depends(get_user_dal),
@@ -221,7 +293,11 @@ async def generate_renewal_hash(
 
 
 # Job related
-@router.put("/expire_active_memberships", status_code=status.HTTP_201_CREATED)
+@router.put(
+    "/expire_active_memberships",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_external_cron)],
+)
 async def expire_membership(
     email: RenewalHash,
     userDAL: UserDAL = Depends(get_user_dal),
@@ -245,10 +321,69 @@ async def expire_membership(
         )
 
 
+# Job related
+@router.put(
+    "/renewal_hash/batch",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_external_cron)],
+)
+async def generate_renewal_hashes(
+    renewal_hashes: RenewalHashBatch,
+    userDAL: UserDAL = Depends(get_user_dal),
+    job_secret: Optional[str] = Header(None),
+):
+    if not job_secret:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+
+    if job_secret != os.getenv("JOB_SECRET"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        return await userDAL.create_renewal_hashes(renewal_hashes.emails)
+    except Exception as e:
+        capture_exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not generate the renewal hashes",
+        )
+
+
+# Job related
+@router.put(
+    "/expire_active_memberships/batch",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_external_cron)],
+)
+async def expire_memberships_in_bulk(
+    emails: RenewalHashBatch,
+    userDAL: UserDAL = Depends(get_user_dal),
+    job_secret: Optional[str] = Header(None),
+):
+    if not job_secret:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+
+    if job_secret != os.getenv("JOB_SECRET"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+
+    if not emails.emails:
+        return {"expired": 0}
+
+    try:
+        expired = await userDAL.mark_memberships_as_expired(emails.emails)
+
+        return {"expired": expired}
+    except Exception as e:
+        capture_exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not expire the memberships",
+        )
+
+
 # Job related
 @router.get("/recently_expired_memberships", status_code=status.HTTP_200_OK)
 async def get_all_recently_expired_memberships(
-    userDAL: UserDAL = Depends(get_user_dal),
+    userDAL: UserDAL = Depends(get_read_only_user_dal),
     job_secret: Optional[str] = Header(None),
 ):
     if not job_secret:
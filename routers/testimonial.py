@@ -7,6 +7,7 @@ from fastapi import status
 from pydantic import BaseModel
 from sentry_sdk import capture_exception
 
+from . import get_read_only_testimonial_dal
 from . import get_testimonial_dal
 from . import router
 from database.data_access.testimonialDAL import TestimonialDAL
@@ -23,7 +24,7 @@ class TestimonialCreate(BaseModel):
 
 @router.get("/testimonials", status_code=status.HTTP_200_OK)
 async def get_testimonials(
-    testimonial_dal: TestimonialDAL = Depends(get_testimonial_dal),
+    testimonial_dal: TestimonialDAL = Depends(get_read_only_testimonial_dal),
 ):
     try:
         results = await testimonial_dal.fetch_all_testimonials()
@@ -47,7 +48,7 @@ async def get_testimonials(
 
 @router.get("/testimonials/all", status_code=status.HTTP_200_OK)
 async def get_all_testimonials(
-    testimonial_dal: TestimonialDAL = Depends(get_testimonial_dal),
+    testimonial_dal: TestimonialDAL = Depends(get_read_only_testimonial_dal),
 ):
     try:
         return await testimonial_dal.fetch_all_testimonials()
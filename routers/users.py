@@ -1,32 +1,40 @@
 import datetime
-import io
 import os
-import secrets
 import uuid
 from typing import List
 from typing import Optional
+from typing import Tuple
 
-import requests_async as requests
 from dateutil.relativedelta import relativedelta
 from fastapi import Depends
 from fastapi import Form
 from fastapi import Header
 from fastapi import HTTPException
+from fastapi import Query
+from fastapi import Response
 from fastapi import status
 from fastapi import UploadFile
-from PIL import ExifTags
 from PIL import Image
 from PIL import UnidentifiedImageError
 from pydantic import BaseModel
 from sentry_sdk import capture_exception
 
+from . import get_read_only_user_dal
+from . import get_user_and_profile_image_dals
 from . import get_user_dal
 from . import router
+from database.data_access.profileImageDAL import ProfileImageDAL
 from database.data_access.userDAL import UserDAL
-from helpers.imagekit_init import initialize_imagekit_prod
+from helpers.admin_auth import require_admin
+from helpers.daily_jobs import birthday_window
+from helpers.image_pipeline import MAX_UPLOAD_BYTES
+from helpers.image_pipeline import process_image
+from helpers.image_pipeline import read_upload
+from helpers.image_pipeline import UploadTooLargeError
 from helpers.modified_id import abbreviated_membership
 from helpers.modified_id import modify_record_id
-from helpers.token_decoder import decode_auth_token
+from helpers.profile_images import delete_profile_folder
+from helpers.profile_images import wake_profile_image_worker
 
 
 class EmailSubscription(BaseModel):
@@ -44,29 +52,6 @@ class UpdatePaymentStatus(BaseModel):
         orm_mode = True
 
 
-# This function is mainly for images clicked on phones where the exif data causes image rotation
-def fix_image_orientation(optimized_image):
-    # sourcery skip: remove-unnecessary-else, swap-if-else-branches
-    for orientation in ExifTags.TAGS.keys():
-        if ExifTags.TAGS[orientation] == "Orientation":
-            break
-
-    exif = optimized_image._getexif()
-
-    if exif:
-        if 274 in exif.keys():
-            if exif[274] == 3:
-                optimized_image = optimized_image.rotate(180, expand=True)
-            elif exif[274] == 6:
-                optimized_image = optimized_image.rotate(270, expand=True)
-            elif exif[274] == 8:
-                optimized_image = optimized_image.rotate(90, expand=True)
-    else:
-        return optimized_image
-
-    return optimized_image
-
-
 # def upload_file_to_cloudinary(
 #     alt_user_id: str, images: List, userDAL: UserDAL = Depends(get_user_dal)
 # ):
@@ -105,46 +90,36 @@ def fix_image_orientation(optimized_image):
 #     return upload_result["secure_url"]
 
 
-def upload_file_to_imagekit(alt_user_id: str, images: List):
-    imagekit = initialize_imagekit_prod()
-
-    file_name, file_ext = os.path.splitext(images[0].filename)
-
-    file_ext = file_ext.lower()
-
-    if file_ext == ".jpg":
-        file_ext = ".jpeg"
-
+# Decodes and resizes the profile image off the event loop. The time taken by
+# each stage is returned in the Server-Timing header
+async def process_profile_image(image: UploadFile, response: Response):
     try:
-        optimized_image = Image.open(images[0].file)
-        optimized_image = fix_image_orientation(optimized_image)
-
-        in_mem_file = io.BytesIO()
-        optimized_image.save(in_mem_file, format=file_ext[1:], optimized=True)
-        in_mem_file.seek(0)
-
-        random_file_name = secrets.token_hex(8)
-
-        uploaded_image = imagekit.upload_file(
-            file=in_mem_file,
-            file_name=random_file_name,
-            options={
-                "folder": f"MES-AA/Profile/{alt_user_id}",
-                "is_private_file": False,
-                "use_unique_file_name": False,
-            },
+        data = await read_upload(image)
+    except UploadTooLargeError:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"The uploaded image is too large.\nPlease upload an image smaller than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.",
         )
 
-        return uploaded_image["response"]["url"]
-    except UnidentifiedImageError:
+    try:
+        optimized_image = await process_image(data)
+    except (UnidentifiedImageError, Image.DecompressionBombError):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="The format of the uploaded image is currently unsupported.\nPlease upload a different image.",
         )
 
+    response.headers["Server-Timing"] = ", ".join(
+        f"image-{stage};dur={duration}"
+        for stage, duration in optimized_image.timings.items()
+    )
+
+    return optimized_image
+
 
 @router.post("/register/user", status_code=status.HTTP_201_CREATED)
 async def create_user(
+    response: Response,
     prefix: str = Form(...),
     first_name: str = Form(...),
     last_name: str = Form(...),
@@ -172,8 +147,10 @@ async def create_user(
     razorpay_order_id: str = Form(...),
     razorpay_payment_id: str = Form(...),
     images: Optional[List[UploadFile]] = Form([]),
-    userDAL: UserDAL = Depends(get_user_dal),
+    dals: Tuple[UserDAL, ProfileImageDAL] = Depends(get_user_and_profile_image_dals),
 ):
+    userDAL, profileImageDAL = dals
+
     birthday = datetime.datetime.strptime(birthday, "%Y-%m-%d")
     birthday = birthday.date()
 
@@ -211,11 +188,24 @@ async def create_user(
         else os.getenv("ANNUAL_MEMBERSHIP_AMOUNT")
     )
 
+    # The image is checked and resized before the user is saved, but it is
+    # uploaded by the profile image worker so that registration does not wait
+    # on ImageKit. The upload is saved along with the user, so it survives a
+    # restart of the api
+    optimized_image = None
+
     if images:
         # image_url = upload_file_to_cloudinary(str(alt_user_id), images)
-        image_url = upload_file_to_imagekit(str(alt_user_id), images)
+        optimized_image = await process_profile_image(images[0], response)
 
     try:
+        if optimized_image:
+            profileImageDAL.enqueue(
+                str(alt_user_id),
+                optimized_image.file.getvalue(),
+                optimized_image.extension,
+            )
+
         record = await userDAL.create_user(
             prefix.title(),
             first_name.title().strip(),
@@ -245,10 +235,11 @@ async def create_user(
             razorpay_payment_id,
             str(alt_user_id),
             membership_valid_up_to,
-            image_url,
+            None,
             id_card_url,
             membership_certificate_url,
             paid_amount,
+            "pending" if optimized_image else None,
         )
 
         if not record:
@@ -257,6 +248,9 @@ async def create_user(
                 detail="Registration failed",
             )
 
+        if optimized_image:
+            wake_profile_image_worker()
+
         return {
             "id": record,
             "prefix": prefix.title(),
@@ -292,17 +286,17 @@ async def create_user(
 
 
 @router.delete("/user/delete/{alt_id}", status_code=status.HTTP_200_OK)
-async def delete_temp_user(alt_id: str, userDAL: UserDAL = Depends(get_user_dal)):
+async def delete_temp_user(
+    alt_id: str,
+    dals: Tuple[UserDAL, ProfileImageDAL] = Depends(get_user_and_profile_image_dals),
+):
+    userDAL, profileImageDAL = dals
+
     try:
         await userDAL.delete_temp_user(alt_id)
+        await profileImageDAL.delete_user_uploads(alt_id)
 
-        folder_to_delete = f"MES-AA/Profile/{alt_id}"
-
-        await requests.delete(
-            "https://api.imagekit.io/v1/folder/",
-            auth=(os.getenv("IMAGEKIT_PRIVATE_KEY_PROD") + ":", " "),
-            data={"folderPath": folder_to_delete},
-        )
+        await delete_profile_folder(alt_id)
     except Exception as e:
         capture_exception(e)
         raise HTTPException(
@@ -312,7 +306,9 @@ async def delete_temp_user(alt_id: str, userDAL: UserDAL = Depends(get_user_dal)
 
 
 @router.get("/user/{alt_id}", status_code=status.HTTP_200_OK)
-async def get_user_from_email(alt_id: str, userDAL: UserDAL = Depends(get_user_dal)):
+async def get_user_from_email(
+    alt_id: str, userDAL: UserDAL = Depends(get_read_only_user_dal)
+):
     try:
         record = await userDAL.get_user_details_for_alt_id(alt_id)
         if not record:
@@ -330,7 +326,9 @@ async def get_user_from_email(alt_id: str, userDAL: UserDAL = Depends(get_user_d
 
 
 @router.get("/card_details/{alt_user_id}", status_code=status.HTTP_200_OK)
-async def get_user_details(alt_user_id: str, userDAL: UserDAL = Depends(get_user_dal)):
+async def get_user_details(
+    alt_user_id: str, userDAL: UserDAL = Depends(get_read_only_user_dal)
+):
     try:
         record = await userDAL.get_user_details_for_alt_id(alt_user_id)
 
@@ -352,7 +350,11 @@ async def get_user_details(alt_user_id: str, userDAL: UserDAL = Depends(get_user
             if record.membership_type == "Annual"
             else None,
             "membership_type": record.membership_type,
-            "profile_url": record.profile_url,
+            # A placeholder is shown until the uploaded image is available
+            "profile_url": os.getenv("PROFILE_PLACEHOLDER_URL")
+            if record.profile_image_status == "pending"
+            else record.profile_url,
+            "profile_image_status": record.profile_image_status,
         }
     except Exception as e:
         capture_exception(e)
@@ -360,7 +362,7 @@ async def get_user_details(alt_user_id: str, userDAL: UserDAL = Depends(get_user
 
 @router.get("/user/get/{email}", status_code=status.HTTP_200_OK)
 async def check_for_existing_email(
-    email: str, userDAL: UserDAL = Depends(get_user_dal)
+    email: str, userDAL: UserDAL = Depends(get_read_only_user_dal)
 ):
     try:
         email_on_record = await userDAL.check_if_payment_is_successful(email.lower())
@@ -382,7 +384,7 @@ async def check_for_existing_email(
 
 @router.get("/user/id/{email}", status_code=status.HTTP_200_OK)
 async def get_user_details_from_email(
-    email: str, userDAL: UserDAL = Depends(get_user_dal)
+    email: str, userDAL: UserDAL = Depends(get_read_only_user_dal)
 ):
     try:
         record = await userDAL.check_if_email_exists(email.lower())
@@ -410,26 +412,15 @@ async def get_user_details_from_email(
         capture_exception(e)
 
 
-@router.get("/membership/{membership_id}", status_code=status.HTTP_200_OK)
+@router.get(
+    "/membership/{membership_id}",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_admin)],
+)
 async def get_user_details_from_membership_d(
     membership_id: str,
-    userDAL: UserDAL = Depends(get_user_dal),
-    authorization: Optional[str] = Header(None),
+    userDAL: UserDAL = Depends(get_read_only_user_dal),
 ):
-    if not authorization:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Uh uh uh... You didn't say the magic word",
-        )
-
-    valid_token = decode_auth_token(authorization)
-
-    if not valid_token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Uh uh uh... You didn't say the magic word",
-        )
-
     try:
         user_id = int(membership_id.split("-")[3])
 
@@ -458,27 +449,16 @@ async def get_user_details_from_membership_d(
         capture_exception(e)
 
 
-@router.put("/payment_status", status_code=status.HTTP_201_CREATED)
+@router.put(
+    "/payment_status",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_admin)],
+)
 async def update_user_payment_status(
     status: UpdatePaymentStatus,
     userDAL: UserDAL = Depends(get_user_dal),
-    authorization: Optional[str] = Header(None),
 ):
 
-    if not authorization:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Uh uh uh... You didn't say the magic word",
-        )
-
-    valid_token = decode_auth_token(authorization)
-
-    if not valid_token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Uh uh uh... You didn't say the magic word",
-        )
-
     try:
         if status.membership_type == "Lifetime":
             await userDAL.update_payment_status_lifetime(status.user_id)
@@ -526,7 +506,8 @@ async def email_subscription_status(
 
 @router.get("/alumni/birthdays", status_code=status.HTTP_200_OK)
 async def alumni_birthdays(
-    userDAL: UserDAL = Depends(get_user_dal),
+    days_ahead: int = Query(0, ge=0, le=31),
+    userDAL: UserDAL = Depends(get_read_only_user_dal),
     job_secret: Optional[str] = Header(None),
 ):
     if not job_secret:
@@ -538,23 +519,17 @@ async def alumni_birthdays(
     try:
         birthday_list = []
         birthday = {}
-        current_month = datetime.date.today().month
-        current_day = datetime.date.today().day
 
-        records = await userDAL.get_alumni_birthdays()
+        window = birthday_window(datetime.date.today(), days_ahead)
 
-        if not records:
-            return None
+        records = await userDAL.get_alumni_birthdays(list(window.keys()))
 
         for record in records:
-            if (
-                record.birthday.month == current_month
-                and record.birthday.day == current_day
-            ):
-                birthday["name"] = record.first_name
-                birthday["email"] = record.email
+            birthday["name"] = record.first_name
+            birthday["email"] = record.email
+            birthday["date"] = window[(record.birthday.month, record.birthday.day)]
 
-                birthday_list.append(birthday.copy())
+            birthday_list.append(birthday.copy())
 
         return birthday_list
     except Exception as e:
@@ -563,3 +538,35 @@ async def alumni_birthdays(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Could not fetch birthdays",
         )
+
+
+@router.get("/alumni/search", status_code=status.HTTP_200_OK)
+async def search_alumni(
+    q: str = Query(..., min_length=2, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    userDAL: UserDAL = Depends(get_read_only_user_dal),
+):
+    try:
+        records = await userDAL.search_members(q, limit, offset)
+
+        alumni = []
+        alumnus = {}
+
+        for record in records:
+            alumnus["name"] = (
+                record.prefix + ". " + record.first_name + " " + record.last_name
+            )
+            alumnus["batch"] = record.duration_end
+            alumnus["profession"] = record.profession
+            alumnus["profile_url"] = record.profile_url
+
+            alumni.append(alumnus.copy())
+
+        return alumni
+    except Exception as e:
+        capture_exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not search alumni",
+        )
@@ -0,0 +1,108 @@
+import asyncio
+import datetime
+import os
+import tempfile
+
+# The settings are read from the environment when the modules are imported,
+# so the test database and backends are configured before anything else
+TEST_DIRECTORY = tempfile.mkdtemp(prefix="mes-aa-api-tests-")
+
+os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite+aiosqlite:///{TEST_DIRECTORY}/test.db"
+os.environ["DATABASE_PROFILE"] = "test"
+os.environ["SQLALCHEMY_REPLICA_URI"] = ""
+os.environ["PAYMENT_GATEWAY"] = "fake"
+os.environ["MAIL_BACKEND"] = "file"
+os.environ["MAIL_FILE_DIRECTORY"] = TEST_DIRECTORY
+os.environ["SECRET_KEY"] = "test-secret-key"
+os.environ["ALGORITHM"] = "HS256"
+os.environ["ADMIN_UUID"] = "test-admin"
+
+import pytest
+
+from database.db import Base
+from database.db import async_session
+from database.db import engine
+from database.models import EmailOutbox
+from database.models import PaymentEvent
+from database.models import ProfileImageUpload
+from database.models import ReconciliationMismatch
+from database.models import ReconciliationRun
+from database.models import RenewalPayment
+from database.models import User
+
+# The other tables use the Postgres UUID type, which SQLite does not have
+TABLES = [
+    User.__table__,
+    EmailOutbox.__table__,
+    PaymentEvent.__table__,
+    ProfileImageUpload.__table__,
+    RenewalPayment.__table__,
+    ReconciliationRun.__table__,
+    ReconciliationMismatch.__table__,
+]
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    yield loop
+
+    loop.close()
+
+
+@pytest.fixture
+def run(event_loop):
+    return event_loop.run_until_complete
+
+
+@pytest.fixture
+def database(run):
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all, tables=TABLES)
+            await conn.run_sync(Base.metadata.create_all, tables=TABLES)
+
+    run(create_tables())
+
+
+@pytest.fixture
+def session(run, database):
+    session = async_session()
+
+    yield session
+
+    run(session.close())
+
+
+def make_user(**fields) -> User:
+    user = {
+        "prefix": "Mr",
+        "first_name": "Test",
+        "last_name": "Alumnus",
+        "email": "test@example.com",
+        "mobile": "9999999999",
+        "birthday": datetime.date(1990, 1, 1),
+        "address1": "1 Main Road",
+        "city": "Bengaluru",
+        "state": "Karnataka",
+        "pincode": "560003",
+        "country": "India",
+        "duration_end": 2010,
+        "membership_type": "Lifetime",
+        "payment_status": True,
+        "membership_expired": False,
+    }
+    user.update(fields)
+
+    return User(**user)
+
+
+@pytest.fixture
+def add_users(run, session):
+    async def add(*users):
+        session.add_all(users)
+        await session.commit()
+
+    return lambda *users: run(add(*users))
@@ -0,0 +1,152 @@
+import time
+
+import pytest
+from jose import jwt
+
+from helpers import admin_auth
+from helpers.admin_auth import AdminTokenVerifier
+
+SECRET_KEY = "verifier-secret"
+ADMIN_UUID = "admin-uuid"
+
+
+class Clock:
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admin_auth.time, "time", clock.time)
+
+    return clock
+
+
+def make_verifier(maxsize: int = 16) -> AdminTokenVerifier:
+    return AdminTokenVerifier(SECRET_KEY, "HS256", ADMIN_UUID, maxsize)
+
+
+def make_token(clock, expires_in: float = 60, sub: str = ADMIN_UUID, **claims) -> str:
+    claims.update(sub=sub, exp=int(clock.now + expires_in))
+
+    return jwt.encode(claims, SECRET_KEY, algorithm="HS256")
+
+
+def test_admin_token_is_verified(clock):
+    verifier = make_verifier()
+
+    assert verifier.verify(make_token(clock))
+
+
+def test_invalid_tokens_are_rejected(clock):
+    verifier = make_verifier()
+
+    forged = jwt.encode(
+        {"sub": ADMIN_UUID, "exp": int(clock.now + 60)}, "other", algorithm="HS256"
+    )
+
+    assert not verifier.verify(forged)
+    assert not verifier.verify(make_token(clock, sub="someone-else"))
+    assert not verifier.verify("not a token")
+    assert not verifier.verify(
+        jwt.encode({"sub": ADMIN_UUID}, SECRET_KEY, algorithm="HS256")
+    )
+
+
+def test_cached_token_expires(clock):
+    verifier = make_verifier()
+    token = make_token(clock, expires_in=60)
+
+    assert verifier.verify(token)
+
+    clock.now += 59
+    assert verifier.verify(token)
+
+    clock.now += 1
+    assert not verifier.verify(token)
+    assert verifier.digest(token) not in verifier._verified
+
+
+def test_expired_token_is_not_cached(clock):
+    verifier = make_verifier()
+
+    assert not verifier.verify(make_token(clock, expires_in=-1))
+    assert not verifier._verified
+
+
+def test_cached_token_skips_the_signature_check(clock, monkeypatch):
+    verifier = make_verifier()
+    token = make_token(clock)
+    decodes = []
+
+    decode = verifier._decode
+    monkeypatch.setattr(verifier, "_decode", lambda t: decodes.append(t) or decode(t))
+
+    for _ in range(5):
+        assert verifier.verify(token)
+
+    assert len(decodes) == 1
+
+
+def test_least_recently_used_token_is_evicted(clock):
+    verifier = make_verifier(maxsize=2)
+    first, second, third = [make_token(clock, jti=str(index)) for index in range(3)]
+
+    verifier.verify(first)
+    verifier.verify(second)
+    # Using the first token again makes the second the least recently used
+    verifier.verify(first)
+    verifier.verify(third)
+
+    assert list(verifier._verified) == [verifier.digest(first), verifier.digest(third)]
+
+    # An evicted token is still valid, it is verified again
+    assert verifier.verify(second)
+    assert len(verifier._verified) == 2
+
+
+def test_revoked_token_is_rejected(clock):
+    verifier = make_verifier()
+    token = make_token(clock)
+    other = make_token(clock, jti="other")
+
+    assert verifier.verify(token)
+
+    verifier.revoke(token)
+
+    assert not verifier.verify(token)
+    assert verifier.verify(other)
+
+
+def test_token_can_be_revoked_before_it_is_used(clock):
+    verifier = make_verifier()
+    token = make_token(clock)
+
+    verifier.revoke(token)
+
+    assert not verifier.verify(token)
+
+
+def test_revocations_are_dropped_once_the_tokens_expire(clock):
+    verifier = make_verifier()
+    short_lived = make_token(clock, expires_in=10)
+
+    verifier.revoke(short_lived)
+
+    clock.now += 11
+    verifier.revoke(make_token(clock, expires_in=60))
+
+    assert verifier.digest(short_lived) not in verifier._revoked
+    assert len(verifier._revoked) == 1
+
+
+def test_invalid_token_is_not_revoked(clock):
+    verifier = make_verifier()
+
+    verifier.revoke("not a token")
+
+    assert not verifier._revoked
@@ -0,0 +1,84 @@
+import contextlib
+import os
+import zlib
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import BigInteger
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database import db
+
+# See tests/test_apply_payments.py
+TEST_POSTGRES_URI = os.getenv("TEST_POSTGRES_URI")
+
+# Its CRC does not fit in a signed 32 bit integer
+LOCK_NAME = "job:payment_reconciliation"
+
+
+def test_lock_name_is_above_the_int4_range():
+    assert zlib.crc32(LOCK_NAME.encode()) >= 2 ** 31
+
+
+def test_lock_is_always_taken_on_sqlite(run):
+    async def take_lock():
+        async with db.advisory_lock(LOCK_NAME) as locked:
+            return locked
+
+    assert run(take_lock()) is True
+
+
+# The key bound to the lock and unlock calls, checked without a database
+def test_lock_key_is_bound_as_a_bigint(run, monkeypatch):
+    statements = []
+
+    class Result:
+        def scalar(self):
+            return True
+
+    class Connection:
+        async def execute(self, statement):
+            statements.append(statement.compile())
+            return Result()
+
+    @contextlib.asynccontextmanager
+    async def connect():
+        yield Connection()
+
+    monkeypatch.setattr(
+        db,
+        "engine",
+        SimpleNamespace(dialect=SimpleNamespace(name="postgresql"), connect=connect),
+    )
+
+    async def take_lock():
+        async with db.advisory_lock(LOCK_NAME) as locked:
+            return locked
+
+    assert run(take_lock()) is True
+
+    assert ["pg_try_advisory_lock" in str(s) for s in statements] == [True, False]
+
+    for statement in statements:
+        assert statement.binds
+
+        for key in statement.binds.values():
+            assert isinstance(key.type, BigInteger)
+            assert key.value == zlib.crc32(LOCK_NAME.encode())
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_URI, reason="TEST_POSTGRES_URI is not set")
+def test_lock_above_the_int4_range_on_postgres(run, monkeypatch):
+    engine = create_async_engine(TEST_POSTGRES_URI)
+    monkeypatch.setattr(db, "engine", engine)
+
+    async def take_lock_twice():
+        try:
+            async with db.advisory_lock(LOCK_NAME) as locked:
+                # Held on another connection, so a second taker is refused
+                async with db.advisory_lock(LOCK_NAME) as locked_again:
+                    return locked, locked_again
+        finally:
+            await engine.dispose()
+
+    assert run(take_lock_twice()) == (True, False)
@@ -0,0 +1,156 @@
+import datetime
+
+import pytest
+from sqlalchemy.future import select
+
+from database.data_access.outboxDAL import OutboxDAL
+from database.models import EmailOutbox
+from helpers import email_outbox
+from helpers.mail_transport import MailDeliveryError
+
+MESSAGE = {
+    "from": {"email": "admin@example.com"},
+    "personalizations": [{"to": [{"email": "alumnus@example.com"}]}],
+    "subject": "Hello",
+}
+
+
+@pytest.fixture
+def outbox(run, session):
+    run(OutboxDAL(session).enqueue([MESSAGE], "test"))
+
+    async def drain():
+        return await email_outbox.drain_outbox_batch(email_outbox.RateLimiter(1000))
+
+    async def fetch():
+        session.expire_all()
+        q = await session.execute(select(EmailOutbox))
+        return q.scalars().one()
+
+    class Outbox:
+        def drain(self):
+            return run(drain())
+
+        def fetch(self):
+            return run(fetch())
+
+        # Makes the email due again instead of waiting out the retry delay
+        def make_due(self):
+            async def update():
+                record = await fetch()
+                record.next_attempt_at = datetime.datetime.utcnow()
+                await session.commit()
+
+            run(update())
+
+    return Outbox()
+
+
+def failing_send(status_code: int):
+    async def send_mail(message):
+        raise MailDeliveryError(status_code, b"error")
+
+    return send_mail
+
+
+async def successful_send(message):
+    pass
+
+
+def test_sent_email_is_marked_as_sent(monkeypatch, outbox):
+    monkeypatch.setattr(email_outbox, "send_mail", successful_send)
+
+    assert outbox.drain() == 1
+
+    record = outbox.fetch()
+    assert record.status == "sent"
+    assert record.attempts == 1
+    assert record.sent_at is not None
+
+    assert outbox.drain() == 0
+
+
+def test_server_error_is_retried_later(monkeypatch, outbox):
+    monkeypatch.setattr(email_outbox, "send_mail", failing_send(503))
+
+    before = datetime.datetime.utcnow()
+    outbox.drain()
+
+    record = outbox.fetch()
+    assert record.status == "pending"
+    assert record.attempts == 1
+    assert "503" in record.last_error
+    assert record.next_attempt_at > before + datetime.timedelta(
+        seconds=email_outbox.OUTBOX_RETRY_SECONDS * 0.8 - 1
+    )
+
+    # Not due yet
+    assert outbox.drain() == 0
+
+    monkeypatch.setattr(email_outbox, "send_mail", successful_send)
+    outbox.make_due()
+    outbox.drain()
+
+    record = outbox.fetch()
+    assert record.status == "sent"
+    assert record.attempts == 2
+    assert record.last_error is None
+
+
+def test_rate_limited_email_is_retried(monkeypatch, outbox):
+    monkeypatch.setattr(email_outbox, "send_mail", failing_send(429))
+
+    outbox.drain()
+
+    assert outbox.fetch().status == "pending"
+
+
+def test_client_error_goes_straight_to_dead_letter(monkeypatch, outbox):
+    monkeypatch.setattr(email_outbox, "send_mail", failing_send(400))
+
+    outbox.drain()
+
+    record = outbox.fetch()
+    assert record.status == "dead"
+    assert record.attempts == 1
+
+
+def test_email_is_dead_after_the_last_attempt(monkeypatch, outbox):
+    monkeypatch.setattr(email_outbox, "send_mail", failing_send(500))
+    monkeypatch.setattr(email_outbox, "OUTBOX_MAX_ATTEMPTS", 3)
+
+    for attempt in range(1, 4):
+        outbox.make_due()
+        assert outbox.drain() == 1
+        assert outbox.fetch().attempts == attempt
+
+    record = outbox.fetch()
+    assert record.status == "dead"
+
+    outbox.make_due()
+    assert outbox.drain() == 0
+
+
+def test_dead_email_can_be_requeued(monkeypatch, run, session, outbox):
+    monkeypatch.setattr(email_outbox, "send_mail", failing_send(400))
+    outbox.drain()
+
+    record = outbox.fetch()
+    assert run(OutboxDAL(session).requeue(record.id)) == 1
+    run(session.commit())
+
+    monkeypatch.setattr(email_outbox, "send_mail", successful_send)
+    outbox.drain()
+
+    assert outbox.fetch().status == "sent"
+
+
+def test_retry_delay_doubles_up_to_the_maximum():
+    now = datetime.datetime.utcnow()
+
+    def delay(attempts):
+        return (email_outbox.next_attempt_time(attempts) - now).total_seconds()
+
+    assert delay(1) == pytest.approx(email_outbox.OUTBOX_RETRY_SECONDS, rel=0.25)
+    assert delay(2) == pytest.approx(email_outbox.OUTBOX_RETRY_SECONDS * 2, rel=0.25)
+    assert delay(30) == pytest.approx(email_outbox.OUTBOX_MAX_RETRY_SECONDS, rel=0.25)
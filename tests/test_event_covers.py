@@ -0,0 +1,76 @@
+import datetime
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import events
+from routers import get_read_only_event_dal
+
+STORED_EVENT = uuid.uuid4()
+NEW_EVENT = uuid.uuid4()
+EVENT_WITHOUT_COVER = uuid.uuid4()
+
+
+def make_event(id, name, cover_photo_url=None):
+    return SimpleNamespace(
+        id=id,
+        name=name,
+        description="Annual meet",
+        event_date=datetime.date.today(),
+        event_time="10:00 AM",
+        venue="MES College",
+        chief_guest=None,
+        cover_photo_url=cover_photo_url,
+    )
+
+
+class EventDAL:
+    async def fetch_all_upcoming_events(self):
+        return [
+            make_event(STORED_EVENT, "alumni day", "https://ik.imagekit.io/stored"),
+            make_event(NEW_EVENT, "sports day"),
+            make_event(EVENT_WITHOUT_COVER, "quiz"),
+        ]
+
+
+@pytest.fixture
+def stored_covers(monkeypatch):
+    stored = {}
+
+    async def resolve_cover_photos(event_names):
+        return [
+            "https://ik.imagekit.io/sports-day" if name == "sports day" else None
+            for name in event_names
+        ]
+
+    async def store_cover_photos(cover_photos):
+        stored.update(cover_photos)
+
+    monkeypatch.setattr(events, "resolve_cover_photos", resolve_cover_photos)
+    monkeypatch.setattr(events, "store_cover_photos", store_cover_photos)
+
+    return stored
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(events.router)
+    app.dependency_overrides[get_read_only_event_dal] = EventDAL
+
+    return TestClient(app)
+
+
+def test_resolved_covers_are_stored(client, stored_covers):
+    response = client.get("/events/upcoming")
+
+    assert response.status_code == 200
+    assert [event["cover_photo"] for event in response.json()] == [
+        "https://ik.imagekit.io/stored",
+        "https://ik.imagekit.io/sports-day",
+        None,
+    ]
+    assert stored_covers == {NEW_EVENT: "https://ik.imagekit.io/sports-day"}
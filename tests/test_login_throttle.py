@@ -0,0 +1,57 @@
+import ipaddress
+
+import pytest
+from starlette.requests import Request
+
+from helpers import login_throttle
+
+
+def make_request(host: str, forwarded_for: str = None) -> Request:
+    headers = []
+
+    if forwarded_for is not None:
+        headers.append((b"x-forwarded-for", forwarded_for.encode()))
+
+    return Request(
+        {
+            "type": "http",
+            "method": "POST",
+            "path": "/auth",
+            "headers": headers,
+            "client": (host, 50000),
+        }
+    )
+
+
+@pytest.fixture(autouse=True)
+def trusted_proxies(monkeypatch):
+    monkeypatch.setattr(
+        login_throttle,
+        "TRUSTED_PROXIES",
+        [ipaddress.ip_network("127.0.0.1"), ipaddress.ip_network("10.0.0.0/8")],
+    )
+
+
+def test_header_of_untrusted_client_is_ignored():
+    request = make_request("203.0.113.7", "198.51.100.1")
+
+    assert login_throttle.client_ip(request) == "203.0.113.7"
+
+
+def test_client_behind_trusted_proxy():
+    request = make_request("127.0.0.1", "203.0.113.7")
+
+    assert login_throttle.client_ip(request) == "203.0.113.7"
+
+
+def test_entries_sent_by_the_client_are_skipped():
+    # The client sent its own header, which the proxies appended to
+    request = make_request("127.0.0.1", "198.51.100.1, 203.0.113.7, 10.0.0.2")
+
+    assert login_throttle.client_ip(request) == "203.0.113.7"
+
+
+def test_proxy_without_header():
+    request = make_request("127.0.0.1")
+
+    assert login_throttle.client_ip(request) == "127.0.0.1"
@@ -0,0 +1,103 @@
+import pytest
+from fastapi import APIRouter
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from helpers import imagekit_init
+from helpers import metrics
+from helpers.metrics import MetricsMiddleware
+from helpers.metrics import route_template
+from helpers.metrics import UNMATCHED_ROUTE
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(metrics.http_requests, "_values", {})
+    monkeypatch.setattr(metrics.http_request_duration, "_values", {})
+
+    router = APIRouter()
+
+    @router.get("/members/{member_id}")
+    async def get_member(member_id: int):
+        return {"id": member_id}
+
+    @router.post("/members/{member_id}/notes/{note_id}")
+    async def add_note(member_id: int, note_id: str):
+        return {}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(MetricsMiddleware)
+
+    return TestClient(app)
+
+
+def requests_by_label():
+    return dict(metrics.http_requests._values)
+
+
+def test_requests_are_labelled_by_route_template(client):
+    for member_id in range(3):
+        client.get(f"/members/{member_id}")
+
+    client.post("/members/7/notes/abc")
+
+    assert requests_by_label() == {
+        ("GET", "/members/{member_id}", "200"): 3,
+        ("POST", "/members/{member_id}/notes/{note_id}", "200"): 1,
+    }
+
+
+def test_unknown_paths_share_one_label(client):
+    client.get("/wp-login.php")
+    client.get("/.env")
+
+    assert requests_by_label() == {("GET", UNMATCHED_ROUTE, "404"): 2}
+
+
+def test_status_code_of_failed_validation_is_recorded(client):
+    client.get("/members/not-a-number")
+
+    assert requests_by_label() == {("GET", "/members/{member_id}", "422"): 1}
+
+
+def test_unknown_methods_are_grouped(client):
+    client.request("PROPFIND", "/members/1")
+
+    assert list(requests_by_label()) == [("OTHER", "/members/{member_id}", "405")]
+
+
+def test_request_durations_use_the_same_labels(client):
+    client.get("/members/1")
+
+    assert list(metrics.http_request_duration._values) == [
+        ("GET", "/members/{member_id}")
+    ]
+
+
+def test_scope_without_endpoint_is_unmatched():
+    assert route_template({"type": "http", "path": "/anything"}) == UNMATCHED_ROUTE
+
+
+def test_imagekit_folder_calls_are_tracked(run, monkeypatch):
+    monkeypatch.setattr(metrics.outbound_requests, "_values", {})
+    monkeypatch.setenv("IMAGEKIT_PRIVATE_KEY_PROD", "private_key")
+
+    async def post(url, **kwargs):
+        return None
+
+    async def delete(url, **kwargs):
+        raise ConnectionError("ImageKit is down")
+
+    monkeypatch.setattr(imagekit_init.requests, "post", post)
+    monkeypatch.setattr(imagekit_init.requests, "delete", delete)
+
+    run(imagekit_init.create_imagekit_folder("alumni-day", "MES-AA/Events"))
+
+    with pytest.raises(ConnectionError):
+        run(imagekit_init.delete_imagekit_folder("MES-AA/Profile/1"))
+
+    assert metrics.outbound_requests._values == {
+        ("imagekit", "create_folder", "success"): 1,
+        ("imagekit", "delete_folder", "error"): 1,
+    }
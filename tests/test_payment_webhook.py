@@ -0,0 +1,208 @@
+import datetime
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.future import select
+
+from database.models import PaymentEvent
+from database.models import RenewalPayment
+from database.models import User
+from helpers import payment_events
+from helpers.payment_events import apply_payment_events_batch
+from helpers.payment_gateway import payment_gateway
+from routers import payments
+from tests.conftest import make_user
+
+
+@pytest.fixture
+def client(database):
+    app = FastAPI()
+    app.include_router(payments.router)
+
+    return TestClient(app)
+
+
+def webhook_body(event: str, order_id: str, payment_id: str) -> bytes:
+    return json.dumps(
+        {
+            "event": event,
+            "payload": {
+                "payment": {"entity": {"id": payment_id, "order_id": order_id}}
+            },
+        }
+    ).encode()
+
+
+def post_webhook(client, body: bytes, signature=None, event_id=None):
+    headers = {"Content-Type": "application/json"}
+
+    if signature is not False:
+        headers["X-Razorpay-Signature"] = signature or payment_gateway().sign_webhook(
+            body
+        )
+
+    if event_id:
+        headers["X-Razorpay-Event-Id"] = event_id
+
+    return client.post("/payments/webhook", data=body, headers=headers)
+
+
+def fetch_events(run, session):
+    async def fetch():
+        q = await session.execute(select(PaymentEvent).order_by(PaymentEvent.id))
+        return q.scalars().all()
+
+    return run(fetch())
+
+
+def test_signed_payment_event_is_recorded(run, session, client):
+    body = webhook_body("payment.captured", "order_1", "pay_1")
+
+    response = post_webhook(client, body, event_id="evt_1")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "recorded"}
+
+    [event] = fetch_events(run, session)
+    assert (event.event_id, event.order_id, event.payment_id, event.status) == (
+        "evt_1",
+        "order_1",
+        "pay_1",
+        "pending",
+    )
+
+
+def test_missing_signature_is_rejected(run, session, client):
+    body = webhook_body("payment.captured", "order_1", "pay_1")
+
+    assert post_webhook(client, body, signature=False).status_code == 400
+    assert fetch_events(run, session) == []
+
+
+def test_invalid_signature_is_rejected(run, session, client):
+    body = webhook_body("payment.captured", "order_1", "pay_1")
+    tampered = webhook_body("payment.captured", "order_1", "pay_2")
+
+    signature = payment_gateway().sign_webhook(body)
+
+    assert post_webhook(client, tampered, signature=signature).status_code == 400
+    assert post_webhook(client, body, signature="0" * 64).status_code == 400
+    assert fetch_events(run, session) == []
+
+
+def test_redelivered_event_is_recorded_once(run, session, client):
+    body = webhook_body("payment.captured", "order_1", "pay_1")
+
+    first = post_webhook(client, body, event_id="evt_1")
+    second = post_webhook(client, body, event_id="evt_1")
+
+    assert first.json() == {"status": "recorded"}
+    assert second.status_code == 200
+    assert second.json() == {"status": "duplicate"}
+    assert len(fetch_events(run, session)) == 1
+
+
+def test_body_identifies_events_without_an_event_id(run, session, client):
+    body = webhook_body("order.paid", "order_1", "pay_1")
+
+    assert post_webhook(client, body).json() == {"status": "recorded"}
+    assert post_webhook(client, body).json() == {"status": "duplicate"}
+    assert len(fetch_events(run, session)) == 1
+
+
+def test_other_events_are_ignored(run, session, client):
+    body = webhook_body("payment.failed", "order_1", "pay_1")
+
+    assert post_webhook(client, body, event_id="evt_1").status_code == 200
+
+    [event] = fetch_events(run, session)
+    assert event.status == "ignored"
+
+
+def test_recorded_payment_is_applied_to_the_user(run, session, client, add_users):
+    add_users(make_user(razorpay_order_id="order_1", payment_status=False))
+
+    body = webhook_body("payment.captured", "order_1", "pay_1")
+    post_webhook(client, body, event_id="evt_1")
+
+    assert run(apply_payment_events_batch()) == 1
+
+    session.expire_all()
+    [event] = fetch_events(run, session)
+    assert event.status == "applied"
+
+    user = run(session.execute(select(User))).scalars().one()
+    assert user.payment_status is True
+    assert user.razorpay_payment_id == "pay_1"
+
+
+def make_due(run, session):
+    async def update():
+        for event in (await session.execute(select(PaymentEvent))).scalars():
+            event.next_attempt_at = datetime.datetime.utcnow()
+
+        await session.commit()
+
+    run(update())
+
+
+def test_event_received_before_the_order_is_retried(run, session, client, add_users):
+    body = webhook_body("payment.captured", "order_1", "pay_1")
+    post_webhook(client, body, event_id="evt_1")
+
+    assert run(apply_payment_events_batch()) == 1
+
+    session.expire_all()
+    [event] = fetch_events(run, session)
+    assert (event.status, event.attempts) == ("pending", 1)
+    assert event.next_attempt_at > datetime.datetime.utcnow()
+
+    # Not due yet
+    assert run(apply_payment_events_batch()) == 0
+
+    add_users(make_user(razorpay_order_id="order_1", payment_status=False))
+    make_due(run, session)
+
+    assert run(apply_payment_events_batch()) == 1
+
+    session.expire_all()
+    [event] = fetch_events(run, session)
+    assert event.status == "applied"
+
+
+def test_event_is_unmatched_after_the_last_attempt(monkeypatch, run, session, client):
+    monkeypatch.setattr(payment_events, "PAYMENT_EVENTS_MATCH_ATTEMPTS", 2)
+
+    body = webhook_body("payment.captured", "order_1", "pay_1")
+    post_webhook(client, body, event_id="evt_1")
+
+    run(apply_payment_events_batch())
+    make_due(run, session)
+    run(apply_payment_events_batch())
+
+    session.expire_all()
+    [event] = fetch_events(run, session)
+    assert (event.status, event.attempts) == ("unmatched", 1)
+
+
+def test_renewal_payment_event_is_matched(run, session, client, add_users):
+    add_users(
+        RenewalPayment(
+            user_id=1,
+            order_id="order_renewal",
+            payment_id="pay_1",
+            payment_amount=300,
+            date_renewed=datetime.date.today(),
+        )
+    )
+
+    body = webhook_body("payment.captured", "order_renewal", "pay_1")
+    post_webhook(client, body, event_id="evt_1")
+
+    run(apply_payment_events_batch())
+
+    session.expire_all()
+    [event] = fetch_events(run, session)
+    assert event.status == "applied"
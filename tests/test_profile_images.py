@@ -0,0 +1,187 @@
+import datetime
+
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+from database.data_access.profileImageDAL import ProfileImageDAL
+from database.models import ProfileImageUpload
+from database.models import User
+from helpers import profile_images
+from tests.conftest import make_user
+
+ALT_USER_ID = "4b5f4a52-2a8d-4f4e-9a3c-1d0f6c1e2b7a"
+
+
+class ImageKit:
+    def __init__(self):
+        self.uploads = []
+        self.deleted_folders = []
+        self.error = None
+        self.before_upload = None
+
+    def upload_file_to_imagekit(self, alt_user_id, image, extension):
+        if self.before_upload:
+            self.before_upload()
+
+        if self.error:
+            raise self.error
+
+        self.uploads.append((alt_user_id, image, extension))
+        return f"https://ik.imagekit.io/profile/{alt_user_id}{extension}"
+
+    async def delete_profile_folder(self, alt_user_id):
+        self.deleted_folders.append(alt_user_id)
+
+
+@pytest.fixture
+def imagekit(monkeypatch):
+    imagekit = ImageKit()
+
+    monkeypatch.setattr(
+        profile_images, "upload_file_to_imagekit", imagekit.upload_file_to_imagekit
+    )
+    monkeypatch.setattr(
+        profile_images, "delete_profile_folder", imagekit.delete_profile_folder
+    )
+
+    return imagekit
+
+
+@pytest.fixture
+def pending_upload(run, session, add_users):
+    add_users(make_user(alt_user_id=ALT_USER_ID, profile_image_status="pending"))
+
+    ProfileImageDAL(session).enqueue(ALT_USER_ID, b"image", ".jpeg")
+    run(session.commit())
+
+
+def drain(run):
+    return run(profile_images.drain_profile_image_batch())
+
+
+def fetch(run, session):
+    async def fetch_rows():
+        session.expire_all()
+
+        user = (await session.execute(select(User))).scalars().first()
+        upload = (await session.execute(select(ProfileImageUpload))).scalars().first()
+
+        return user, upload
+
+    return run(fetch_rows())
+
+
+def make_due(run, session):
+    async def update():
+        upload = (await session.execute(select(ProfileImageUpload))).scalars().one()
+        upload.next_attempt_at = datetime.datetime.utcnow()
+        await session.commit()
+
+    run(update())
+
+
+def test_uploaded_image_is_recorded_on_the_user(run, session, imagekit, pending_upload):
+    assert drain(run) == 1
+
+    user, upload = fetch(run, session)
+
+    assert imagekit.uploads == [(ALT_USER_ID, b"image", ".jpeg")]
+    assert user.profile_image_status == "uploaded"
+    assert user.profile_url == f"https://ik.imagekit.io/profile/{ALT_USER_ID}.jpeg"
+    assert upload is None
+
+
+def test_failed_upload_is_retried_later(run, session, imagekit, pending_upload):
+    imagekit.error = RuntimeError("ImageKit is down")
+
+    drain(run)
+
+    user, upload = fetch(run, session)
+    assert user.profile_image_status == "pending"
+    assert upload.attempts == 1
+    assert "ImageKit is down" in upload.last_error
+    assert upload.next_attempt_at > datetime.datetime.utcnow()
+
+    # Not due yet
+    assert drain(run) == 0
+
+    imagekit.error = None
+    make_due(run, session)
+    drain(run)
+
+    user, upload = fetch(run, session)
+    assert user.profile_image_status == "uploaded"
+    assert upload is None
+
+
+def test_upload_is_given_up_after_the_last_attempt(
+    monkeypatch, run, session, imagekit, pending_upload
+):
+    monkeypatch.setattr(profile_images, "PROFILE_UPLOAD_ATTEMPTS", 2)
+    imagekit.error = RuntimeError("ImageKit is down")
+
+    drain(run)
+    make_due(run, session)
+    drain(run)
+
+    user, upload = fetch(run, session)
+    assert user.profile_image_status == "failed"
+    assert user.profile_url is None
+    assert upload is None
+
+
+def test_upload_of_an_interrupted_worker_is_picked_up_again(
+    run, session, imagekit, pending_upload
+):
+    lease_until = datetime.datetime.utcnow() + datetime.timedelta(minutes=5)
+
+    async def claim():
+        async with session.begin():
+            return await ProfileImageDAL(session).claim_due(5, lease_until)
+
+    # Claimed by a worker that stopped before uploading
+    assert len(run(claim())) == 1
+    assert drain(run) == 0
+
+    make_due(run, session)
+    assert drain(run) == 1
+
+    user, upload = fetch(run, session)
+    assert user.profile_image_status == "uploaded"
+
+
+def test_image_of_a_deleted_user_is_not_uploaded(
+    run, session, imagekit, pending_upload
+):
+    async def delete_user():
+        await session.execute(delete(User))
+        await session.commit()
+
+    run(delete_user())
+
+    assert drain(run) == 1
+
+    assert imagekit.uploads == []
+    assert fetch(run, session) == (None, None)
+
+
+def test_folder_is_removed_when_the_user_is_deleted_during_the_upload(
+    run, session, imagekit, pending_upload
+):
+    import sqlite3
+
+    # The user is deleted while the image is on its way to ImageKit
+    def delete_user():
+        database = profile_images.async_session.kw["bind"].url.database
+
+        with sqlite3.connect(database) as connection:
+            connection.execute("DELETE FROM users")
+
+    imagekit.before_upload = delete_user
+
+    drain(run)
+
+    assert len(imagekit.uploads) == 1
+    assert imagekit.deleted_folders == [ALT_USER_ID]
+    assert fetch(run, session) == (None, None)
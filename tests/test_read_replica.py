@@ -0,0 +1,69 @@
+import asyncio
+import contextlib
+
+import pytest
+
+from database import db
+
+PRIMARY = "primary session"
+REPLICA = "replica session"
+
+
+class ExampleDAL:
+    def __init__(self, session):
+        self.session = session
+
+    @db.read_from_replica(fallback_on_empty=True)
+    async def get_rows(self, rows):
+        await asyncio.sleep(0.01)
+        return [(self.session, row) for row in rows]
+
+    # Rows that have not reached the replica yet
+    @db.read_from_replica(fallback_on_empty=True)
+    async def get_new_rows(self, rows):
+        if self.session == REPLICA:
+            return []
+
+        return [(self.session, row) for row in rows]
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    @contextlib.asynccontextmanager
+    async def replica_session():
+        yield REPLICA
+
+    monkeypatch.setattr(db, "async_replica_session", replica_session)
+    monkeypatch.setattr(db, "replica_unavailable_until", 0.0)
+
+
+def test_read_goes_to_the_replica(run, replica):
+    assert run(ExampleDAL(PRIMARY).get_rows([1])) == [(REPLICA, 1)]
+
+
+def test_empty_result_is_read_again_from_the_primary(run, replica):
+    assert run(ExampleDAL(PRIMARY).get_new_rows([1])) == [(PRIMARY, 1)]
+
+
+def test_session_of_the_dal_is_left_alone(run, replica):
+    dal = ExampleDAL(PRIMARY)
+    sessions = []
+
+    async def watch_session():
+        for _ in range(5):
+            sessions.append(dal.session)
+            await asyncio.sleep(0.002)
+
+    async def read_and_watch():
+        return await asyncio.gather(dal.get_rows([1]), watch_session())
+
+    rows, _ = run(read_and_watch())
+
+    assert rows == [(REPLICA, 1)]
+    assert set(sessions) == {PRIMARY}
+
+
+def test_primary_is_used_without_a_replica(run, monkeypatch):
+    monkeypatch.setattr(db, "async_replica_session", None)
+
+    assert run(ExampleDAL(PRIMARY).get_rows([1])) == [(PRIMARY, 1)]
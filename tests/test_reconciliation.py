@@ -0,0 +1,152 @@
+import datetime
+import json
+import time
+
+import pytest
+from sqlalchemy.future import select
+
+from database.data_access.userDAL import UserDAL
+from database.models import ReconciliationMismatch
+from database.models import RenewalPayment
+from helpers import reconciliation
+from tests.conftest import make_user
+
+TODAY = datetime.date.today()
+IN_WINDOW = TODAY - datetime.timedelta(days=2)
+BEFORE_WINDOW = TODAY - datetime.timedelta(days=30)
+
+
+def settlement(order_id: str, amount: int, created_on: datetime.date) -> dict:
+    return {
+        "entity": "payment",
+        "id": f"pay_{order_id}",
+        "order_id": order_id,
+        "amount": amount,
+        "status": "captured",
+        "created_at": int(time.mktime(created_on.timetuple())) + 3600,
+    }
+
+
+@pytest.fixture
+def settlement_export(monkeypatch, tmp_path):
+    path = tmp_path / "settlements.jsonl"
+
+    def write(*rows):
+        path.write_text("\n".join(json.dumps(row) for row in rows))
+
+    monkeypatch.setattr(reconciliation, "PAYMENT_SETTLEMENT_EXPORT", str(path))
+
+    return write
+
+
+@pytest.fixture
+def renewed_user(run, session, add_users):
+    add_users(
+        make_user(
+            email="renewed@example.com",
+            membership_type="Annual",
+            payment_mode="O",
+            payment_amount=500,
+            razorpay_order_id="order_registration",
+            date_created=IN_WINDOW,
+        )
+    )
+
+    renew(run, session)
+
+
+def renew(run, session):
+    async def update_renewal_details():
+        await UserDAL(session).update_renewal_details(
+            "renewed@example.com",
+            "Annual",
+            300,
+            TODAY + datetime.timedelta(days=365),
+            None,
+            IN_WINDOW,
+            "O",
+            "order_renewal",
+            "pay_order_renewal",
+        )
+        await session.commit()
+
+    run(update_renewal_details())
+
+
+def reconcile(run, session):
+    async def reconcile_and_fetch():
+        async with session.begin():
+            await reconciliation.reconcile_payments(session)
+
+        q = await session.execute(
+            select(
+                ReconciliationMismatch.kind,
+                ReconciliationMismatch.order_id,
+                ReconciliationMismatch.email,
+            ).order_by(ReconciliationMismatch.kind, ReconciliationMismatch.order_id)
+        )
+        return q.all()
+
+    return run(reconcile_and_fetch())
+
+
+def test_renewal_orders_are_matched(run, session, settlement_export, renewed_user):
+    settlement_export(
+        settlement("order_registration", 50000, IN_WINDOW),
+        settlement("order_renewal", 30000, IN_WINDOW),
+        settlement("order_stray", 10000, IN_WINDOW),
+    )
+
+    assert reconcile(run, session) == [("unknown_order", "order_stray", None)]
+
+
+def test_renewal_missing_from_the_settlements(
+    run, session, settlement_export, renewed_user
+):
+    settlement_export(settlement("order_registration", 50000, IN_WINDOW))
+
+    assert reconcile(run, session) == [
+        ("not_settled", "order_renewal", "renewed@example.com")
+    ]
+
+
+def test_renewal_amount_is_compared(run, session, settlement_export, renewed_user):
+    settlement_export(
+        settlement("order_registration", 50000, IN_WINDOW),
+        settlement("order_renewal", 25000, IN_WINDOW),
+    )
+
+    assert reconcile(run, session) == [
+        ("amount", "order_renewal", "renewed@example.com")
+    ]
+
+
+def test_export_rows_outside_the_window_are_ignored(
+    run, session, settlement_export, renewed_user
+):
+    settlement_export(
+        settlement("order_registration", 50000, IN_WINDOW),
+        settlement("order_renewal", 30000, IN_WINDOW),
+        settlement("order_of_last_month", 10000, BEFORE_WINDOW),
+        settlement("order_of_today", 10000, TODAY),
+    )
+
+    assert reconcile(run, session) == []
+
+
+def test_payment_date_formats():
+    assert reconciliation.payment_date({"created_at": "17/10/2026 10:15:00"}) == (
+        datetime.date(2026, 10, 17)
+    )
+    assert reconciliation.payment_date({"created_at": "2026-10-17T10:15:00"}) == (
+        datetime.date(2026, 10, 17)
+    )
+    assert reconciliation.payment_date({}) is None
+
+
+def test_renewal_submitted_again_is_recorded_once(run, session, renewed_user):
+    renew(run, session)
+
+    q = run(session.execute(select(RenewalPayment.order_id, RenewalPayment.user_id)))
+
+    assert q.all() == [("order_renewal", 1)]
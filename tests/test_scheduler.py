@@ -0,0 +1,117 @@
+import datetime
+import os
+import time
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from database import db
+from database.models import Job
+from database.models import ReconciliationMismatch
+from database.models import ReconciliationRun
+from database.models import RenewalPayment
+from database.models import User
+from helpers import reconciliation
+from helpers import scheduler
+from helpers.payment_gateway import payment_gateway
+
+# See tests/test_apply_payments.py
+TEST_POSTGRES_URI = os.getenv("TEST_POSTGRES_URI")
+
+# Its advisory lock key does not fit in a signed 32 bit integer
+JOB_NAME = "payment_reconciliation"
+
+
+@pytest.fixture
+def unknown_payment(monkeypatch):
+    yesterday = datetime.date.today() - datetime.timedelta(days=1)
+
+    monkeypatch.setattr(reconciliation, "PAYMENT_SETTLEMENT_EXPORT", None)
+    monkeypatch.setattr(
+        payment_gateway(),
+        "payments",
+        [
+            {
+                "id": "pay_1",
+                "entity": "payment",
+                "amount": 50000,
+                "status": "captured",
+                "order_id": "order_unknown",
+                "created_at": int(time.mktime(yesterday.timetuple())) + 43200,
+            }
+        ],
+    )
+
+
+# The jobs table uses the Postgres UUID type, so the runs are kept in memory
+class JobsDAL:
+    runs = {}
+
+    def __init__(self, session):
+        self.session = session
+
+    async def find_job_by_name(self, job_name: str):
+        return None
+
+    async def record_job_run(self, job_name: str, *run):
+        self.runs[job_name] = run
+
+
+def test_reconciliation_runs_through_run_job(
+    run, session, monkeypatch, unknown_payment
+):
+    monkeypatch.setattr(scheduler, "AdminDAL", JobsDAL)
+    monkeypatch.setattr(JobsDAL, "runs", {})
+
+    result = run(scheduler.run_job(JOB_NAME, force=True))
+
+    assert (result["status"], result["processed"]) == ("success", 1)
+    assert JobsDAL.runs[JOB_NAME][2:] == (1, "success", None)
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_URI, reason="TEST_POSTGRES_URI is not set")
+def test_reconciliation_runs_through_run_job_on_postgres(
+    run, monkeypatch, unknown_payment
+):
+    engine = create_async_engine(TEST_POSTGRES_URI)
+    tables = [
+        Job.__table__,
+        User.__table__,
+        RenewalPayment.__table__,
+        ReconciliationRun.__table__,
+        ReconciliationMismatch.__table__,
+    ]
+
+    monkeypatch.setattr(db, "engine", engine)
+    monkeypatch.setattr(
+        scheduler,
+        "async_session",
+        sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession),
+    )
+
+    async def run_on_postgres():
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(db.Base.metadata.drop_all, tables=tables)
+                await conn.run_sync(db.Base.metadata.create_all, tables=tables)
+
+            result = await scheduler.run_job(JOB_NAME, force=True)
+
+            async with AsyncSession(engine) as session:
+                job = (await session.execute(select(Job))).scalars().one()
+                mismatches = (
+                    await session.execute(select(ReconciliationMismatch.kind))
+                ).all()
+
+            return result, job, mismatches
+        finally:
+            await engine.dispose()
+
+    result, job, mismatches = run(run_on_postgres())
+
+    assert (result["status"], result["processed"]) == ("success", 1)
+    assert (job.job_name, job.last_run_status) == (JOB_NAME, "success")
+    assert mismatches == [("unknown_order",)]
@@ -0,0 +1,75 @@
+from database.data_access.userDAL import UserDAL
+from tests.conftest import make_user
+
+
+def names(records):
+    return [f"{record.first_name} {record.last_name}" for record in records]
+
+
+def test_search_orders_by_name_on_sqlite(run, session, add_users):
+    add_users(
+        make_user(first_name="Ravi", last_name="Shetty", email="a@example.com"),
+        make_user(first_name="Anil", last_name="Rao", email="b@example.com"),
+        make_user(first_name="Kiran", last_name="Rao", email="c@example.com"),
+        make_user(first_name="Sunil", last_name="Iyer", profession="Doctor"),
+    )
+
+    records = run(UserDAL(session).search_members("ra", 10, 0))
+
+    assert names(records) == ["Anil Rao", "Kiran Rao", "Ravi Shetty"]
+
+
+def test_search_matches_every_word_on_any_column(run, session, add_users):
+    add_users(
+        make_user(first_name="Asha", last_name="Rao", profession="Architect"),
+        make_user(first_name="Asha", last_name="Bhat", profession="Doctor"),
+        make_user(first_name="Vikram", last_name="Rao", profession="Doctor"),
+    )
+
+    records = run(UserDAL(session).search_members("doctor RAO", 10, 0))
+
+    assert names(records) == ["Vikram Rao"]
+
+
+def test_search_pages_through_the_results(run, session, add_users):
+    add_users(
+        *[
+            make_user(first_name=f"Alumnus {index}", last_name=f"Nayak {index:02}")
+            for index in range(25)
+        ]
+    )
+
+    userDAL = UserDAL(session)
+
+    pages = [run(userDAL.search_members("nayak", 10, offset)) for offset in (0, 10, 20)]
+
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert names(sum(pages, [])) == [
+        f"Alumnus {index} Nayak {index:02}" for index in range(25)
+    ]
+    assert run(userDAL.search_members("nayak", 10, 30)) == []
+
+
+def test_search_only_returns_active_paid_members(run, session, add_users):
+    add_users(
+        make_user(first_name="Paid", last_name="Kamath"),
+        make_user(first_name="Unpaid", last_name="Kamath", payment_status=False),
+        make_user(first_name="Expired", last_name="Kamath", membership_expired=True),
+    )
+
+    records = run(UserDAL(session).search_members("kamath", 10, 0))
+
+    assert names(records) == ["Paid Kamath"]
+
+
+def test_search_treats_wildcards_literally(run, session, add_users):
+    add_users(
+        make_user(first_name="Deepa", last_name="Pai", profession="100% Engineer"),
+        make_user(first_name="Suresh", last_name="Pai", profession="Engineer"),
+    )
+
+    userDAL = UserDAL(session)
+
+    assert names(run(userDAL.search_members("100%", 10, 0))) == ["Deepa Pai"]
+    assert run(userDAL.search_members("_ngineer%", 10, 0)) == []
+    assert run(userDAL.search_members("   ", 10, 0)) == []